@@ -1,10 +1,10 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 import plotly.express as px
 import plotly.graph_objects as go
-import json
 import auth
+import data_access
+import geo_data
 import upload_data
 import dashboard_balita_gizi
 import dashboard_balita_kia
@@ -16,6 +16,7 @@ import pmt_pkmk
 import composite_analysis
 import dashboard_pkp
 import rest_api
+import rollup
 import time
 import os
 import datetime
@@ -27,12 +28,9 @@ from sklearn.linear_model import LinearRegression  # Tambahkan import ini
 st.set_page_config(page_title="Dashboard RCS", layout="wide")
 
 # Fungsi untuk memuat data dari database
-def load_data(table_name, db_path="rcs_data.db"):
+def load_data(table_name, db_path=data_access.RCS_DB_PATH):
     try:
-        conn = sqlite3.connect(db_path)
-        df = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
-        conn.close()
-        return df
+        return data_access.load_table(table_name, db_path=db_path)
     except Exception as e:
         st.error(f"❌ Gagal memuat data: {e}")
         return pd.DataFrame()
@@ -43,7 +41,7 @@ def load_data(table_name, db_path="rcs_data.db"):
 def get_last_upload_time():
     """Mengembalikan waktu terakhir modifikasi file database."""
     try:
-        file_path = "rcs_data.db"
+        file_path = data_access.active_db_path(data_access.RCS_DB_PATH)
         if os.path.exists(file_path):
             last_modified_time = os.path.getmtime(file_path)
             return datetime.datetime.fromtimestamp(last_modified_time).strftime("%d %B %Y, %H:%M:%S")
@@ -51,87 +49,123 @@ def get_last_upload_time():
     except Exception:
         return "Gagal mendapatkan waktu upload"
 
-# Fungsi untuk menghitung skor metrik
-def calculate_metrics(df, tahun=None, bulan=None, puskesmas=None, kelurahan=None):
-    filtered_df = df.copy()
+# ----------------------------- #
+# 📐 Spesifikasi Indikator (numerator / denominator / target)
+# ----------------------------- #
+SUM_COLUMNS = [
+    'jumlah_timbang', 'data_sasaran', 'jumlah_ukur', 'jumlah_timbang_ukur',
+    'Stunting', 'Wasting', 'Underweight', 'Obesitas',
+]
+
+INDICATOR_SPECS = {
+    '% Data Entry Penimbangan': {'numerator': 'jumlah_timbang', 'denominator': 'data_sasaran', 'target': 90},
+    'Prevalensi Stunting': {'numerator': 'Stunting', 'denominator': 'jumlah_ukur', 'target': 14},
+    'Prevalensi Wasting': {'numerator': 'Wasting', 'denominator': 'jumlah_timbang_ukur', 'target': 7},
+    'Prevalensi Underweight': {'numerator': 'Underweight', 'denominator': 'jumlah_timbang', 'target': 10},
+    # Target overweight dipakai untuk Obesitas
+    'Prevalensi Obesitas': {'numerator': 'Obesitas', 'denominator': 'jumlah_timbang_ukur', 'target': 5},
+}
+
+
+def _as_float(values):
+    if isinstance(values, pd.Series):
+        return values.to_numpy(dtype=float, na_value=np.nan)
+    return np.asarray(values, dtype=float)
+
+
+def percent_ratio(numerator, denominator):
+    """numerator / denominator * 100 (2 desimal) untuk seluruh kolom; 0 bila denominator <= 0."""
+    num, den = _as_float(numerator), _as_float(denominator)
+    out = np.zeros(np.broadcast(num, den).shape)
+    np.divide(num, den, out=out, where=den > 0)
+    return np.round(out * 100, 2)
+
+
+def indicator_values(agg):
+    """Hitung semua indikator dari DataFrame/Series agregat (hasil sum)."""
+    return {
+        name: percent_ratio(agg[spec['numerator']], agg[spec['denominator']])
+        for name, spec in INDICATOR_SPECS.items()
+    }
+
+
+def add_indicator_columns(agg_df):
+    return agg_df.assign(**indicator_values(agg_df))
+
+
+# ----------------------------- #
+# 🧊 Cube Overview (satu filter + groupby per pilihan)
+# ----------------------------- #
+def build_overview_cube(df, table_name, level, tahun, bulan, puskesmas):
+    """Agregat SUM_COLUMNS + indikator per `level` untuk filter (tahun, bulan, puskesmas).
+
+    Dibaca dari rollup tersimpan (puluhan baris per bulan); groupby data mentah
+    hanya bila rollup belum dibangun atau tidak memuat semua kolom.
+    """
+    # dropna=False agar total score card tetap menghitung baris tanpa nama wilayah
+    cube = rollup.summarize_by(table_name, [level], SUM_COLUMNS, tahun=tahun, bulan=bulan, puskesmas=puskesmas,
+                               dropna=False)
+    if cube is not None:
+        return add_indicator_columns(cube)
+    mask = pd.Series(True, index=df.index)
     if tahun and tahun != "ALL":
-        filtered_df = filtered_df[filtered_df['Tahun'] == int(tahun)]
+        mask &= df['Tahun'] == int(tahun)
     if bulan and bulan != "ALL":
-        filtered_df = filtered_df[filtered_df['Bulan'] == int(bulan)]
+        mask &= df['Bulan'] == int(bulan)
     if puskesmas and puskesmas != "ALL":
-        filtered_df = filtered_df[filtered_df['Puskesmas'] == puskesmas]
+        mask &= df['Puskesmas'] == puskesmas
+    cube = df.loc[mask].groupby(level, dropna=False)[SUM_COLUMNS].sum().reset_index()
+    return add_indicator_columns(cube)
+
+
+def get_overview_cube(df, table_name, level, tahun, bulan, puskesmas):
+    """Cube overview yang di-memo per sesi; dihitung ulang bila filter atau versi data berubah."""
+    version = data_access.data_version(table_name)
+    key = (table_name, version, tahun, bulan, puskesmas)
+    memo_key = f"overview_cube_{level}"
+    memo = st.session_state.get(memo_key)
+    if version is not None and memo is not None and memo[0] == key:
+        return memo[1]
+    cube = build_overview_cube(df, table_name, level, tahun, bulan, puskesmas)
+    st.session_state[memo_key] = (key, cube)
+    return cube
+
+
+# Fungsi untuk menghitung skor metrik
+def calculate_metrics(cube, kelurahan=None):
+    """Skor metrik dari cube overview (opsional dipersempit ke satu Kelurahan)."""
     if kelurahan and kelurahan != "ALL":
-        filtered_df = filtered_df[filtered_df['Kelurahan'] == kelurahan]
-
-    agg_data = filtered_df.agg({
-        'jumlah_timbang': 'sum',
-        'data_sasaran': 'sum',
-        'jumlah_ukur': 'sum',
-        'jumlah_timbang_ukur': 'sum',
-        'Stunting': 'sum',
-        'Wasting': 'sum',
-        'Underweight': 'sum',
-        'Obesitas': 'sum'
-    })
+        cube = cube[cube['Kelurahan'] == kelurahan]
+    agg_data = cube[SUM_COLUMNS].sum()
+    rates = {name: float(value) for name, value in indicator_values(agg_data).items()}
 
     metrics = {
         'Jumlah Total Sasaran': int(agg_data['data_sasaran']),
         'Jumlah Balita Di Timbang': int(agg_data['jumlah_timbang']),
         'Jumlah Balita Di Ukur': int(agg_data['jumlah_ukur']),
         'Jumlah Balita Di Timbang & Ukur': int(agg_data['jumlah_timbang_ukur']),
-        '% Data Entry Penimbangan': round((agg_data['jumlah_timbang'] / agg_data['data_sasaran'] * 100) if agg_data['data_sasaran'] > 0 else 0, 2),
+        '% Data Entry Penimbangan': rates['% Data Entry Penimbangan'],
         'Jumlah Kasus Stunting': int(agg_data['Stunting']),
         'Jumlah Kasus Wasting': int(agg_data['Wasting']),
         'Jumlah Kasus Underweight': int(agg_data['Underweight']),
         'Jumlah Kasus Obesitas': int(agg_data['Obesitas']),
-        'Prevalensi Stunting': round((agg_data['Stunting'] / agg_data['jumlah_ukur'] * 100) if agg_data['jumlah_ukur'] > 0 else 0, 2),
-        'Prevalensi Wasting': round((agg_data['Wasting'] / agg_data['jumlah_timbang_ukur'] * 100) if agg_data['jumlah_timbang_ukur'] > 0 else 0, 2),
-        'Prevalensi Underweight': round((agg_data['Underweight'] / agg_data['jumlah_timbang'] * 100) if agg_data['jumlah_timbang'] > 0 else 0, 2),
-        'Prevalensi Obesitas': round((agg_data['Obesitas'] / agg_data['jumlah_timbang_ukur'] * 100) if agg_data['jumlah_timbang_ukur'] > 0 else 0, 2)
+        'Prevalensi Stunting': rates['Prevalensi Stunting'],
+        'Prevalensi Wasting': rates['Prevalensi Wasting'],
+        'Prevalensi Underweight': rates['Prevalensi Underweight'],
+        'Prevalensi Obesitas': rates['Prevalensi Obesitas']
     }
     return metrics
 
 # Fungsi untuk membuat peta interaktif (untuk level Puskesmas)
-def create_interactive_map_puskesmas(df, geojson_data, tahun, bulan, puskesmas):
-    filtered_df = df.copy()
-    if tahun and tahun != "ALL":
-        filtered_df = filtered_df[filtered_df['Tahun'] == int(tahun)]
-    if bulan and bulan != "ALL":
-        filtered_df = filtered_df[filtered_df['Bulan'] == int(bulan)]
-    if puskesmas and puskesmas != "ALL":
-        filtered_df = filtered_df[filtered_df['Puskesmas'] == puskesmas]
-
-    agg_df = filtered_df.groupby('Puskesmas').agg({
-        'jumlah_timbang': 'sum',
-        'data_sasaran': 'sum',
-        'jumlah_ukur': 'sum',
-        'jumlah_timbang_ukur': 'sum',
-        'Stunting': 'sum',
-        'Wasting': 'sum',
-        'Underweight': 'sum',
-        'Obesitas': 'sum'
-    }).reset_index()
-
-    agg_df['% Data Entry Penimbangan'] = agg_df.apply(
-        lambda x: round((x['jumlah_timbang'] / x['data_sasaran'] * 100) if x['data_sasaran'] > 0 else 0, 2), axis=1)
-    agg_df['Prevalensi Stunting'] = agg_df.apply(
-        lambda x: round((x['Stunting'] / x['jumlah_ukur'] * 100) if x['jumlah_ukur'] > 0 else 0, 2), axis=1)
-    agg_df['Prevalensi Wasting'] = agg_df.apply(
-        lambda x: round((x['Wasting'] / x['jumlah_timbang_ukur'] * 100) if x['jumlah_timbang_ukur'] > 0 else 0, 2), axis=1)
-    agg_df['Prevalensi Underweight'] = agg_df.apply(
-        lambda x: round((x['Underweight'] / x['jumlah_timbang'] * 100) if x['jumlah_timbang'] > 0 else 0, 2), axis=1)
-    agg_df['Prevalensi Obesitas'] = agg_df.apply(
-        lambda x: round((x['Obesitas'] / x['jumlah_timbang_ukur'] * 100) if x['jumlah_timbang_ukur'] > 0 else 0, 2), axis=1)
+def create_interactive_map_puskesmas(cube, geojson_data, puskesmas):
+    agg_df = cube.dropna(subset=['Puskesmas']).copy()
 
     # Normalisasi nama Puskesmas di dataset (strip spasi, ubah ke title case)
     agg_df['Puskesmas'] = agg_df['Puskesmas'].str.strip().str.title()
 
-    # Normalisasi nama di GeoJSON (strip spasi, ubah ke title case)
-    for feature in geojson_data['features']:
-        feature['properties']['nama_puskesmas'] = feature['properties']['nama_puskesmas'].strip().title()
-
+    # Nama di GeoJSON sudah dinormalisasi sekali saat dimuat (geo_data)
     # Pengecekan apakah ada data yang cocok antara agg_df dan GeoJSON
-    geojson_puskesmas = [f['properties']['nama_puskesmas'] for f in geojson_data['features']]
+    geojson_puskesmas = geo_data.feature_names(geojson_data, 'nama_puskesmas')
     matched_puskesmas = set(agg_df['Puskesmas']).intersection(geojson_puskesmas)
     if not matched_puskesmas:
         st.error("⚠️ Tidak ada data Puskesmas yang cocok antara dataset dan GeoJSON. Pastikan nama Puskesmas di dataset sama dengan 'nama_puskesmas' di GeoJSON.")
@@ -161,7 +195,7 @@ def create_interactive_map_puskesmas(df, geojson_data, tahun, bulan, puskesmas):
         if not highlight_df.empty:
             fig.add_trace(
                 go.Choropleth(
-                    geojson=geojson_data,
+                    geojson=geo_data.subset_features(geojson_data, 'nama_puskesmas', [puskesmas]),
                     locations=[puskesmas],
                     featureidkey='properties.nama_puskesmas',
                     z=[highlight_df['Prevalensi Stunting'].iloc[0]],
@@ -174,46 +208,15 @@ def create_interactive_map_puskesmas(df, geojson_data, tahun, bulan, puskesmas):
     return fig
 
 # Fungsi untuk membuat peta interaktif (untuk level Kelurahan)
-def create_interactive_map_kelurahan(df, geojson_data, tahun, bulan, puskesmas, kelurahan):
-    filtered_df = df.copy()
-    if tahun and tahun != "ALL":
-        filtered_df = filtered_df[filtered_df['Tahun'] == int(tahun)]
-    if bulan and bulan != "ALL":
-        filtered_df = filtered_df[filtered_df['Bulan'] == int(bulan)]
-    if puskesmas and puskesmas != "ALL":
-        filtered_df = filtered_df[filtered_df['Puskesmas'] == puskesmas]
-
-    agg_df = filtered_df.groupby('Kelurahan').agg({
-        'jumlah_timbang': 'sum',
-        'data_sasaran': 'sum',
-        'jumlah_ukur': 'sum',
-        'jumlah_timbang_ukur': 'sum',
-        'Stunting': 'sum',
-        'Wasting': 'sum',
-        'Underweight': 'sum',
-        'Obesitas': 'sum'
-    }).reset_index()
-
-    agg_df['% Data Entry Penimbangan'] = agg_df.apply(
-        lambda x: round((x['jumlah_timbang'] / x['data_sasaran'] * 100) if x['data_sasaran'] > 0 else 0, 2), axis=1)
-    agg_df['Prevalensi Stunting'] = agg_df.apply(
-        lambda x: round((x['Stunting'] / x['jumlah_ukur'] * 100) if x['jumlah_ukur'] > 0 else 0, 2), axis=1)
-    agg_df['Prevalensi Wasting'] = agg_df.apply(
-        lambda x: round((x['Wasting'] / x['jumlah_timbang_ukur'] * 100) if x['jumlah_timbang_ukur'] > 0 else 0, 2), axis=1)
-    agg_df['Prevalensi Underweight'] = agg_df.apply(
-        lambda x: round((x['Underweight'] / x['jumlah_timbang'] * 100) if x['jumlah_timbang'] > 0 else 0, 2), axis=1)
-    agg_df['Prevalensi Obesitas'] = agg_df.apply(
-        lambda x: round((x['Obesitas'] / x['jumlah_timbang_ukur'] * 100) if x['jumlah_timbang_ukur'] > 0 else 0, 2), axis=1)
+def create_interactive_map_kelurahan(cube, geojson_data, kelurahan):
+    agg_df = cube.dropna(subset=['Kelurahan']).copy()
 
     # Normalisasi nama Kelurahan di dataset (strip spasi, ubah ke title case)
     agg_df['Kelurahan'] = agg_df['Kelurahan'].str.strip().str.title()
 
-    # Normalisasi nama di GeoJSON (strip spasi, ubah ke title case)
-    for feature in geojson_data['features']:
-        feature['properties']['nama_desa'] = feature['properties']['nama_desa'].strip().title()
-
+    # Nama di GeoJSON sudah dinormalisasi sekali saat dimuat (geo_data)
     # Pengecekan apakah ada data yang cocok antara agg_df dan GeoJSON
-    geojson_kelurahan = [f['properties']['nama_desa'] for f in geojson_data['features']]
+    geojson_kelurahan = geo_data.feature_names(geojson_data, 'nama_desa')
     matched_kelurahan = set(agg_df['Kelurahan']).intersection(geojson_kelurahan)
     if not matched_kelurahan:
         st.error("⚠️ Tidak ada data Kelurahan yang cocok antara dataset dan GeoJSON. Pastikan nama Kelurahan di dataset sama dengan 'nama_desa' di GeoJSON.")
@@ -239,7 +242,7 @@ def create_interactive_map_kelurahan(df, geojson_data, tahun, bulan, puskesmas,
         if not highlight_df.empty:
             fig.add_trace(
                 go.Choropleth(
-                    geojson=geojson_data,
+                    geojson=geo_data.subset_features(geojson_data, 'nama_desa', [kelurahan]),
                     locations=[kelurahan],
                     featureidkey='properties.nama_desa',
                     z=[highlight_df['Prevalensi Stunting'].iloc[0]],
@@ -252,55 +255,14 @@ def create_interactive_map_kelurahan(df, geojson_data, tahun, bulan, puskesmas,
     return fig
 
 # Fungsi untuk membuat grafik dan tabel (untuk level Puskesmas)
-def create_graph_and_table_puskesmas(df, metric, tahun, bulan, puskesmas):
-    filtered_df = df.copy()
-    if tahun and tahun != "ALL":
-        filtered_df = filtered_df[filtered_df['Tahun'] == int(tahun)]
-    if bulan and bulan != "ALL":
-        filtered_df = filtered_df[filtered_df['Bulan'] == int(bulan)]
-    if puskesmas and puskesmas != "ALL":
-        filtered_df = filtered_df[filtered_df['Puskesmas'] == puskesmas]
-
-    agg_df = filtered_df.groupby('Puskesmas').agg({
-        'jumlah_timbang': 'sum',
-        'data_sasaran': 'sum',
-        'jumlah_ukur': 'sum',
-        'jumlah_timbang_ukur': 'sum',
-        'Stunting': 'sum',
-        'Wasting': 'sum',
-        'Underweight': 'sum',
-        'Obesitas': 'sum'
-    }).reset_index()
-
-    agg_df['% Data Entry Penimbangan'] = agg_df.apply(
-        lambda x: round((x['jumlah_timbang'] / x['data_sasaran'] * 100) if x['data_sasaran'] > 0 else 0, 2), axis=1)
-    agg_df['Prevalensi Stunting'] = agg_df.apply(
-        lambda x: round((x['Stunting'] / x['jumlah_ukur'] * 100) if x['jumlah_ukur'] > 0 else 0, 2), axis=1)
-    agg_df['Prevalensi Wasting'] = agg_df.apply(
-        lambda x: round((x['Wasting'] / x['jumlah_timbang_ukur'] * 100) if x['jumlah_timbang_ukur'] > 0 else 0, 2), axis=1)
-    agg_df['Prevalensi Underweight'] = agg_df.apply(
-        lambda x: round((x['Underweight'] / x['jumlah_timbang'] * 100) if x['jumlah_timbang'] > 0 else 0, 2), axis=1)
-    agg_df['Prevalensi Obesitas'] = agg_df.apply(
-        lambda x: round((x['Obesitas'] / x['jumlah_timbang_ukur'] * 100) if x['jumlah_timbang_ukur'] > 0 else 0, 2), axis=1)
+def create_graph_and_table_puskesmas(cube, metric):
+    agg_df = cube.dropna(subset=['Puskesmas'])
 
     # Urutkan dari tertinggi ke terendah berdasarkan metrik
     agg_df = agg_df.sort_values(by=metric, ascending=False)
 
-    # Target prevalensi
-    target_stunting = 14  # Target prevalensi stunting (%)
-    target_wasting = 7    # Target prevalensi wasting (%)
-    target_underweight = 10  # Target prevalensi underweight (%)
-    target_overweight = 5  # Target prevalensi overweight (%) -> untuk Obesitas
-    target_data_entry = 90  # Target % Data Entry Penimbangan (%)
-
-    # Pilih target berdasarkan metrik
-    target = {
-        'Prevalensi Stunting': target_stunting,
-        'Prevalensi Wasting': target_wasting,
-        'Prevalensi Underweight': target_underweight,
-        'Prevalensi Obesitas': target_overweight,
-        '% Data Entry Penimbangan': target_data_entry
-    }.get(metric)
+    # Target berdasarkan metrik (dari spesifikasi indikator)
+    target = INDICATOR_SPECS.get(metric, {}).get('target')
 
     # Membuat grafik dengan label persentase
     fig = px.bar(
@@ -377,57 +339,16 @@ def create_graph_and_table_puskesmas(df, metric, tahun, bulan, puskesmas):
     return fig, table_df
 
 # Fungsi untuk membuat grafik dan tabel (untuk level Kelurahan)
-def create_graph_and_table_kelurahan(df, metric, tahun, bulan, puskesmas, kelurahan):
-    filtered_df = df.copy()
-    if tahun and tahun != "ALL":
-        filtered_df = filtered_df[filtered_df['Tahun'] == int(tahun)]
-    if bulan and bulan != "ALL":
-        filtered_df = filtered_df[filtered_df['Bulan'] == int(bulan)]
-    if puskesmas and puskesmas != "ALL":
-        filtered_df = filtered_df[filtered_df['Puskesmas'] == puskesmas]
+def create_graph_and_table_kelurahan(cube, metric, kelurahan):
+    agg_df = cube.dropna(subset=['Kelurahan'])
     if kelurahan and kelurahan != "ALL":
-        filtered_df = filtered_df[filtered_df['Kelurahan'] == kelurahan]
-
-    agg_df = filtered_df.groupby('Kelurahan').agg({
-        'jumlah_timbang': 'sum',
-        'data_sasaran': 'sum',
-        'jumlah_ukur': 'sum',
-        'jumlah_timbang_ukur': 'sum',
-        'Stunting': 'sum',
-        'Wasting': 'sum',
-        'Underweight': 'sum',
-        'Obesitas': 'sum'
-    }).reset_index()
-
-    agg_df['% Data Entry Penimbangan'] = agg_df.apply(
-        lambda x: round((x['jumlah_timbang'] / x['data_sasaran'] * 100) if x['data_sasaran'] > 0 else 0, 2), axis=1)
-    agg_df['Prevalensi Stunting'] = agg_df.apply(
-        lambda x: round((x['Stunting'] / x['jumlah_ukur'] * 100) if x['jumlah_ukur'] > 0 else 0, 2), axis=1)
-    agg_df['Prevalensi Wasting'] = agg_df.apply(
-        lambda x: round((x['Wasting'] / x['jumlah_timbang_ukur'] * 100) if x['jumlah_timbang_ukur'] > 0 else 0, 2), axis=1)
-    agg_df['Prevalensi Underweight'] = agg_df.apply(
-        lambda x: round((x['Underweight'] / x['jumlah_timbang'] * 100) if x['jumlah_timbang'] > 0 else 0, 2), axis=1)
-    agg_df['Prevalensi Obesitas'] = agg_df.apply(
-        lambda x: round((x['Obesitas'] / x['jumlah_timbang_ukur'] * 100) if x['jumlah_timbang_ukur'] > 0 else 0, 2), axis=1)
+        agg_df = agg_df[agg_df['Kelurahan'] == kelurahan]
 
     # Urutkan dari tertinggi ke terendah berdasarkan metrik
     agg_df = agg_df.sort_values(by=metric, ascending=False)
 
-    # Target prevalensi
-    target_stunting = 14  # Target prevalensi stunting (%)
-    target_wasting = 7    # Target prevalensi wasting (%)
-    target_underweight = 10  # Target prevalensi underweight (%)
-    target_overweight = 5  # Target prevalensi overweight (%) -> untuk Obesitas
-    target_data_entry = 90  # Target % Data Entry Penimbangan (%)
-
-    # Pilih target berdasarkan metrik
-    target = {
-        'Prevalensi Stunting': target_stunting,
-        'Prevalensi Wasting': target_wasting,
-        'Prevalensi Underweight': target_underweight,
-        'Prevalensi Obesitas': target_overweight,
-        '% Data Entry Penimbangan': target_data_entry
-    }.get(metric)
+    # Target berdasarkan metrik (dari spesifikasi indikator)
+    target = INDICATOR_SPECS.get(metric, {}).get('target')
 
     # Membuat grafik dengan label persentase
     fig = px.bar(
@@ -568,8 +489,7 @@ def main():
             # Memuat data untuk level Puskesmas
             df_puskesmas = load_data("data_bultim")
             try:
-                with open("puskesmas_fix.geojson", "r") as f:
-                    geojson_puskesmas = json.load(f)
+                geojson_puskesmas = geo_data.load_puskesmas_geojson()
             except Exception as e:
                 st.error(f"❌ Gagal memuat GeoJSON Puskesmas: {e}")
                 geojson_puskesmas = None
@@ -577,8 +497,7 @@ def main():
             # Memuat data untuk level Kelurahan
             df_kelurahan = load_data("data_bultim_kelurahan")
             try:
-                with open("desa_fix.geojson", "r") as f:
-                    geojson_kelurahan = json.load(f)
+                geojson_kelurahan = geo_data.load_kelurahan_geojson()
             except Exception as e:
                 st.error(f"❌ Gagal memuat GeoJSON Kelurahan: {e}")
                 geojson_kelurahan = None
@@ -606,7 +525,8 @@ def main():
                     if not df_puskesmas.empty and geojson_puskesmas:
                         st.subheader("Progress Capaian Penimbangan EPPGBM")
                         st.subheader("Score Card Pertumbuhan")
-                        metrics = calculate_metrics(df_puskesmas, tahun_puskesmas, bulan_puskesmas, puskesmas)
+                        cube_puskesmas = get_overview_cube(df_puskesmas, "data_bultim", 'Puskesmas', tahun_puskesmas, bulan_puskesmas, puskesmas)
+                        metrics = calculate_metrics(cube_puskesmas)
                         cols = st.columns(3)
                         for i, (metric, value) in enumerate(metrics.items()):
                             with cols[i % 3]:
@@ -617,7 +537,7 @@ def main():
                                     st.metric(metric, f"{value:.2f}%")
 
                         st.subheader("🗺️ Peta Interaktif Prevalensi Gizi")
-                        map_fig = create_interactive_map_puskesmas(df_puskesmas, geojson_puskesmas, tahun_puskesmas, bulan_puskesmas, puskesmas)
+                        map_fig = create_interactive_map_puskesmas(cube_puskesmas, geojson_puskesmas, puskesmas)
                         if map_fig:
                             st.plotly_chart(map_fig, use_container_width=True)
 
@@ -630,7 +550,7 @@ def main():
                             'Prevalensi Obesitas'
                         ]
                         selected_metric = st.selectbox("📊 Pilih Metrik untuk Grafik", metric_options, key="metric_puskesmas_tab1")
-                        graph_fig, table_df = create_graph_and_table_puskesmas(df_puskesmas, selected_metric, tahun_puskesmas, bulan_puskesmas, puskesmas)
+                        graph_fig, table_df = create_graph_and_table_puskesmas(cube_puskesmas, selected_metric)
                         st.plotly_chart(graph_fig, use_container_width=True)
 
                         st.subheader("📋 Tabel Detail Data per Puskesmas")
@@ -844,7 +764,8 @@ def main():
                     if not df_kelurahan.empty and geojson_kelurahan:
                         st.subheader("Progress Capaian Penimbangan EPPGBM")
                         st.subheader("Score Card Pertumbuhan")
-                        metrics = calculate_metrics(df_kelurahan, tahun_kelurahan, bulan_kelurahan, puskesmas_kelurahan, kelurahan)
+                        cube_kelurahan = get_overview_cube(df_kelurahan, "data_bultim_kelurahan", 'Kelurahan', tahun_kelurahan, bulan_kelurahan, puskesmas_kelurahan)
+                        metrics = calculate_metrics(cube_kelurahan, kelurahan)
                         cols = st.columns(3)
                         for i, (metric, value) in enumerate(metrics.items()):
                             with cols[i % 3]:
@@ -855,7 +776,7 @@ def main():
                                     st.metric(metric, f"{value:.2f}%")
 
                         st.subheader("🗺️ Peta Interaktif Prevalensi Gizi")
-                        map_fig = create_interactive_map_kelurahan(df_kelurahan, geojson_kelurahan, tahun_kelurahan, bulan_kelurahan, puskesmas_kelurahan, kelurahan)
+                        map_fig = create_interactive_map_kelurahan(cube_kelurahan, geojson_kelurahan, kelurahan)
                         if map_fig:
                             st.plotly_chart(map_fig, use_container_width=True)
 
@@ -868,7 +789,7 @@ def main():
                             'Prevalensi Obesitas'
                         ]
                         selected_metric = st.selectbox("📊 Pilih Metrik untuk Grafik", metric_options, key="metric_kelurahan_tab2")
-                        graph_fig, table_df = create_graph_and_table_kelurahan(df_kelurahan, selected_metric, tahun_kelurahan, bulan_kelurahan, puskesmas_kelurahan, kelurahan)
+                        graph_fig, table_df = create_graph_and_table_kelurahan(cube_kelurahan, selected_metric, kelurahan)
                         st.plotly_chart(graph_fig, use_container_width=True)
 
                         st.subheader("📋 Tabel Detail Data per Kelurahan")
@@ -0,0 +1,127 @@
+"""Benchmark agregasi Z-Score EPPGBM: DuckDB (snapshot Parquet) vs pandas.
+
+Data sintetis dengan kolom seperti `data_eppgbm` dibuat pada 100 rb, 1 jt,
+dan 5 jt baris, ditulis sebagai snapshot Parquet sementara, lalu ringkasan
+Z-Score (semua/usia/jenis kelamin/area + flag) dihitung dengan kedua backend.
+
+Jalankan: python benchmark_query_backend.py [jumlah_baris ...]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import eppgbm_query
+import parquet_store
+
+DEFAULT_SIZES = [100_000, 1_000_000, 5_000_000]
+N_PUSKESMAS = 39
+N_KELURAHAN_PER_PUSKESMAS = 10
+PERIODES = ["Februari 2025", "Agustus 2025"]
+
+
+def make_eppgbm(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    puskesmas_idx = rng.integers(0, N_PUSKESMAS, n_rows)
+    kelurahan_idx = rng.integers(0, N_KELURAHAN_PER_PUSKESMAS, n_rows)
+    tgl_ukur = pd.Timestamp("2025-02-01") + pd.to_timedelta(rng.integers(0, 180, n_rows), unit="D")
+    tgl_lahir = tgl_ukur - pd.to_timedelta(rng.integers(0, 62 * 30, n_rows), unit="D")
+    puskesmas = np.array([f"Puskesmas {i:02d}" for i in range(N_PUSKESMAS)], dtype=object)
+    return pd.DataFrame({
+        "periode": np.array(PERIODES, dtype=object)[rng.integers(0, len(PERIODES), n_rows)],
+        "puskesmas": puskesmas[puskesmas_idx],
+        "kelurahan": [f"Kelurahan {p:02d}-{k}" for p, k in zip(puskesmas_idx, kelurahan_idx)],
+        "nama_balita": [f"Balita {i}" for i in range(n_rows)],
+        "jk": np.array(["L", "P"], dtype=object)[rng.integers(0, 2, n_rows)],
+        "Tgl_ukur": tgl_ukur.strftime("%Y-%m-%d"),
+        "Tgl_Lahir": tgl_lahir.strftime("%Y-%m-%d"),
+        "ZS_BBU": rng.normal(-0.8, 1.3, n_rows),
+        "ZS_TBU": rng.normal(-1.1, 1.5, n_rows),
+        "ZS_BBTB": rng.normal(-0.2, 1.2, n_rows),
+    })
+
+
+def write_snapshot(df, root):
+    """Tulis snapshot dengan tata letak yang sama seperti parquet_store.write_snapshot."""
+    target = os.path.join(root, eppgbm_query.EPPGBM_TABLE)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_to_dataset(table, root_path=target, partition_cols=["periode"], compression="zstd")
+    pq.write_metadata(table.schema, os.path.join(target, "_common_metadata"))
+
+
+def prepare_like_dashboard(df, filters):
+    """Langkah pandas di dashboard_eppgbm sebelum agregasi."""
+    for col, value in filters.items():
+        if value != "All":
+            df = df[df[col] == value]
+    df = df.dropna(subset=eppgbm_query.ZSCORE_COLUMNS)
+    df = df.assign(usia_bulan=((pd.to_datetime(df["Tgl_ukur"]) - pd.to_datetime(df["Tgl_Lahir"]))
+                               / pd.Timedelta(days=30.4375)).astype(int))
+    df = df[(df["usia_bulan"] >= 0) & (df["usia_bulan"] <= 59)]
+    df["age_group"] = pd.cut(df["usia_bulan"], bins=eppgbm_query.AGE_BINS, labels=eppgbm_query.AGE_LABELS,
+                             right=True, include_lowest=True)
+    df["jk_label"] = df["jk"].replace(eppgbm_query.JK_LABELS).fillna("Tidak Diketahui")
+    return df
+
+
+def run_all(filtered_df, filters):
+    stats = eppgbm_query.zscore_group_stats(filtered_df, [None, "age_group", "jk_label", "puskesmas"], filters)
+    return list(stats.values()), eppgbm_query.zscore_flag_counts(filtered_df, filters)
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def _assert_same(pandas_result, duckdb_result):
+    for left, right in zip(pandas_result[0] + [pandas_result[1]], duckdb_result[0] + [duckdb_result[1]]):
+        left = left.astype({c: str for c in left.columns if left[c].dtype.name == "category"})
+        pd.testing.assert_frame_equal(left, right, check_dtype=False, check_exact=False, rtol=1e-6)
+
+
+def benchmark(n_rows, filters):
+    df = make_eppgbm(n_rows)
+    root = tempfile.mkdtemp(prefix="rcs_bench_")
+    try:
+        write_snapshot(df, root)
+        parquet_store.SNAPSHOT_ROOT = root
+
+        eppgbm_query.QUERY_BACKEND = "pandas"
+        pandas_result, t_pandas = _timed(lambda: run_all(prepare_like_dashboard(df, filters), filters))
+
+        eppgbm_query.QUERY_BACKEND = "auto"
+        if eppgbm_query.active_backend() != "duckdb":
+            return t_pandas, None
+        # Filtered_df kosong: jalur DuckDB tidak membutuhkan data di memori
+        duckdb_result, t_duckdb = _timed(lambda: run_all(df.iloc[:0], filters))
+        _assert_same(pandas_result, duckdb_result)
+        return t_pandas, t_duckdb
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main(sizes):
+    scenarios = {
+        "semua data": {"periode": "All", "puskesmas": "All", "kelurahan": "All"},
+        "1 periode + 1 puskesmas": {"periode": PERIODES[0], "puskesmas": "Puskesmas 00", "kelurahan": "All"},
+    }
+    print(f"{'baris':>10}  {'skenario':<26}{'pandas (s)':>12}{'duckdb (s)':>12}{'speedup':>10}")
+    for n_rows in sizes:
+        for name, filters in scenarios.items():
+            t_pandas, t_duckdb = benchmark(n_rows, filters)
+            if t_duckdb is None:
+                print(f"{n_rows:>10,}  {name:<26}{t_pandas:>12.2f}{'-':>12}{'-':>10}")
+            else:
+                print(f"{n_rows:>10,}  {name:<26}{t_pandas:>12.2f}{t_duckdb:>12.2f}{t_pandas / t_duckdb:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(n) for n in sys.argv[1:]] or DEFAULT_SIZES)
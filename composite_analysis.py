@@ -1,39 +1,63 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
+import data_access
 import plotly.graph_objects as go
 import numpy as np
 from sklearn.linear_model import LinearRegression
 from scipy.stats import pearsonr
 import semopy
 
-# Fungsi untuk memuat data dari database
-def load_data(table_name, db_path="rcs_data.db"):
+MERGE_COLS = ["Tahun", "Bulan", "Puskesmas", "Kelurahan"]
+
+# Kolom yang benar-benar dipakai model SEM per tabel (selain kolom filter/merge)
+REQUIRED_COLUMNS = {
+    "data_ibuhamil": [
+        "Jumlah_ibu_hamil_mengonsumsi_minimal_180_tablet_TTD", "Jumlah_Sasaran_Ibu_Hamil",
+        "Jumlah_ibu_hamil_anemia", "Jumlah_ibu_hamil_periksa_Hb",
+        "Jumlah_ibu_hamil_risiko_KEK", "Jumlah_ibu_hamil_diukur_LILA_IMT",
+    ],
+    "data_balita_kia": [
+        "Jumlah_bayi_BBLR", "Jumlah_bayi_baru_lahir_hidup", "Jumlah_Bayi_PBLR",
+    ],
+    "data_balita_gizi": [
+        "Jumlah_Bayi_Mendapat_IMD", "Jumlah_bayi_baru_lahir_bulan_ini_B",
+        "Jumlah_Bayi_Asi_Eksklusif_sampai_6_bulan", "Jumlah_Bayi_usia_0-5_bulan_yang_direcall",
+        "Jumlah_anak_usia_6-23_bulan_yang_mendapat_MPASI_baik", "Jumlah_anak_usia_6-23_bulan_yang_diwawancarai",
+        "Jumlah_balita_underweight", "Jumlah_balita_ditimbang",
+        "Jumlah_balita_stunting", "Jumlah_balita_diukur_PBTB",
+        "Jumlah_balita_wasting", "Jumlah_balita_ditimbang_dan_diukur",
+    ],
+}
+
+# Fungsi untuk memuat data dari database (hanya kolom & baris sesuai filter)
+def load_data(table_name, filters=None, db_path=data_access.RCS_DB_PATH):
     try:
-        conn = sqlite3.connect(db_path)
-        df = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
-        conn.close()
-        return df
+        columns = MERGE_COLS + REQUIRED_COLUMNS[table_name] if table_name in REQUIRED_COLUMNS else None
+        return data_access.load_filtered(table_name, columns=columns, filters=filters, db_path=db_path)
     except Exception as e:
         st.error(f"❌ Gagal memuat data: {e}")
         return pd.DataFrame()
 
+# Fungsi untuk memuat opsi filter tanpa membaca seluruh tabel
+def load_options(table_name, column, filters=None):
+    try:
+        return sorted(str(v) for v in data_access.distinct_values(table_name, column, filters))
+    except Exception as e:
+        st.error(f"❌ Gagal memuat data: {e}")
+        return []
+
 # Fungsi untuk menghitung rasio/persentase dengan penanganan pembagian nol
 def calculate_ratio(numerator, denominator):
     return np.where(denominator > 0, (numerator / denominator) * 100, 0)
 
-# Fungsi untuk filter data
-def filter_data(df, tahun, bulan, puskesmas, kelurahan):
-    filtered_df = df.copy()
-    if tahun and tahun != "ALL":
-        filtered_df = filtered_df[filtered_df['Tahun'] == int(tahun)]
-    if bulan and bulan != "ALL":
-        filtered_df = filtered_df[filtered_df['Bulan'] == int(bulan)]
-    if puskesmas and puskesmas != "ALL":
-        filtered_df = filtered_df[filtered_df['Puskesmas'] == puskesmas]
-    if kelurahan and kelurahan != "ALL":
-        filtered_df = filtered_df[filtered_df['Kelurahan'] == kelurahan]
-    return filtered_df
+# Fungsi untuk menyusun filter yang dijalankan langsung di SQLite
+def build_filters(tahun, bulan, puskesmas, kelurahan):
+    return {
+        "Tahun": int(tahun) if tahun and tahun != "ALL" else None,
+        "Bulan": int(bulan) if bulan and bulan != "ALL" else None,
+        "Puskesmas": puskesmas,
+        "Kelurahan": kelurahan,
+    }
 
 # Fungsi untuk menghitung koefisien regresi
 def calculate_path_coefficient(X, y):
@@ -99,12 +123,9 @@ def show_dashboard():
     # Tambahkan pesan pengembangan sebagai informasi (opsional)
     st.info("Fitur ini masih dalam tahap pengembangan. Beberapa hasil mungkin belum sepenuhnya akurat. Kami menghargai kesabaran Anda dalam menunggu pembaruan ini.")
 
-    # Memuat data dari database
-    df_ibuhamil = load_data("data_ibuhamil")
-    df_balita_kia = load_data("data_balita_kia")
-    df_balita_gizi = load_data("data_balita_gizi")
-
-    if df_ibuhamil.empty or df_balita_kia.empty or df_balita_gizi.empty:
+    # Opsi filter diambil dari data_ibuhamil (DISTINCT di SQLite)
+    tahun_list = load_options("data_ibuhamil", "Tahun")
+    if not tahun_list:
         st.error("⚠️ Salah satu atau semua data tidak tersedia. Pastikan tabel 'data_ibuhamil', 'data_balita_kia', dan 'data_balita_gizi' ada di database.")
         return
 
@@ -112,32 +133,30 @@ def show_dashboard():
     st.subheader("🔎 Filter Data")
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        tahun_options = ["ALL"] + sorted(df_ibuhamil['Tahun'].astype(str).unique().tolist())
+        tahun_options = ["ALL"] + tahun_list
         tahun = st.selectbox("📅 Tahun", tahun_options, key="tahun_composite")
     with col2:
         bulan_options = ["ALL"] + [str(i) for i in range(1, 13)]
         bulan = st.selectbox("🗓️ Bulan", bulan_options, key="bulan_composite")
     with col3:
-        puskesmas_options = ["ALL"] + sorted(df_ibuhamil['Puskesmas'].unique().tolist())
+        puskesmas_options = ["ALL"] + load_options("data_ibuhamil", "Puskesmas")
         puskesmas = st.selectbox("🏥 Puskesmas", puskesmas_options, key="puskesmas_composite")
     with col4:
-        filtered_kelurahan = df_ibuhamil
-        if puskesmas != "ALL":
-            filtered_kelurahan = filtered_kelurahan[filtered_kelurahan['Puskesmas'] == puskesmas]
-        kelurahan_options = ["ALL"] + sorted(filtered_kelurahan['Kelurahan'].unique().tolist())
+        kelurahan_options = ["ALL"] + load_options("data_ibuhamil", "Kelurahan", {"Puskesmas": puskesmas})
         kelurahan = st.selectbox("🏘️ Kelurahan", kelurahan_options, key="kelurahan_composite")
 
-    # Terapkan filter pada semua dataset
-    df_ibuhamil_filtered = filter_data(df_ibuhamil, tahun, bulan, puskesmas, kelurahan)
-    df_balita_kia_filtered = filter_data(df_balita_kia, tahun, bulan, puskesmas, kelurahan)
-    df_balita_gizi_filtered = filter_data(df_balita_gizi, tahun, bulan, puskesmas, kelurahan)
+    # Filter dijalankan di SQLite sehingga hanya baris & kolom yang dibutuhkan yang dimuat
+    filters = build_filters(tahun, bulan, puskesmas, kelurahan)
+    df_ibuhamil_filtered = load_data("data_ibuhamil", filters)
+    df_balita_kia_filtered = load_data("data_balita_kia", filters)
+    df_balita_gizi_filtered = load_data("data_balita_gizi", filters)
 
     if df_ibuhamil_filtered.empty or df_balita_kia_filtered.empty or df_balita_gizi_filtered.empty:
         st.warning("⚠️ Tidak ada data setelah filter diterapkan. Silakan sesuaikan filter.")
         return
 
     # Gabungkan data berdasarkan kolom filter (Tahun, Bulan, Puskesmas, Kelurahan)
-    merge_cols = ["Tahun", "Bulan", "Puskesmas", "Kelurahan"]
+    merge_cols = MERGE_COLS
     merged_df = df_ibuhamil_filtered.merge(
         df_balita_kia_filtered, on=merge_cols, how="inner"
     ).merge(
@@ -1,6 +1,9 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
+import data_access
+import outlier_detection
+import reporting_coverage
+import rollup
 import plotly.express as px
 import os
 import datetime
@@ -50,14 +53,11 @@ def _ensure_bulan_column(df):
 # ----------------------------- #
 # 📥 Fungsi untuk load data
 # ----------------------------- #
-@st.cache_data
 def load_data():
     """Memuat data dari database SQLite rcs_data.db."""
     try:
-        conn = sqlite3.connect("rcs_data.db")
-        df = pd.read_sql_query("SELECT * FROM data_balita_gizi", conn)
-        desa_df = pd.read_sql_query("SELECT * FROM dataset_desa", conn)
-        conn.close()
+        df = data_access.load_balita_gizi()
+        desa_df = data_access.load_dataset_desa()
         bulan_cols = [c for c in df.columns if c.lower() == "bulan"]
         if bulan_cols:
             bcol = bulan_cols[0]
@@ -76,7 +76,7 @@ def load_data():
 def get_last_upload_time():
     """Mengembalikan waktu terakhir modifikasi file database."""
     try:
-        file_path = "rcs_data.db"
+        file_path = data_access.active_db_path(data_access.RCS_DB_PATH)
         if os.path.exists(file_path):
             last_modified_time = os.path.getmtime(file_path)
             return datetime.datetime.fromtimestamp(last_modified_time).strftime("%d %B %Y, %H:%M:%S")
@@ -108,17 +108,7 @@ def compliance_rate(filtered_df, desa_df, puskesmas_filter, kelurahan_filter):
 
     st.metric(label="Compliance Rate (%)", value=f"{compliance_value:.2f}%")
 
-    compliance_data = [
-        {
-            "Puskesmas": puskesmas,
-            "Jumlah Desa": desa_df[desa_df['Puskesmas'] == puskesmas]['Kelurahan'].nunique(),
-            "Jumlah Desa Lapor": filtered_df[filtered_df['Puskesmas'] == puskesmas]['Kelurahan'].nunique(),
-            "Compliance Rate (%)": f"{(filtered_df[filtered_df['Puskesmas'] == puskesmas]['Kelurahan'].nunique() / desa_df[desa_df['Puskesmas'] == puskesmas]['Kelurahan'].nunique() * 100) if desa_df[desa_df['Puskesmas'] == puskesmas]['Kelurahan'].nunique() else 0:.2f}%"
-        }
-        for puskesmas in sorted(desa_df['Puskesmas'].unique())
-    ]
-
-    compliance_df = pd.DataFrame(compliance_data)
+    compliance_df = reporting_coverage.compliance_table(filtered_df, desa_df)
     st.subheader("📋 Tabel Compliance Rate per Puskesmas")
     st.dataframe(compliance_df, use_container_width=True)
 
@@ -131,9 +121,7 @@ def compliance_rate(filtered_df, desa_df, puskesmas_filter, kelurahan_filter):
 
     if puskesmas_filter != "All":
         st.subheader(f"📊 Breakdown Compliance Rate di {puskesmas_filter}")
-        kelurahan_data = [{"Kelurahan": kel, "Status Laporan": "✅ Lapor" if kel in desa_terlapor else "❌ Tidak Lapor"}
-                         for kel in desa_df[desa_df['Puskesmas'] == puskesmas_filter]['Kelurahan'].unique()]
-        kelurahan_df = pd.DataFrame(kelurahan_data)
+        kelurahan_df = reporting_coverage.kelurahan_status(desa_df, puskesmas_filter, desa_terlapor)
         st.dataframe(kelurahan_df, use_container_width=True)
 
         fig_kelurahan = px.bar(kelurahan_df, x="Kelurahan", y=kelurahan_df['Status Laporan'].apply(lambda x: 100 if x == "✅ Lapor" else 0),
@@ -145,54 +133,35 @@ def compliance_rate(filtered_df, desa_df, puskesmas_filter, kelurahan_filter):
 # ----------------------------- #
 # 📋 Completeness Rate
 # ----------------------------- #
-def completeness_rate(filtered_df, desa_df, puskesmas_filter, kelurahan_filter):
+def completeness_rate(coverage_filters, desa_df, puskesmas_filter, kelurahan_filter):
     """Menghitung dan menampilkan tingkat kelengkapan data."""
     st.header("📋 Completeness Rate")
-    completeness_columns = [
-        "Jumlah_sasaran_balita", "Jumlah_balita_bulan_ini", "Jumlah_balita_ditimbang",
-        "Jumlah_balita_ditimbang_dan_diukur", "Jumlah_balita_diukur_PBTB", "Jumlah_balita_punya_KIA",
-        "Jumlah_balita_naik_berat_badannya_N", "Jumlah_balita_tidak_naik_berat_badannya_T",
-        "Jumlah_balita_tidak_ditimbang_bulan_lalu_O", "Jumlah_bayi_baru_lahir_bulan_ini_B",
-        "Jumlah_balita_ditimbang_terkoreksi_Daksen", "Jumlah_balita_stunting", "Jumlah_balita_wasting",
-        "Jumlah_balita_overweight", "Jumlah_balita_underweight", "Jumlah_Bayi_Mendapat_IMD",
-        "Jumlah_Bayi_usia_0-5_bulan", "Jumlah_Bayi_usia_0-5_bulan_yang_direcall",
-        "Jumlah_Bayi_usia_0-5_bulan_yang_mendapat_ASI_Eksklusif_berdasarkan_recall_24_jam"
-    ]
+    completeness_columns = reporting_coverage.COMPLETENESS_COLUMNS["data_balita_gizi"]
+
+    # Cube kelengkapan tersimpan saat upload (Tahun × Bulan × Puskesmas × Kelurahan) sesuai filter
+    try:
+        cube = reporting_coverage.load_coverage("data_balita_gizi", coverage_filters)
+    except Exception as e:
+        st.error(f"❌ Gagal memuat data kelengkapan: {e}")
+        return
 
-    missing_cols = [col for col in completeness_columns if col not in filtered_df.columns]
+    missing_cols = [col for col in completeness_columns if col not in cube.columns]
     if missing_cols:
         st.error(f"⚠️ Kolom berikut tidak ditemukan di dataset: {missing_cols}")
         return
 
-    filtered_df['Lengkap'] = filtered_df[completeness_columns].notna().all(axis=1)
-
     if kelurahan_filter != "All":
-        scope = filtered_df[filtered_df['Kelurahan'] == kelurahan_filter]
+        scope = reporting_coverage.slice_cube(cube, kelurahan=kelurahan_filter)
     elif puskesmas_filter != "All":
-        scope = filtered_df[filtered_df['Puskesmas'] == puskesmas_filter]
+        scope = reporting_coverage.slice_cube(cube, puskesmas=puskesmas_filter)
     else:
-        scope = filtered_df
-
-    lengkap_count = scope['Lengkap'].sum()
-    total_entries = scope.shape[0]
-    completeness_value = (lengkap_count / total_entries * 100) if total_entries else 0
+        scope = cube
+    completeness_value = reporting_coverage.completeness_value(scope)
 
     st.metric(label="Completeness Rate (%)", value=f"{completeness_value:.2f}%")
 
-    completeness_data = []
-    for puskesmas in sorted(desa_df['Puskesmas'].unique()):
-        df_pkm = filtered_df[filtered_df['Puskesmas'] == puskesmas]
-        total_entries_pkm = df_pkm.shape[0]
-        lengkap_entries_pkm = df_pkm['Lengkap'].sum()
-        rate = (lengkap_entries_pkm / total_entries_pkm * 100) if total_entries_pkm else 0
-        completeness_data.append({
-            "Puskesmas": puskesmas,
-            "Jumlah Entry": total_entries_pkm,
-            "Entry Lengkap": lengkap_entries_pkm,
-            "Completeness Rate (%)": f"{rate:.2f}%"
-        })
-
-    completeness_df = pd.DataFrame(completeness_data)
+    completeness_df = reporting_coverage.completeness_table(cube, desa_df).rename(
+        columns={"Jumlah Entri": "Jumlah Entry", "Entri Lengkap": "Entry Lengkap"})
     st.subheader("📊 Tabel Completeness Rate per Puskesmas")
     st.dataframe(completeness_df, use_container_width=True)
 
@@ -207,12 +176,51 @@ def completeness_rate(filtered_df, desa_df, puskesmas_filter, kelurahan_filter):
     
     # Detail kelengkapan per kolom (opsional)
     if st.checkbox("🔍 Tampilkan Detail Kelengkapan per Kolom"):
-        completeness_per_col = filtered_df[completeness_columns].notna().mean() * 100
+        completeness_per_col = reporting_coverage.column_completeness(cube, completeness_columns)
         st.subheader("📋 Persentase Kelengkapan per Kolom")
         col_data = [{"Kolom": col, "Kelengkapan (%)": f"{val:.2f}%"} 
                    for col, val in completeness_per_col.items()]
         st.dataframe(pd.DataFrame(col_data), use_container_width=True)
 # ----------------------------- #
+# 🗓️ Matriks Cakupan Pelaporan
+# ----------------------------- #
+def coverage_matrix(desa_df, puskesmas_filter, kelurahan_filter):
+    """Menampilkan heatmap cakupan pelaporan dan kelengkapan per kolom untuk seluruh bulan."""
+    st.header("🗓️ Matriks Cakupan Pelaporan")
+    try:
+        cube = reporting_coverage.load_coverage("data_balita_gizi")
+    except Exception as e:
+        st.error(f"❌ Gagal memuat matriks cakupan pelaporan: {e}")
+        return
+    if cube.empty:
+        st.warning("⚠️ Belum ada data untuk matriks cakupan pelaporan.")
+        return
+
+    # Cakupan pelaporan: compliance rate per Puskesmas, atau lapor/tidak per kelurahan
+    level = "Kelurahan" if puskesmas_filter != "All" else "Puskesmas"
+    reporting_df = reporting_coverage.reporting_matrix(cube, desa_df, puskesmas_filter)
+    st.subheader(f"📊 Cakupan Pelaporan per {level} × Bulan")
+    fig_reporting = px.imshow(reporting_df, text_auto=".0f", aspect="auto", zmin=0, zmax=100,
+                              color_continuous_scale="RdYlGn", title=f"Cakupan Pelaporan per {level} × Bulan Indikator Balita Gizi")
+    fig_reporting.update_layout(xaxis_title="Periode", yaxis_title=level, coloraxis_colorbar_title="Lapor (%)",
+                                title_x=0.5, height=max(400, 25 * len(reporting_df)))
+    st.plotly_chart(fig_reporting, key=f"coverage_reporting_{puskesmas_filter}_{time.time()}", use_container_width=True)
+
+    # Kelengkapan per kolom kunci di wilayah terpilih
+    scope = cube
+    if puskesmas_filter != "All":
+        scope = scope[scope['Puskesmas'] == puskesmas_filter]
+    if kelurahan_filter != "All":
+        scope = scope[scope['Kelurahan'] == kelurahan_filter]
+    completeness_df = reporting_coverage.completeness_matrix(scope)
+    st.subheader("📋 Kelengkapan per Kolom × Bulan")
+    fig_completeness = px.imshow(completeness_df, text_auto=".0f", aspect="auto", zmin=0, zmax=100,
+                                 color_continuous_scale="RdYlGn", title="Kelengkapan Data per Kolom × Bulan")
+    fig_completeness.update_layout(xaxis_title="Periode", yaxis_title="Kolom", coloraxis_colorbar_title="Terisi (%)",
+                                   title_x=0.5, height=max(400, 25 * len(completeness_df)))
+    st.plotly_chart(fig_completeness, key=f"coverage_completeness_{puskesmas_filter}_{kelurahan_filter}_{time.time()}", use_container_width=True)
+
+# ----------------------------- #
 # 📊 Analisis Pertumbuhan & Perkembangan
 # ----------------------------- #
 def calculate_growth_metric(current, previous):
@@ -223,7 +231,7 @@ def calculate_growth_metric(current, previous):
     icon = "🔼" if delta > 0 else "🔽"
     return current, f"{icon} {abs(delta):.2f}%"
 
-def growth_development_metrics(df, filtered_df, previous_df, desa_df, puskesmas_filter, kelurahan_filter, bulan_filter, tahun_filter):
+def growth_development_metrics(df, filtered_df, previous_df, desa_df, puskesmas_filter, kelurahan_filter, bulan_filter, tahun_filter, bulan_range=None):
     """Menghitung metrik pertumbuhan & perkembangan balita dan mengembalikan data untuk PDF."""
     total_bulan_ini = filtered_df["Jumlah_balita_bulan_ini"].sum()
     total_sasaran = filtered_df["Jumlah_sasaran_balita"].sum()
@@ -464,15 +472,25 @@ def growth_development_metrics(df, filtered_df, previous_df, desa_df, puskesmas_
     fig_bar.update_layout(xaxis_tickangle=-45)
     st.plotly_chart(fig_bar, key=f"bar_chart_{puskesmas_filter}_{kelurahan_filter}_{time.time()}", use_container_width=True)
 
-    # Tabel Rekapitulasi
-    summary_df = filtered_df.groupby("Puskesmas").agg({
-        "Jumlah_sasaran_balita": "sum",
-        "Jumlah_balita_bulan_ini": "sum",
-        "Jumlah_balita_ditimbang_dan_diukur": "sum",
-        "Jumlah_balita_naik_berat_badannya_N": "sum",
-        "Jumlah_balita_ditimbang_terkoreksi_Daksen": "sum",
-        "Jumlah_balita_ditimbang": "sum"
-    }).reset_index()
+    # Tabel Rekapitulasi (dari rollup puskesmas/kelurahan bila tersedia)
+    summary_cols = [
+        "Jumlah_sasaran_balita",
+        "Jumlah_balita_bulan_ini",
+        "Jumlah_balita_ditimbang_dan_diukur",
+        "Jumlah_balita_naik_berat_badannya_N",
+        "Jumlah_balita_ditimbang_terkoreksi_Daksen",
+        "Jumlah_balita_ditimbang"
+    ]
+    summary_df = None
+    if not filtered_df.empty:
+        summary_df = rollup.summarize_by(
+            "data_balita_gizi", ["Puskesmas"], summary_cols,
+            tahun=tahun_filter, bulan=bulan_range or bulan_filter,
+            puskesmas=puskesmas_filter, kelurahan=kelurahan_filter,
+            period="tribulan" if bulan_range else "bulan",
+        )
+    if summary_df is None:
+        summary_df = filtered_df.groupby("Puskesmas")[summary_cols].sum().reset_index()
 
     summary_df["% Balita ditimbang dan diukur"] = (summary_df["Jumlah_balita_ditimbang_dan_diukur"] / summary_df["Jumlah_balita_bulan_ini"] * 100).round(2)
     summary_df["% N/D koreksi"] = (summary_df["Jumlah_balita_naik_berat_badannya_N"] / summary_df["Jumlah_balita_ditimbang_terkoreksi_Daksen"] * 100).round(2)
@@ -713,7 +731,6 @@ def growth_development_metrics(df, filtered_df, previous_df, desa_df, puskesmas_
             st.success("✅ Tidak ada outlier terdeteksi berdasarkan kriteria Numerator > Denominator atau Denominator = 0.")
 
         # 2. ⚙️ Analisis Outlier Statistik
-        from scipy import stats
 
         # Daftar kolom metrik untuk analisis statistik (kolom persentase yang sudah dihitung)
         cols_to_check = [
@@ -732,72 +749,23 @@ def growth_development_metrics(df, filtered_df, previous_df, desa_df, puskesmas_
             "Prevalensi Overweight"
         ]
 
-        # Inisialisasi DataFrame untuk outlier statistik
-        base_columns = ["Puskesmas", "Metrik", "Nilai", "Metode"]
-        if puskesmas_filter != "All":
-            base_columns.insert(1, "Kelurahan")
-        statistical_outliers_df = pd.DataFrame(columns=base_columns)
-
         st.subheader("⚙️ Analisis Outlier Statistik")
         outlier_method = st.selectbox(
             "Pilih Metode Deteksi Outlier Statistik",
-            ["Tidak Ada", "Z-Score", "IQR"],
+            outlier_detection.OUTLIER_METHODS,
             key="outlier_method_select_growth"
         )
 
-        if outlier_method != "Tidak Ada":
-            for metric in cols_to_check:
-                if metric not in filtered_df.columns:
-                    continue
-
-                # Pilih kolom berdasarkan filter
-                if puskesmas_filter == "All":
-                    metric_data = filtered_df[[metric, "Puskesmas"]].dropna()
-                else:
-                    metric_data = filtered_df[[metric, "Puskesmas", "Kelurahan"]].dropna()
-
-                if metric_data.empty:
-                    continue
-
-                # Z-Score Method
-                if outlier_method == "Z-Score":
-                    z_scores = stats.zscore(metric_data[metric], nan_policy='omit')
-                    z_outlier_mask = abs(z_scores) > 3  # Threshold Z-Score > 3
-                    z_outliers = metric_data[z_outlier_mask].copy()
-                    if not z_outliers.empty:
-                        z_outliers["Metrik"] = metric
-                        z_outliers["Nilai"] = z_outliers[metric]
-                        z_outliers["Metode"] = "Z-Score"
-                        if puskesmas_filter == "All":
-                            z_outliers_subset = z_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                        else:
-                            z_outliers_subset = z_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                        statistical_outliers_df = pd.concat(
-                            [statistical_outliers_df, z_outliers_subset],
-                            ignore_index=True
-                        )
-
-                # IQR Method
-                elif outlier_method == "IQR":
-                    Q1 = metric_data[metric].quantile(0.25)
-                    Q3 = metric_data[metric].quantile(0.75)
-                    IQR = Q3 - Q1
-                    lower_bound = Q1 - 1.5 * IQR
-                    upper_bound = Q3 + 1.5 * IQR
-                    iqr_outlier_mask = (metric_data[metric] < lower_bound) | (metric_data[metric] > upper_bound)
-                    iqr_outliers = metric_data[iqr_outlier_mask].copy()
-                    if not iqr_outliers.empty:
-                        iqr_outliers["Metrik"] = metric
-                        iqr_outliers["Nilai"] = iqr_outliers[metric]
-                        iqr_outliers["Metode"] = "IQR"
-                        if puskesmas_filter == "All":
-                            iqr_outliers_subset = iqr_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                        else:
-                            iqr_outliers_subset = iqr_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                        statistical_outliers_df = pd.concat(
-                            [statistical_outliers_df, iqr_outliers_subset],
-                            ignore_index=True
-                        )
+        statistical_outliers_df = outlier_detection.statistical_outliers(
+            filtered_df, cols_to_check, outlier_method, puskesmas_filter,
+            cache_key=outlier_detection.cache_key(
+                "growth_development_metrics", ["data_balita_gizi", "dataset_desa"], puskesmas_filter, kelurahan_filter, bulan_filter, tahun_filter, bulan_range
+            ),
+            table_name="data_balita_gizi",
+            flag_filters=outlier_detection.flag_filters(
+                puskesmas_filter, kelurahan_filter, tahun=tahun_filter, periode=bulan_range or bulan_filter,
+            ),
+        )
 
         # Tampilkan Tabel Outlier Statistik
         if not statistical_outliers_df.empty:
@@ -1562,7 +1530,6 @@ def asi_exclusive_mpasi_analysis(filtered_df, previous_df, desa_df, puskesmas_fi
         st.success("✅ Tidak ada outlier terdeteksi berdasarkan kriteria Numerator > Denominator atau Denominator = 0.")
     
     # Tambahan: Analisis Outlier dengan Z-Score dan IQR
-    from scipy import stats
 
     # Daftar kolom metrik untuk analisis statistik
     cols_to_check = [
@@ -1576,76 +1543,24 @@ def asi_exclusive_mpasi_analysis(filtered_df, previous_df, desa_df, puskesmas_fi
         'Metrik Anak Usia 6-23 Bulan Mendapat MPASI Baik (%)'
     ]
 
-    # Inisialisasi DataFrame untuk outlier statistik
-    # Kolom "Kelurahan" akan ditambahkan hanya jika tersedia
-    base_columns = ["Puskesmas", "Metrik", "Nilai", "Metode"]
-    if puskesmas_filter != "All":
-        base_columns.insert(1, "Kelurahan")
-    statistical_outliers_df = pd.DataFrame(columns=base_columns)
-
     # Dropdown untuk memilih metode deteksi outlier statistik
     st.subheader("⚙️ Analisis Outlier Statistik")
     outlier_method = st.selectbox(
         "Pilih Metode Deteksi Outlier Statistik",
-        ["Tidak Ada", "Z-Score", "IQR"],
+        outlier_detection.OUTLIER_METHODS,
         key="outlier_method_select"
     )
 
-    if outlier_method != "Tidak Ada":
-        for metric in cols_to_check:
-            if metric not in current_df.columns:
-                continue
-
-            # Pilih kolom berdasarkan filter
-            if puskesmas_filter == "All":
-                metric_data = current_df[[metric, "Puskesmas"]].dropna()
-            else:
-                metric_data = current_df[[metric, "Puskesmas", "Kelurahan"]].dropna()
-
-            if metric_data.empty:
-                continue
-
-            # Z-Score Method
-            if outlier_method == "Z-Score":
-                z_scores = stats.zscore(metric_data[metric], nan_policy='omit')
-                z_outlier_mask = abs(z_scores) > 3  # Threshold Z-Score > 3
-                z_outliers = metric_data[z_outlier_mask].copy()
-                if not z_outliers.empty:
-                    z_outliers["Metrik"] = metric
-                    z_outliers["Nilai"] = z_outliers[metric]
-                    z_outliers["Metode"] = "Z-Score"
-                    # Pilih kolom yang sesuai berdasarkan filter
-                    if puskesmas_filter == "All":
-                        z_outliers_subset = z_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        z_outliers_subset = z_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat(
-                        [statistical_outliers_df, z_outliers_subset],
-                        ignore_index=True
-                    )
-
-            # IQR Method
-            elif outlier_method == "IQR":
-                Q1 = metric_data[metric].quantile(0.25)
-                Q3 = metric_data[metric].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                iqr_outlier_mask = (metric_data[metric] < lower_bound) | (metric_data[metric] > upper_bound)
-                iqr_outliers = metric_data[iqr_outlier_mask].copy()
-                if not iqr_outliers.empty:
-                    iqr_outliers["Metrik"] = metric
-                    iqr_outliers["Nilai"] = iqr_outliers[metric]
-                    iqr_outliers["Metode"] = "IQR"
-                    # Pilih kolom yang sesuai berdasarkan filter
-                    if puskesmas_filter == "All":
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat(
-                        [statistical_outliers_df, iqr_outliers_subset],
-                        ignore_index=True
-                    )
+    statistical_outliers_df = outlier_detection.statistical_outliers(
+        current_df, cols_to_check, outlier_method, puskesmas_filter,
+        cache_key=outlier_detection.cache_key(
+            "asi_exclusive_mpasi_analysis", ["data_balita_gizi", "dataset_desa"], puskesmas_filter, kelurahan_filter, bulan_filter, jenis_laporan
+        ),
+        table_name="data_balita_gizi",
+        flag_filters=outlier_detection.flag_filters(
+            puskesmas_filter, kelurahan_filter, periode=bulan_filter,
+        ),
+    )
 
     # Tampilkan Tabel Outlier Statistik
     if not statistical_outliers_df.empty:
@@ -2799,63 +2714,24 @@ def tatalaksana_balita_bermasalah_gizi_analysis(df, desa_df, bulan_filter_int, p
         "Balita Stunting Dirujuk ke RS (%)"
     ]
 
-    base_columns = ["Puskesmas", "Metrik", "Nilai", "Metode"]
-    if puskesmas_filter != "All":
-        base_columns.insert(1, "Kelurahan")
-    statistical_outliers_df = pd.DataFrame(columns=base_columns)
 
     st.subheader("⚙️ Analisis Outlier Statistik")
-    outlier_method = st.selectbox(
-        "Pilih Metode Deteksi Outlier Statistik",
-        ["Tidak Ada", "Z-Score", "IQR"],
-        key="tatalaksana_outlier_method_select"
-    )
-
-    if outlier_method != "Tidak Ada":
-        from scipy import stats
-        for metric in cols_to_check:
-            if metric not in summary_df.columns:
-                continue
-
-            if puskesmas_filter == "All":
-                metric_data = summary_df[[metric, "Puskesmas"]].dropna()
-            else:
-                metric_data = summary_df[[metric, "Puskesmas", "Kelurahan"]].dropna()
-
-            if metric_data.empty:
-                continue
+    outlier_method = st.selectbox(
+        "Pilih Metode Deteksi Outlier Statistik",
+        outlier_detection.OUTLIER_METHODS,
+        key="tatalaksana_outlier_method_select"
+    )
 
-            if outlier_method == "Z-Score":
-                z_scores = stats.zscore(metric_data[metric], nan_policy='omit')
-                z_outlier_mask = abs(z_scores) > 3
-                z_outliers = metric_data[z_outlier_mask].copy()
-                if not z_outliers.empty:
-                    z_outliers["Metrik"] = metric
-                    z_outliers["Nilai"] = z_outliers[metric]
-                    z_outliers["Metode"] = "Z-Score"
-                    if puskesmas_filter == "All":
-                        z_outliers_subset = z_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        z_outliers_subset = z_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat([statistical_outliers_df, z_outliers_subset], ignore_index=True)
-
-            elif outlier_method == "IQR":
-                Q1 = metric_data[metric].quantile(0.25)
-                Q3 = metric_data[metric].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                iqr_outlier_mask = (metric_data[metric] < lower_bound) | (metric_data[metric] > upper_bound)
-                iqr_outliers = metric_data[iqr_outlier_mask].copy()
-                if not iqr_outliers.empty:
-                    iqr_outliers["Metrik"] = metric
-                    iqr_outliers["Nilai"] = iqr_outliers[metric]
-                    iqr_outliers["Metode"] = "IQR"
-                    if puskesmas_filter == "All":
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat([statistical_outliers_df, iqr_outliers_subset], ignore_index=True)
+    statistical_outliers_df = outlier_detection.statistical_outliers(
+        summary_df, cols_to_check, outlier_method, puskesmas_filter,
+        cache_key=outlier_detection.cache_key(
+            "tatalaksana_balita_bermasalah_gizi_analysis", ["data_balita_gizi", "dataset_desa"], bulan_filter_int, puskesmas_filter, kelurahan_filter, jenis_laporan
+        ),
+        table_name="data_balita_gizi",
+        flag_filters=outlier_detection.flag_filters(
+            puskesmas_filter, kelurahan_filter, periode=bulan_filter_int,
+        ),
+    )
 
     # 📊 Tabel Outlier Statistik
     if not statistical_outliers_df.empty:
@@ -3651,7 +3527,6 @@ def micronutrient_supplementation_analysis(filtered_df, previous_df, desa_df, pu
         st.success("✅ Tidak ada outlier terdeteksi berdasarkan kriteria Numerator > Denominator atau Denominator = 0.")
 
     # Tambahan: Analisis Outlier dengan Z-Score dan IQR
-    from scipy import stats
 
     # Daftar kolom metrik untuk analisis statistik
     cols_to_check = [
@@ -3660,73 +3535,24 @@ def micronutrient_supplementation_analysis(filtered_df, previous_df, desa_df, pu
         "Metrik Balita yang Mendapatkan Suplementasi Gizi Mikro (%)"
     ]
 
-    # Inisialisasi DataFrame untuk outlier statistik
-    base_columns = ["Puskesmas", "Metrik", "Nilai", "Metode"]
-    if puskesmas_filter != "All":
-        base_columns.insert(1, "Kelurahan")
-    statistical_outliers_df = pd.DataFrame(columns=base_columns)
-
     # Dropdown untuk memilih metode deteksi outlier statistik
     st.subheader("⚙️ Analisis Outlier Statistik")
     outlier_method = st.selectbox(
         "Pilih Metode Deteksi Outlier Statistik",
-        ["Tidak Ada", "Z-Score", "IQR"],
+        outlier_detection.OUTLIER_METHODS,
         key="micronutrients_outlier_method_select"
     )
 
-    if outlier_method != "Tidak Ada":
-        for metric in cols_to_check:
-            if metric not in current_df.columns:
-                continue
-
-            # Pilih kolom berdasarkan filter
-            if puskesmas_filter == "All":
-                metric_data = current_df[[metric, "Puskesmas"]].dropna()
-            else:
-                metric_data = current_df[[metric, "Puskesmas", "Kelurahan"]].dropna()
-
-            if metric_data.empty:
-                continue
-
-            # Z-Score Method
-            if outlier_method == "Z-Score":
-                z_scores = stats.zscore(metric_data[metric], nan_policy='omit')
-                z_outlier_mask = abs(z_scores) > 3  # Threshold Z-Score > 3
-                z_outliers = metric_data[z_outlier_mask].copy()
-                if not z_outliers.empty:
-                    z_outliers["Metrik"] = metric
-                    z_outliers["Nilai"] = z_outliers[metric]
-                    z_outliers["Metode"] = "Z-Score"
-                    if puskesmas_filter == "All":
-                        z_outliers_subset = z_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        z_outliers_subset = z_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat(
-                        [statistical_outliers_df, z_outliers_subset],
-                        ignore_index=True
-                    )
-
-            # IQR Method
-            elif outlier_method == "IQR":
-                Q1 = metric_data[metric].quantile(0.25)
-                Q3 = metric_data[metric].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                iqr_outlier_mask = (metric_data[metric] < lower_bound) | (metric_data[metric] > upper_bound)
-                iqr_outliers = metric_data[iqr_outlier_mask].copy()
-                if not iqr_outliers.empty:
-                    iqr_outliers["Metrik"] = metric
-                    iqr_outliers["Nilai"] = iqr_outliers[metric]
-                    iqr_outliers["Metode"] = "IQR"
-                    if puskesmas_filter == "All":
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat(
-                        [statistical_outliers_df, iqr_outliers_subset],
-                        ignore_index=True
-                    )
+    statistical_outliers_df = outlier_detection.statistical_outliers(
+        current_df, cols_to_check, outlier_method, puskesmas_filter,
+        cache_key=outlier_detection.cache_key(
+            "micronutrient_supplementation_analysis", ["data_balita_gizi", "dataset_desa"], puskesmas_filter, kelurahan_filter, bulan_filter, jenis_laporan
+        ),
+        table_name="data_balita_gizi",
+        flag_filters=outlier_detection.flag_filters(
+            puskesmas_filter, kelurahan_filter, periode=bulan_filter,
+        ),
+    )
 
     # Tampilkan Tabel Outlier Statistik
     if not statistical_outliers_df.empty:
@@ -4172,6 +3998,10 @@ def show_dashboard():
             agg_dict = {col: "sum" for col in numeric_columns}  # Gunakan sum alih-alih mean
             filtered_df = filtered_df.groupby(group_columns).agg(agg_dict).reset_index()
 
+    # Filter yang sama untuk cube kelengkapan tersimpan (bukan filtered_df yang sudah diagregasi)
+    coverage_filters = reporting_coverage.coverage_filters(
+        tahun_filter, bulan_filter if jenis_laporan == "Laporan Bulanan" else bulan_range, puskesmas_filter, kelurahan_filter)
+
     # Menu Utama dengan Tabs (Diubah dari sidebar radio ke tabs di main page)
     st.subheader("📂 Pilih Dashboard")
     tab1, tab2 = st.tabs(["📊 Kelengkapan Data Laporan", "📈 Analisis Indikator Balita"])
@@ -4179,11 +4009,13 @@ def show_dashboard():
     # Tab 1: Kelengkapan Data Laporan
     with tab1:
         st.subheader("🔍 Pilih Analisis")
-        subtab1, subtab2 = st.tabs(["✅ Compliance Rate", "📋 Completeness Rate"])
+        subtab1, subtab2, subtab3 = st.tabs(["✅ Compliance Rate", "📋 Completeness Rate", "🗓️ Matriks Cakupan Pelaporan"])
         with subtab1:
             compliance_rate(filtered_df, desa_df, puskesmas_filter, kelurahan_filter)
         with subtab2:
-            completeness_rate(filtered_df, desa_df, puskesmas_filter, kelurahan_filter)
+            completeness_rate(coverage_filters, desa_df, puskesmas_filter, kelurahan_filter)
+        with subtab3:
+            coverage_matrix(desa_df, puskesmas_filter, kelurahan_filter)
 
     # Tab 2: Analisis Indikator Balita
     with tab2:
@@ -4196,7 +4028,7 @@ def show_dashboard():
             "🧑‍⚕️ Tatalaksana Balita Bermasalah Gizi"
         ])
         with subtab1:
-            metrics, summary_df, fig_bar, fig_line = growth_development_metrics(df, filtered_df, previous_df, desa_df, puskesmas_filter, kelurahan_filter, bulan_filter_int, tahun_filter)
+            metrics, summary_df, fig_bar, fig_line = growth_development_metrics(df, filtered_df, previous_df, desa_df, puskesmas_filter, kelurahan_filter, bulan_filter_int, tahun_filter, bulan_range)
 
             # Tombol Download untuk Pertumbuhan & Perkembangan (tanpa perubahan)
             def generate_pdf_growth(metrics, summary_df, fig_bar, fig_line, filter_info):
@@ -1,7 +1,9 @@
 import streamlit as st
 import numpy as np
 import pandas as pd
-import sqlite3
+import data_access
+import outlier_detection
+import reporting_coverage
 import plotly.express as px
 import os
 from datetime import datetime
@@ -11,19 +13,15 @@ from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from io import BytesIO
-from scipy import stats
 
 # ----------------------------- #
 # 📥 Fungsi untuk load data
 # ----------------------------- #
-@st.cache_data
 def load_data():
     """Memuat data dari database SQLite rcs_data.db."""
     try:
-        conn = sqlite3.connect("rcs_data.db")
-        df = pd.read_sql_query("SELECT * FROM data_balita_kia", conn)
-        desa_df = pd.read_sql_query("SELECT * FROM dataset_desa", conn)
-        conn.close()
+        df = data_access.load_balita_kia()
+        desa_df = data_access.load_dataset_desa()
         # Hapus duplikat jika ada
         df = df.drop_duplicates()
         desa_df = desa_df.drop_duplicates()
@@ -38,7 +36,7 @@ def load_data():
 def get_last_upload_time():
     """Mengembalikan waktu terakhir modifikasi file database."""
     try:
-        file_path = "rcs_data.db"
+        file_path = data_access.active_db_path(data_access.RCS_DB_PATH)
         print(f"Checking file path: {os.path.abspath(file_path)}")  # Debug path
         if not os.path.exists(file_path):
             return "Belum ada data yang diunggah (File database tidak ditemukan)"
@@ -69,17 +67,7 @@ def compliance_rate(filtered_df, desa_df, puskesmas_filter, kelurahan_filter):
 
     st.metric(label="Compliance Rate (%)", value=f"{compliance_value:.2f}%")
 
-    compliance_data = [
-        {
-            "Puskesmas": puskesmas,
-            "Jumlah Desa": desa_df[desa_df['Puskesmas'] == puskesmas]['Kelurahan'].nunique(),
-            "Jumlah Desa Lapor": filtered_df[filtered_df['Puskesmas'] == puskesmas]['Kelurahan'].nunique(),
-            "Compliance Rate (%)": f"{(filtered_df[filtered_df['Puskesmas'] == puskesmas]['Kelurahan'].nunique() / desa_df[desa_df['Puskesmas'] == puskesmas]['Kelurahan'].nunique() * 100) if desa_df[desa_df['Puskesmas'] == puskesmas]['Kelurahan'].nunique() else 0:.2f}%"
-        }
-        for puskesmas in sorted(desa_df['Puskesmas'].unique())
-    ]
-
-    compliance_df = pd.DataFrame(compliance_data)
+    compliance_df = reporting_coverage.compliance_table(filtered_df, desa_df)
     st.subheader("📋 Tabel Compliance Rate per Puskesmas")
     st.dataframe(compliance_df, use_container_width=True)
 
@@ -92,9 +80,7 @@ def compliance_rate(filtered_df, desa_df, puskesmas_filter, kelurahan_filter):
 
     if puskesmas_filter != "All":
         st.subheader(f"📊 Breakdown Compliance Rate di {puskesmas_filter}")
-        kelurahan_data = [{"Kelurahan": kel, "Status Laporan": "✅ Lapor" if kel in desa_terlapor else "❌ Tidak Lapor"}
-                         for kel in desa_df[desa_df['Puskesmas'] == puskesmas_filter]['Kelurahan'].unique()]
-        kelurahan_df = pd.DataFrame(kelurahan_data)
+        kelurahan_df = reporting_coverage.kelurahan_status(desa_df, puskesmas_filter, desa_terlapor)
         st.dataframe(kelurahan_df, use_container_width=True)
 
         fig_kelurahan = px.bar(kelurahan_df, x="Kelurahan", y=kelurahan_df['Status Laporan'].apply(lambda x: 100 if x == "✅ Lapor" else 0),
@@ -106,64 +92,40 @@ def compliance_rate(filtered_df, desa_df, puskesmas_filter, kelurahan_filter):
 # ----------------------------- #
 # 📋 Completeness Rate
 # ----------------------------- #
-def completeness_rate(filtered_df, desa_df, puskesmas_filter, kelurahan_filter):
+def completeness_rate(coverage_filters, desa_df, puskesmas_filter, kelurahan_filter):
     """Menghitung dan menampilkan tingkat kelengkapan data berdasarkan variabel kunci."""
     st.header("📋 Completeness Rate")
 
     # Daftar kolom kunci untuk cek kelengkapan (subset dari data_balita_kia)
-    completeness_columns = [
-        "Jumlah_bayi_baru_lahir_hidup",
-        "Jumlah_bayi_BBLR",
-        "Jumlah_bayi_prematur_dan_BBLR_yang_mendapat_buku_KIA_bayi_kecil",
-        "Jumlah_anak_prasekolah_bulan_ini",
-        "Jumlah_anak_prasekolah_punya_Buku_KIA",
-        "Jumlah_balita_diskrining_perkembangan",
-        "Jumlah_balita_usia_12-59_bulan_sampai_bulan_ini",
-        "Jumlah_balita_pantau_tumbang",
-        "Jumlah_balita_mendapat_pelayanan_SDIDTK_di_FKTP",
-        "Cakupan_bayi_dilayani_PKAT"
-    ]
+    completeness_columns = reporting_coverage.COMPLETENESS_COLUMNS["data_balita_kia"]
+
+    # Cube kelengkapan tersimpan saat upload (Tahun × Bulan × Puskesmas × Kelurahan) sesuai filter
+    try:
+        cube = reporting_coverage.load_coverage("data_balita_kia", coverage_filters)
+    except Exception as e:
+        st.error(f"❌ Gagal memuat data kelengkapan: {e}")
+        return
 
     # Cek kolom yang hilang di dataset
-    missing_cols = [col for col in completeness_columns if col not in filtered_df.columns]
+    missing_cols = [col for col in completeness_columns if col not in cube.columns]
     if missing_cols:
         st.error(f"⚠️ Kolom berikut tidak ditemukan di dataset: {missing_cols}")
         return
 
-    # Tambahkan kolom 'Lengkap' untuk mengecek apakah semua kolom kunci terisi
-    filtered_df['Lengkap'] = filtered_df[completeness_columns].notna().all(axis=1)
-
-    # Tentukan scope berdasarkan filter
+    # Tentukan scope berdasarkan filter, lalu hitung completeness rate
     if kelurahan_filter != "All":
-        scope = filtered_df[filtered_df['Kelurahan'] == kelurahan_filter]
+        scope = reporting_coverage.slice_cube(cube, kelurahan=kelurahan_filter)
     elif puskesmas_filter != "All":
-        scope = filtered_df[filtered_df['Puskesmas'] == puskesmas_filter]
+        scope = reporting_coverage.slice_cube(cube, puskesmas=puskesmas_filter)
     else:
-        scope = filtered_df
-
-    # Hitung completeness rate
-    lengkap_count = scope['Lengkap'].sum()
-    total_entries = scope.shape[0]
-    completeness_value = (lengkap_count / total_entries * 100) if total_entries else 0
+        scope = cube
+    completeness_value = reporting_coverage.completeness_value(scope)
 
     st.metric(label="Completeness Rate (%)", value=f"{completeness_value:.2f}%",
               help="Persentase entri dengan semua kolom kunci terisi lengkap.")
 
     # Tabel Completeness Rate per Puskesmas
-    completeness_data = []
-    for puskesmas in sorted(desa_df['Puskesmas'].unique()):
-        df_pkm = filtered_df[filtered_df['Puskesmas'] == puskesmas]
-        total_entries_pkm = df_pkm.shape[0]
-        lengkap_entries_pkm = df_pkm['Lengkap'].sum()
-        rate = (lengkap_entries_pkm / total_entries_pkm * 100) if total_entries_pkm else 0
-        completeness_data.append({
-            "Puskesmas": puskesmas,
-            "Jumlah Entri": total_entries_pkm,
-            "Entri Lengkap": lengkap_entries_pkm,
-            "Completeness Rate (%)": f"{rate:.2f}%"
-        })
-
-    completeness_df = pd.DataFrame(completeness_data)
+    completeness_df = reporting_coverage.completeness_table(cube, desa_df)
     st.subheader("📊 Tabel Completeness Rate per Puskesmas")
     st.dataframe(completeness_df, use_container_width=True)
 
@@ -183,7 +145,7 @@ def completeness_rate(filtered_df, desa_df, puskesmas_filter, kelurahan_filter):
 
     # Detail kelengkapan per kolom (opsional)
     if st.checkbox("🔍 Tampilkan Detail Kelengkapan per Kolom"):
-        completeness_per_col = filtered_df[completeness_columns].notna().mean() * 100
+        completeness_per_col = reporting_coverage.column_completeness(cube, completeness_columns)
         st.subheader("📋 Persentase Kelengkapan per Kolom")
         col_data = [{"Kolom": col, "Kelengkapan (%)": f"{val:.2f}%"} 
                     for col, val in completeness_per_col.items()]
@@ -609,72 +571,24 @@ def indikator_bayi_kecil(filtered_df, desa_df, puskesmas_filter, kelurahan_filte
     # Gunakan recap_df yang sudah dihitung persentasenya
     cols_to_check = list(indikator_data.keys())
 
-    # Inisialisasi DataFrame untuk outlier statistik
-    base_columns = ["Puskesmas", "Metrik", "Nilai", "Metode"]
-    if puskesmas_filter != "All":
-        base_columns.insert(1, "Kelurahan")
-    statistical_outliers_df = pd.DataFrame(columns=base_columns)
-
     # Dropdown untuk memilih metode deteksi outlier statistik
     outlier_method = st.selectbox(
         "Pilih Metode Deteksi Outlier Statistik",
-        ["Tidak Ada", "Z-Score", "IQR"],
+        outlier_detection.OUTLIER_METHODS,
         key=f"outlier_method_select_bayi_kecil_{periode_label}"
     )
 
-    if outlier_method != "Tidak Ada":
-        for metric in cols_to_check:
-            if metric not in recap_df.columns:
-                continue
-
-            # Pilih kolom berdasarkan filter
-            if puskesmas_filter == "All":
-                metric_data = recap_df[[metric, "Puskesmas"]].dropna()
-            else:
-                metric_data = recap_df[[metric, "Puskesmas", "Kelurahan"]].dropna()
-
-            if metric_data.empty:
-                continue
-
-            # Z-Score Method
-            if outlier_method == "Z-Score":
-                z_scores = stats.zscore(metric_data[metric], nan_policy='omit')
-                z_outlier_mask = abs(z_scores) > 3  # Threshold Z-Score > 3
-                z_outliers = metric_data[z_outlier_mask].copy()
-                if not z_outliers.empty:
-                    z_outliers["Metrik"] = metric
-                    z_outliers["Nilai"] = z_outliers[metric]
-                    z_outliers["Metode"] = "Z-Score"
-                    if puskesmas_filter == "All":
-                        z_outliers_subset = z_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        z_outliers_subset = z_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat(
-                        [statistical_outliers_df, z_outliers_subset],
-                        ignore_index=True
-                    )
-
-            # IQR Method
-            elif outlier_method == "IQR":
-                Q1 = metric_data[metric].quantile(0.25)
-                Q3 = metric_data[metric].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                iqr_outlier_mask = (metric_data[metric] < lower_bound) | (metric_data[metric] > upper_bound)
-                iqr_outliers = metric_data[iqr_outlier_mask].copy()
-                if not iqr_outliers.empty:
-                    iqr_outliers["Metrik"] = metric
-                    iqr_outliers["Nilai"] = iqr_outliers[metric]
-                    iqr_outliers["Metode"] = "IQR"
-                    if puskesmas_filter == "All":
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat(
-                        [statistical_outliers_df, iqr_outliers_subset],
-                        ignore_index=True
-                    )
+    statistical_outliers_df = outlier_detection.statistical_outliers(
+        recap_df, cols_to_check, outlier_method, puskesmas_filter,
+        cache_key=outlier_detection.cache_key(
+            "indikator_bayi_kecil", ["data_balita_kia", "dataset_desa"], puskesmas_filter, kelurahan_filter, jenis_laporan, tahun_filter, bulan_filter_int, tribulan_filter
+        ),
+        table_name="data_balita_kia",
+        flag_filters=outlier_detection.flag_filters(
+            puskesmas_filter, kelurahan_filter, tahun=tahun_filter,
+            periode=bulan_filter_int if jenis_laporan == "Bulanan" else tribulan_filter,
+        ),
+    )
 
     # 3.3 📊 Tabel Outlier Statistik
     if not statistical_outliers_df.empty:
@@ -1377,72 +1291,24 @@ def pemantauan_tumbuh_kembang_balita(filtered_df, desa_df, puskesmas_filter, kel
     # Gunakan recap_df yang sudah dihitung persentasenya
     cols_to_check = list(metrik_data.keys())
 
-    # Inisialisasi DataFrame untuk outlier statistik
-    base_columns = ["Puskesmas", "Metrik", "Nilai", "Metode"]
-    if puskesmas_filter != "All":
-        base_columns.insert(1, "Kelurahan")
-    statistical_outliers_df = pd.DataFrame(columns=base_columns)
-
     # Dropdown untuk memilih metode deteksi outlier statistik
     outlier_method = st.selectbox(
         "Pilih Metode Deteksi Outlier Statistik",
-        ["Tidak Ada", "Z-Score", "IQR"],
+        outlier_detection.OUTLIER_METHODS,
         key=f"outlier_method_select_tumbuh_kembang_{periode_label}"
     )
 
-    if outlier_method != "Tidak Ada":
-        for metric in cols_to_check:
-            if metric not in recap_df.columns:
-                continue
-
-            # Pilih kolom berdasarkan filter
-            if puskesmas_filter == "All":
-                metric_data = recap_df[[metric, "Puskesmas"]].dropna()
-            else:
-                metric_data = recap_df[[metric, "Puskesmas", "Kelurahan"]].dropna()
-
-            if metric_data.empty:
-                continue
-
-            # Z-Score Method
-            if outlier_method == "Z-Score":
-                z_scores = stats.zscore(metric_data[metric], nan_policy='omit')
-                z_outlier_mask = abs(z_scores) > 3  # Threshold Z-Score > 3
-                z_outliers = metric_data[z_outlier_mask].copy()
-                if not z_outliers.empty:
-                    z_outliers["Metrik"] = metric
-                    z_outliers["Nilai"] = z_outliers[metric]
-                    z_outliers["Metode"] = "Z-Score"
-                    if puskesmas_filter == "All":
-                        z_outliers_subset = z_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        z_outliers_subset = z_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat(
-                        [statistical_outliers_df, z_outliers_subset],
-                        ignore_index=True
-                    )
-
-            # IQR Method
-            elif outlier_method == "IQR":
-                Q1 = metric_data[metric].quantile(0.25)
-                Q3 = metric_data[metric].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                iqr_outlier_mask = (metric_data[metric] < lower_bound) | (metric_data[metric] > upper_bound)
-                iqr_outliers = metric_data[iqr_outlier_mask].copy()
-                if not iqr_outliers.empty:
-                    iqr_outliers["Metrik"] = metric
-                    iqr_outliers["Nilai"] = iqr_outliers[metric]
-                    iqr_outliers["Metode"] = "IQR"
-                    if puskesmas_filter == "All":
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat(
-                        [statistical_outliers_df, iqr_outliers_subset],
-                        ignore_index=True
-                    )
+    statistical_outliers_df = outlier_detection.statistical_outliers(
+        recap_df, cols_to_check, outlier_method, puskesmas_filter,
+        cache_key=outlier_detection.cache_key(
+            "pemantauan_tumbuh_kembang_balita", ["data_balita_kia", "dataset_desa"], puskesmas_filter, kelurahan_filter, jenis_laporan, tahun_filter, bulan_filter_int, tribulan_filter
+        ),
+        table_name="data_balita_kia",
+        flag_filters=outlier_detection.flag_filters(
+            puskesmas_filter, kelurahan_filter, tahun=tahun_filter,
+            periode=bulan_filter_int if jenis_laporan == "Bulanan" else tribulan_filter,
+        ),
+    )
 
     # 3.3 📊 Tabel Outlier Statistik
     if not statistical_outliers_df.empty:
@@ -1894,6 +1760,45 @@ def pemantauan_tumbuh_kembang_balita(filtered_df, desa_df, puskesmas_filter, kel
             mime="application/pdf"
         )
 # ----------------------------- #
+# 🗓️ Matriks Cakupan Pelaporan
+# ----------------------------- #
+def coverage_matrix(desa_df, puskesmas_filter, kelurahan_filter):
+    """Menampilkan heatmap cakupan pelaporan dan kelengkapan per kolom untuk seluruh bulan."""
+    st.header("🗓️ Matriks Cakupan Pelaporan")
+    try:
+        cube = reporting_coverage.load_coverage("data_balita_kia")
+    except Exception as e:
+        st.error(f"❌ Gagal memuat matriks cakupan pelaporan: {e}")
+        return
+    if cube.empty:
+        st.warning("⚠️ Belum ada data untuk matriks cakupan pelaporan.")
+        return
+
+    # Cakupan pelaporan: compliance rate per Puskesmas, atau lapor/tidak per kelurahan
+    level = "Kelurahan" if puskesmas_filter != "All" else "Puskesmas"
+    reporting_df = reporting_coverage.reporting_matrix(cube, desa_df, puskesmas_filter)
+    st.subheader(f"📊 Cakupan Pelaporan per {level} × Bulan")
+    fig_reporting = px.imshow(reporting_df, text_auto=".0f", aspect="auto", zmin=0, zmax=100,
+                              color_continuous_scale="RdYlGn", title=f"Cakupan Pelaporan per {level} × Bulan Indikator Balita KIA")
+    fig_reporting.update_layout(xaxis_title="Periode", yaxis_title=level, coloraxis_colorbar_title="Lapor (%)",
+                                title_x=0.5, height=max(400, 25 * len(reporting_df)))
+    st.plotly_chart(fig_reporting, key=f"coverage_reporting_{puskesmas_filter}_{time.time()}", use_container_width=True)
+
+    # Kelengkapan per kolom kunci di wilayah terpilih
+    scope = cube
+    if puskesmas_filter != "All":
+        scope = scope[scope['Puskesmas'] == puskesmas_filter]
+    if kelurahan_filter != "All":
+        scope = scope[scope['Kelurahan'] == kelurahan_filter]
+    completeness_df = reporting_coverage.completeness_matrix(scope)
+    st.subheader("📋 Kelengkapan per Kolom × Bulan")
+    fig_completeness = px.imshow(completeness_df, text_auto=".0f", aspect="auto", zmin=0, zmax=100,
+                                 color_continuous_scale="RdYlGn", title="Kelengkapan Data per Kolom × Bulan")
+    fig_completeness.update_layout(xaxis_title="Periode", yaxis_title="Kolom", coloraxis_colorbar_title="Terisi (%)",
+                                   title_x=0.5, height=max(400, 25 * len(completeness_df)))
+    st.plotly_chart(fig_completeness, key=f"coverage_completeness_{puskesmas_filter}_{kelurahan_filter}_{time.time()}", use_container_width=True)
+
+# ----------------------------- #
 # 📉 Pemantauan Tumbuh Kembang Apras (Anak Pra-Sekolah)
 # ----------------------------- #
 def pemantauan_tumbuh_kembang_apras(filtered_df, desa_df, puskesmas_filter, kelurahan_filter, jenis_laporan, tahun_filter, bulan_filter_int=None, tribulan_filter=None):
@@ -2234,72 +2139,24 @@ def pemantauan_tumbuh_kembang_apras(filtered_df, desa_df, puskesmas_filter, kelu
     # Gunakan recap_df yang sudah dihitung persentasenya
     cols_to_check = list(metrik_data.keys())
 
-    # Inisialisasi DataFrame untuk outlier statistik
-    base_columns = ["Puskesmas", "Metrik", "Nilai", "Metode"]
-    if puskesmas_filter != "All":
-        base_columns.insert(1, "Kelurahan")
-    statistical_outliers_df = pd.DataFrame(columns=base_columns)
-
     # Dropdown untuk memilih metode deteksi outlier statistik
     outlier_method = st.selectbox(
         "Pilih Metode Deteksi Outlier Statistik",
-        ["Tidak Ada", "Z-Score", "IQR"],
+        outlier_detection.OUTLIER_METHODS,
         key=f"outlier_method_select_apras_{periode_label}"
     )
 
-    if outlier_method != "Tidak Ada":
-        for metric in cols_to_check:
-            if metric not in recap_df.columns:
-                continue
-
-            # Pilih kolom berdasarkan filter
-            if puskesmas_filter == "All":
-                metric_data = recap_df[[metric, "Puskesmas"]].dropna()
-            else:
-                metric_data = recap_df[[metric, "Puskesmas", "Kelurahan"]].dropna()
-
-            if metric_data.empty:
-                continue
-
-            # Z-Score Method
-            if outlier_method == "Z-Score":
-                z_scores = stats.zscore(metric_data[metric], nan_policy='omit')
-                z_outlier_mask = abs(z_scores) > 3  # Threshold Z-Score > 3
-                z_outliers = metric_data[z_outlier_mask].copy()
-                if not z_outliers.empty:
-                    z_outliers["Metrik"] = metric
-                    z_outliers["Nilai"] = z_outliers[metric]
-                    z_outliers["Metode"] = "Z-Score"
-                    if puskesmas_filter == "All":
-                        z_outliers_subset = z_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        z_outliers_subset = z_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat(
-                        [statistical_outliers_df, z_outliers_subset],
-                        ignore_index=True
-                    )
-
-            # IQR Method
-            elif outlier_method == "IQR":
-                Q1 = metric_data[metric].quantile(0.25)
-                Q3 = metric_data[metric].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                iqr_outlier_mask = (metric_data[metric] < lower_bound) | (metric_data[metric] > upper_bound)
-                iqr_outliers = metric_data[iqr_outlier_mask].copy()
-                if not iqr_outliers.empty:
-                    iqr_outliers["Metrik"] = metric
-                    iqr_outliers["Nilai"] = iqr_outliers[metric]
-                    iqr_outliers["Metode"] = "IQR"
-                    if puskesmas_filter == "All":
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat(
-                        [statistical_outliers_df, iqr_outliers_subset],
-                        ignore_index=True
-                    )
+    statistical_outliers_df = outlier_detection.statistical_outliers(
+        recap_df, cols_to_check, outlier_method, puskesmas_filter,
+        cache_key=outlier_detection.cache_key(
+            "pemantauan_tumbuh_kembang_apras", ["data_balita_kia", "dataset_desa"], puskesmas_filter, kelurahan_filter, jenis_laporan, tahun_filter, bulan_filter_int, tribulan_filter
+        ),
+        table_name="data_balita_kia",
+        flag_filters=outlier_detection.flag_filters(
+            puskesmas_filter, kelurahan_filter, tahun=tahun_filter,
+            periode=bulan_filter_int if jenis_laporan == "Bulanan" else tribulan_filter,
+        ),
+    )
 
     # 3.3 📊 Tabel Outlier Statistik
     if not statistical_outliers_df.empty:
@@ -2801,9 +2658,11 @@ def cakupan_layanan_kesehatan_balita(filtered_df, desa_df, puskesmas_filter, kel
 
     # 1. Memuat data dari data_balita_gizi (Jumlah_balita_punya_KIA dan Jumlah_sasaran_balita)
     try:
-        conn = sqlite3.connect("rcs_data.db")
-        gizi_df = pd.read_sql_query("SELECT Kelurahan, Bulan, Jumlah_balita_punya_KIA, Jumlah_sasaran_balita FROM data_balita_gizi", conn)
-        conn.close()
+        gizi_df = data_access.load_filtered(
+            "data_balita_gizi",
+            columns=["Kelurahan", "Bulan", "Jumlah_balita_punya_KIA", "Jumlah_sasaran_balita"],
+            filters={"Kelurahan": sorted(filtered_df['Kelurahan'].dropna().unique().tolist())},
+        )
     except Exception as e:
         st.error(f"❌ Gagal memuat data dari data_balita_gizi: {e}")
         return
@@ -3112,72 +2971,24 @@ def cakupan_layanan_kesehatan_balita(filtered_df, desa_df, puskesmas_filter, kel
     # Gunakan recap_df yang sudah dihitung persentasenya
     cols_to_check = list(metrik_data.keys())
 
-    # Inisialisasi DataFrame untuk outlier statistik
-    base_columns = ["Puskesmas", "Metrik", "Nilai", "Metode"]
-    if puskesmas_filter != "All":
-        base_columns.insert(1, "Kelurahan")
-    statistical_outliers_df = pd.DataFrame(columns=base_columns)
-
     # Dropdown untuk memilih metode deteksi outlier statistik
     outlier_method = st.selectbox(
         "Pilih Metode Deteksi Outlier Statistik",
-        ["Tidak Ada", "Z-Score", "IQR"],
+        outlier_detection.OUTLIER_METHODS,
         key=f"outlier_method_select_balita_{periode_label}"
     )
 
-    if outlier_method != "Tidak Ada":
-        for metric in cols_to_check:
-            if metric not in recap_df.columns:
-                continue
-
-            # Pilih kolom berdasarkan filter
-            if puskesmas_filter == "All":
-                metric_data = recap_df[[metric, "Puskesmas"]].dropna()
-            else:
-                metric_data = recap_df[[metric, "Puskesmas", "Kelurahan"]].dropna()
-
-            if metric_data.empty:
-                continue
-
-            # Z-Score Method
-            if outlier_method == "Z-Score":
-                z_scores = stats.zscore(metric_data[metric], nan_policy='omit')
-                z_outlier_mask = abs(z_scores) > 3  # Threshold Z-Score > 3
-                z_outliers = metric_data[z_outlier_mask].copy()
-                if not z_outliers.empty:
-                    z_outliers["Metrik"] = metric
-                    z_outliers["Nilai"] = z_outliers[metric]
-                    z_outliers["Metode"] = "Z-Score"
-                    if puskesmas_filter == "All":
-                        z_outliers_subset = z_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        z_outliers_subset = z_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat(
-                        [statistical_outliers_df, z_outliers_subset],
-                        ignore_index=True
-                    )
-
-            # IQR Method
-            elif outlier_method == "IQR":
-                Q1 = metric_data[metric].quantile(0.25)
-                Q3 = metric_data[metric].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                iqr_outlier_mask = (metric_data[metric] < lower_bound) | (metric_data[metric] > upper_bound)
-                iqr_outliers = metric_data[iqr_outlier_mask].copy()
-                if not iqr_outliers.empty:
-                    iqr_outliers["Metrik"] = metric
-                    iqr_outliers["Nilai"] = iqr_outliers[metric]
-                    iqr_outliers["Metode"] = "IQR"
-                    if puskesmas_filter == "All":
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat(
-                        [statistical_outliers_df, iqr_outliers_subset],
-                        ignore_index=True
-                    )
+    statistical_outliers_df = outlier_detection.statistical_outliers(
+        recap_df, cols_to_check, outlier_method, puskesmas_filter,
+        cache_key=outlier_detection.cache_key(
+            "cakupan_layanan_kesehatan_balita", ["data_balita_kia", "dataset_desa"], puskesmas_filter, kelurahan_filter, jenis_laporan, tahun_filter, bulan_filter_int, tribulan_filter
+        ),
+        table_name="data_balita_kia",
+        flag_filters=outlier_detection.flag_filters(
+            puskesmas_filter, kelurahan_filter, tahun=tahun_filter,
+            periode=bulan_filter_int if jenis_laporan == "Bulanan" else tribulan_filter,
+        ),
+    )
 
     # 6. 📊 Tabel Outlier Statistik
     if not statistical_outliers_df.empty:
@@ -3631,9 +3442,11 @@ def cakupan_layanan_kesehatan_apras(filtered_df, desa_df, puskesmas_filter, kelu
 
     # 1. Memuat data Jumlah_apras dari dataset_apras
     try:
-        conn = sqlite3.connect("rcs_data.db")
-        apras_df = pd.read_sql_query("SELECT Puskesmas, Kelurahan, Tahun, Jumlah_apras FROM dataset_apras", conn)
-        conn.close()
+        apras_df = data_access.load_filtered(
+            "dataset_apras",
+            columns=["Puskesmas", "Kelurahan", "Tahun", "Jumlah_apras"],
+            filters={"Kelurahan": sorted(filtered_df['Kelurahan'].dropna().unique().tolist())},
+        )
     except Exception as e:
         st.error(f"❌ Gagal memuat data dari dataset_apras: {e}")
         return
@@ -3916,67 +3729,25 @@ def cakupan_layanan_kesehatan_apras(filtered_df, desa_df, puskesmas_filter, kelu
     # Gunakan recap_df yang sudah dihitung persentasenya
     cols_to_check = list(metrik_data.keys())
 
-    # Inisialisasi DataFrame untuk outlier statistik
-    base_columns = ["Puskesmas", "Metrik", "Nilai", "Metode"]
-    if puskesmas_filter != "All":
-        base_columns.insert(1, "Kelurahan")
-    statistical_outliers_df = pd.DataFrame(columns=base_columns)
-
     # Dropdown untuk memilih metode deteksi outlier statistik
     # Tambahkan timestamp ke key untuk memastikan keunikan
     outlier_method = st.selectbox(
         "Pilih Metode Deteksi Outlier Statistik",
-        ["Tidak Ada", "Z-Score", "IQR"],
+        outlier_detection.OUTLIER_METHODS,
         key=f"outlier_method_select_apras_{periode_label}_{time.time()}"
     )
 
-    if outlier_method != "Tidak Ada":
-        for metric in cols_to_check:
-            if metric not in recap_df.columns:
-                continue
-
-            # Pilih kolom berdasarkan filter
-            if puskesmas_filter == "All":
-                metric_data = recap_df[[metric, "Puskesmas"]].dropna()
-            else:
-                metric_data = recap_df[[metric, "Puskesmas", "Kelurahan"]].dropna()
-
-            if metric_data.empty:
-                continue
-
-            # Z-Score Method
-            if outlier_method == "Z-Score":
-                z_scores = stats.zscore(metric_data[metric], nan_policy='omit')
-                z_outlier_mask = abs(z_scores) > 3  # Threshold Z-Score > 3
-                z_outliers = metric_data[z_outlier_mask].copy()
-                if not z_outliers.empty:
-                    z_outliers["Metrik"] = metric
-                    z_outliers["Nilai"] = z_outliers[metric]
-                    z_outliers["Metode"] = "Z-Score"
-                    if puskesmas_filter == "All":
-                        z_outliers_subset = z_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        z_outliers_subset = z_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat([statistical_outliers_df, z_outliers_subset], ignore_index=True)
-
-            # IQR Method
-            elif outlier_method == "IQR":
-                Q1 = metric_data[metric].quantile(0.25)
-                Q3 = metric_data[metric].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                iqr_outlier_mask = (metric_data[metric] < lower_bound) | (metric_data[metric] > upper_bound)
-                iqr_outliers = metric_data[iqr_outlier_mask].copy()
-                if not iqr_outliers.empty:
-                    iqr_outliers["Metrik"] = metric
-                    iqr_outliers["Nilai"] = iqr_outliers[metric]
-                    iqr_outliers["Metode"] = "IQR"
-                    if puskesmas_filter == "All":
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat([statistical_outliers_df, iqr_outliers_subset], ignore_index=True)
+    statistical_outliers_df = outlier_detection.statistical_outliers(
+        recap_df, cols_to_check, outlier_method, puskesmas_filter,
+        cache_key=outlier_detection.cache_key(
+            "cakupan_layanan_kesehatan_apras", ["data_balita_kia", "dataset_desa"], puskesmas_filter, kelurahan_filter, jenis_laporan, tahun_filter, bulan_filter_int, tribulan_filter
+        ),
+        table_name="data_balita_kia",
+        flag_filters=outlier_detection.flag_filters(
+            puskesmas_filter, kelurahan_filter, tahun=tahun_filter,
+            periode=bulan_filter_int if jenis_laporan == "Bulanan" else tribulan_filter,
+        ),
+    )
 
     # 3. 📊 Tabel Outlier Statistik
     if not statistical_outliers_df.empty:
@@ -4387,9 +4158,11 @@ def cakupan_pkat(filtered_df, desa_df, puskesmas_filter, kelurahan_filter, jenis
 
     # 1. Memuat data Jumlah_Bayi_usia_6_bulan dari data_balita_gizi
     try:
-        conn = sqlite3.connect("rcs_data.db")
-        gizi_df = pd.read_sql_query("SELECT Kelurahan, Bulan, Jumlah_Bayi_usia_6_bulan FROM data_balita_gizi", conn)
-        conn.close()
+        gizi_df = data_access.load_filtered(
+            "data_balita_gizi",
+            columns=["Kelurahan", "Bulan", "Jumlah_Bayi_usia_6_bulan"],
+            filters={"Kelurahan": sorted(filtered_df['Kelurahan'].dropna().unique().tolist())},
+        )
     except Exception as e:
         st.error(f"❌ Gagal memuat data dari data_balita_gizi: {e}")
         return
@@ -4597,47 +4370,23 @@ def cakupan_pkat(filtered_df, desa_df, puskesmas_filter, kelurahan_filter, jenis
 
     # 2. ⚙️ Analisis Outlier Statistik
     st.subheader(f"⚙️ Analisis Outlier Statistik ({periode_label})")
-    base_columns = ["Puskesmas", "Nilai", "Metode"]
-    if puskesmas_filter != "All":
-        base_columns.insert(1, "Kelurahan")
-    statistical_outliers_df = pd.DataFrame(columns=base_columns)
     outlier_method = st.selectbox(
         "Pilih Metode Deteksi Outlier Statistik",
-        ["Tidak Ada", "Z-Score", "IQR"],
+        outlier_detection.OUTLIER_METHODS,
         key=f"outlier_method_select_pkat_{time.time()}"
     )
-    if outlier_method != "Tidak Ada":
-        if puskesmas_filter == "All":
-            metric_data = recap_df[[metric, "Puskesmas"]].dropna()
-        else:
-            metric_data = recap_df[[metric, "Puskesmas", "Kelurahan"]].dropna()
-        if not metric_data.empty:
-            if outlier_method == "Z-Score":
-                z_scores = stats.zscore(metric_data[metric], nan_policy='omit')
-                z_outlier_mask = abs(z_scores) > 3
-                z_outliers = metric_data[z_outlier_mask].copy()
-                if not z_outliers.empty:
-                    z_outliers["Nilai"] = z_outliers[metric]
-                    z_outliers["Metode"] = "Z-Score"
-                    if puskesmas_filter == "All":
-                        statistical_outliers_df = pd.concat([statistical_outliers_df, z_outliers[["Puskesmas", "Nilai", "Metode"]]], ignore_index=True)
-                    else:
-                        statistical_outliers_df = pd.concat([statistical_outliers_df, z_outliers[["Puskesmas", "Kelurahan", "Nilai", "Metode"]]], ignore_index=True)
-            elif outlier_method == "IQR":
-                Q1 = metric_data[metric].quantile(0.25)
-                Q3 = metric_data[metric].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                iqr_outlier_mask = (metric_data[metric] < lower_bound) | (metric_data[metric] > upper_bound)
-                iqr_outliers = metric_data[iqr_outlier_mask].copy()
-                if not iqr_outliers.empty:
-                    iqr_outliers["Nilai"] = iqr_outliers[metric]
-                    iqr_outliers["Metode"] = "IQR"
-                    if puskesmas_filter == "All":
-                        statistical_outliers_df = pd.concat([statistical_outliers_df, iqr_outliers[["Puskesmas", "Nilai", "Metode"]]], ignore_index=True)
-                    else:
-                        statistical_outliers_df = pd.concat([statistical_outliers_df, iqr_outliers[["Puskesmas", "Kelurahan", "Nilai", "Metode"]]], ignore_index=True)
+    statistical_outliers_df = outlier_detection.statistical_outliers(
+        recap_df, [metric], outlier_method, puskesmas_filter,
+        cache_key=outlier_detection.cache_key(
+            "cakupan_pkat", ["data_balita_kia", "dataset_desa"], puskesmas_filter, kelurahan_filter, jenis_laporan, tahun_filter, bulan_filter_int, tribulan_filter
+        ),
+        table_name="data_balita_kia",
+        flag_filters=outlier_detection.flag_filters(
+            puskesmas_filter, kelurahan_filter, tahun=tahun_filter,
+            periode=bulan_filter_int if jenis_laporan == "Bulanan" else tribulan_filter,
+        ),
+        include_metric=False,
+    )
     if not statistical_outliers_df.empty:
         st.markdown(f"### 📊 Tabel Outlier Statistik ({periode_label})")
         styled_stat_outliers = statistical_outliers_df.style.apply(
@@ -5066,6 +4815,10 @@ def show_dashboard():
             agg_dict = {col: "sum" for col in numeric_columns}
             filtered_df = filtered_df.groupby(group_columns).agg(agg_dict).reset_index()
 
+    # Filter yang sama untuk cube kelengkapan tersimpan (bukan filtered_df yang sudah diagregasi)
+    coverage_filters = reporting_coverage.coverage_filters(
+        tahun_filter, bulan_filter if jenis_laporan == "Bulanan" else bulan_range, puskesmas_filter, kelurahan_filter)
+
     # Menu Utama dengan Tabs di Main Page
     st.subheader("📂 Pilih Dashboard")
     tab1, tab2 = st.tabs(["📊 Kelengkapan Data Laporan", "📈 Analisis Indikator Balita"])
@@ -5073,11 +4826,13 @@ def show_dashboard():
     # Tab 1: Kelengkapan Data Laporan
     with tab1:
         st.subheader("🔍 Pilih Analisis")
-        subtab1, subtab2 = st.tabs(["✅ Compliance Rate", "📋 Completeness Rate"])
+        subtab1, subtab2, subtab3 = st.tabs(["✅ Compliance Rate", "📋 Completeness Rate", "🗓️ Matriks Cakupan Pelaporan"])
         with subtab1:
             compliance_rate(filtered_df, desa_df, puskesmas_filter, kelurahan_filter)
         with subtab2:
-            completeness_rate(filtered_df, desa_df, puskesmas_filter, kelurahan_filter)
+            completeness_rate(coverage_filters, desa_df, puskesmas_filter, kelurahan_filter)
+        with subtab3:
+            coverage_matrix(desa_df, puskesmas_filter, kelurahan_filter)
 
     # Tab 2: Analisis Indikator Balita
     with tab2:
@@ -1,5 +1,9 @@
 import streamlit as st
-import sqlite3
+import data_access
+import eppgbm_cohort
+import eppgbm_derived
+import eppgbm_query
+import eppgbm_store
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -11,13 +15,10 @@ from datetime import datetime
 import numpy as np
 from scipy.stats import norm
 
-# Fungsi untuk menghitung prevalensi stunting
-def calculate_prevalensi_stunting(df_grouped):
-    total_balita = df_grouped.shape[0]
-    if total_balita == 0:
-        return 0
-    stunting_count = df_grouped[df_grouped["ZS_TBU"] < -2].shape[0]
-    return (stunting_count / total_balita) * 100
+# Prevalensi stunting per grup (kernel eppgbm_query.prevalence) dengan nama kolom hasil
+def calculate_prevalensi_stunting(df, by, name):
+    result = eppgbm_query.prevalence(df, by, ["Stunting"])
+    return result[by + ["Prevalensi_Stunting"]].rename(columns={"Prevalensi_Stunting": name})
 
 # Fungsi untuk Analisis Differensiasi Prevalensi Stunting
 def show_analisis_differensiasi_stunting(df):
@@ -100,8 +101,8 @@ def show_analisis_differensiasi_stunting(df):
 
         # Pastikan semua Puskesmas yang ada di dataset dimasukkan
         all_puskesmas = sorted(df["puskesmas"].unique())
-        prevalensi_awal = df_awal.groupby("puskesmas").apply(calculate_prevalensi_stunting).reset_index(name="Prevalensi_Awal")
-        prevalensi_akhir = df_akhir.groupby("puskesmas").apply(calculate_prevalensi_stunting).reset_index(name="Prevalensi_Akhir")
+        prevalensi_awal = calculate_prevalensi_stunting(df_awal, ["puskesmas"], "Prevalensi_Awal")
+        prevalensi_akhir = calculate_prevalensi_stunting(df_akhir, ["puskesmas"], "Prevalensi_Akhir")
 
         # Buat DataFrame dengan semua Puskesmas
         prevalensi_df = pd.DataFrame({"puskesmas": all_puskesmas})
@@ -183,8 +184,8 @@ def show_analisis_differensiasi_stunting(df):
         df_awal = df_filtered[df_filtered["periode"] == periode_awal]
         df_akhir = df_filtered[df_filtered["periode"] == periode_akhir]
 
-        prevalensi_awal_kel = df_awal.groupby(["puskesmas", "kelurahan"]).apply(calculate_prevalensi_stunting).reset_index(name="Prevalensi_Awal")
-        prevalensi_akhir_kel = df_akhir.groupby(["puskesmas", "kelurahan"]).apply(calculate_prevalensi_stunting).reset_index(name="Prevalensi_Akhir")
+        prevalensi_awal_kel = calculate_prevalensi_stunting(df_awal, ["puskesmas", "kelurahan"], "Prevalensi_Awal")
+        prevalensi_akhir_kel = calculate_prevalensi_stunting(df_akhir, ["puskesmas", "kelurahan"], "Prevalensi_Akhir")
 
         # Pastikan semua kombinasi Puskesmas dan Kelurahan dimasukkan
         all_combinations = df[["puskesmas", "kelurahan"]].drop_duplicates().sort_values(by=["puskesmas", "kelurahan"])
@@ -394,30 +395,10 @@ def show_info_data_eppgbm(df):
         filtered_df["BB_Lahir"] = filtered_df["BB_Lahir"].apply(clean_bb_lahir)
         filtered_df["TB_Lahir"] = filtered_df["TB_Lahir"].apply(clean_tb_lahir)
 
-        # Hitung prevalensi untuk Stunting, Wasting, Underweight, dan Overweight
-        def calculate_prevalensi(df_grouped):
-            total_balita = df_grouped.shape[0]
-            if total_balita == 0:
-                return pd.Series({
-                    "Prevalensi_Stunting": 0,
-                    "Prevalensi_Wasting": 0,
-                    "Prevalensi_Underweight": 0,
-                    "Prevalensi_Overweight": 0
-                })
-            stunting_count = df_grouped[df_grouped["ZS_TBU"] < -2].shape[0]
-            wasting_count = df_grouped[df_grouped["ZS_BBTB"] < -2].shape[0]
-            underweight_count = df_grouped[df_grouped["ZS_BBU"] < -2].shape[0]
-            overweight_count = df_grouped[df_grouped["ZS_BBU"] > 2].shape[0]
-            return pd.Series({
-                "Prevalensi_Stunting": (stunting_count / total_balita) * 100,
-                "Prevalensi_Wasting": (wasting_count / total_balita) * 100,
-                "Prevalensi_Underweight": (underweight_count / total_balita) * 100,
-                "Prevalensi_Overweight": (overweight_count / total_balita) * 100
-            })
-
         # Grafik Trend Prevalensi Masalah Gizi
         st.subheader("📈 Grafik Trend Prevalensi Masalah Gizi")
-        prevalensi_trend_df = filtered_df.groupby("periode").apply(calculate_prevalensi).reset_index()
+        # Prevalensi Stunting, Wasting, Underweight, dan Overweight (satu lintasan per pengelompokan)
+        prevalensi_trend_df = eppgbm_query.prevalence(filtered_df, ["periode"])
 
         fig_combined = go.Figure()
         fig_combined.add_trace(go.Scatter(
@@ -496,13 +477,13 @@ def show_info_data_eppgbm(df):
         st.subheader("📊 Grafik Prevalensi per Indikator (Berdasarkan Puskesmas)")
         if selected_puskesmas != "All":
             if "kelurahan" in filtered_df.columns:
-                prevalensi_per_indikator_df = filtered_df.groupby(["puskesmas", "kelurahan"]).apply(calculate_prevalensi).reset_index()
+                prevalensi_per_indikator_df = eppgbm_query.prevalence(filtered_df, ["puskesmas", "kelurahan"])
                 group_by = "kelurahan"
             else:
-                prevalensi_per_indikator_df = filtered_df.groupby("puskesmas").apply(calculate_prevalensi).reset_index()
+                prevalensi_per_indikator_df = eppgbm_query.prevalence(filtered_df, ["puskesmas"])
                 group_by = "puskesmas"
         else:
-            prevalensi_per_indikator_df = filtered_df.groupby("puskesmas").apply(calculate_prevalensi).reset_index()
+            prevalensi_per_indikator_df = eppgbm_query.prevalence(filtered_df, ["puskesmas"])
             group_by = "puskesmas"
 
         indicators = [
@@ -679,8 +660,9 @@ def show_distribusi_data_eppgbm(df):
     if selected_kelurahan != "All":
         filtered_df = filtered_df[filtered_df["kelurahan"] == selected_kelurahan]
 
-    # Menghitung usia dalam bulan
-    filtered_df["usia_bulan"] = ((pd.to_datetime(filtered_df["Tgl_ukur"]) - pd.to_datetime(filtered_df["Tgl_Lahir"])) / pd.Timedelta(days=30.4375)).astype(int)
+    # Menghitung usia dalam bulan (jika belum dihitung saat upload)
+    if "usia_bulan" not in filtered_df.columns:
+        filtered_df["usia_bulan"] = ((pd.to_datetime(filtered_df["Tgl_ukur"]) - pd.to_datetime(filtered_df["Tgl_Lahir"])) / pd.Timedelta(days=30.4375)).astype(int)
 
     # Memastikan usia_bulan dalam rentang yang valid (0-59 bulan untuk balita)
     filtered_df = filtered_df[(filtered_df["usia_bulan"] >= 0) & (filtered_df["usia_bulan"] <= 59)]
@@ -688,7 +670,8 @@ def show_distribusi_data_eppgbm(df):
     # Membuat kelompok usia dalam bulan
     bins_bulan = [-1, 5, 11, 23, 35, 47, 59]
     labels_bulan = ["0-5 bulan", "6-11 bulan", "12-23 bulan", "24-35 bulan", "36-47 bulan", "48-59 bulan"]
-    filtered_df["age_group"] = pd.cut(filtered_df["usia_bulan"], bins=bins_bulan, labels=labels_bulan, right=True, include_lowest=True)
+    if "age_group" not in filtered_df.columns:
+        filtered_df["age_group"] = pd.cut(filtered_df["usia_bulan"], bins=bins_bulan, labels=labels_bulan, right=True, include_lowest=True)
 
     # Visualisasi Distribusi Berdasarkan Kelompok Usia (Bulan)
     distribusi_df = filtered_df.groupby(["age_group", "jk"]).agg({"nama_balita": "count"}).reset_index()
@@ -1093,7 +1076,8 @@ def show_distribusi_zscore_analysis(df):
     # Membuat kelompok usia dalam bulan
     bins_bulan = [-1, 5, 11, 23, 35, 47, 59]
     labels_bulan = ["0-5 bulan", "6-11 bulan", "12-23 bulan", "24-35 bulan", "36-47 bulan", "48-59 bulan"]
-    filtered_df["age_group"] = pd.cut(filtered_df["usia_bulan"], bins=bins_bulan, labels=labels_bulan, right=True, include_lowest=True)
+    if "age_group" not in filtered_df.columns:
+        filtered_df["age_group"] = pd.cut(filtered_df["usia_bulan"], bins=bins_bulan, labels=labels_bulan, right=True, include_lowest=True)
 
     # Fungsi untuk membuat grafik distribusi Z-Score
     def plot_zscore_distribution(zscore_data, title, indicator):
@@ -1227,23 +1211,16 @@ def show_analisis_zscore_flag(df):
     # Membuat kelompok usia dalam bulan
     bins_bulan = [-1, 5, 11, 23, 35, 47, 59]
     labels_bulan = ["0-5 bulan", "6-11 bulan", "12-23 bulan", "24-35 bulan", "36-47 bulan", "48-59 bulan"]
-    filtered_df["age_group"] = pd.cut(filtered_df["usia_bulan"], bins=bins_bulan, labels=labels_bulan, right=True, include_lowest=True)
-
-    # Identifikasi Z-Score Flag berdasarkan pedoman WHO
-    filtered_df["BBU_flag"] = (filtered_df["ZS_BBU"] < -6) | (filtered_df["ZS_BBU"] > 5)
-    filtered_df["TBU_flag"] = (filtered_df["ZS_TBU"] < -6) | (filtered_df["ZS_TBU"] > 6)
-    filtered_df["BBTB_flag"] = (filtered_df["ZS_BBTB"] < -5) | (filtered_df["ZS_BBTB"] > 5)
+    if "age_group" not in filtered_df.columns:
+        filtered_df["age_group"] = pd.cut(filtered_df["usia_bulan"], bins=bins_bulan, labels=labels_bulan, right=True, include_lowest=True)
 
     # Subjudul untuk Tabel Z-Score Flag
     st.subheader("📋 Tabel Z-Score Flag per Indikator dan Kelompok Usia")
 
-    # Buat tabel yang menunjukkan jumlah dan persentase data flagged per indikator dan kelompok usia
-    flag_summary = filtered_df.groupby("age_group").agg(
-        total=("nama_balita", "count"),
-        BBU_flagged=("BBU_flag", "sum"),
-        TBU_flagged=("TBU_flag", "sum"),
-        BBTB_flagged=("BBTB_flag", "sum")
-    ).reset_index()
+    # Jumlah data flagged per kelompok usia (batas WHO di eppgbm_query.FLAG_LIMITS);
+    # dihitung di DuckDB atas snapshot Parquet bila tersedia
+    zscore_filters = {"periode": selected_periode, "puskesmas": selected_puskesmas, "kelurahan": selected_kelurahan}
+    flag_summary = eppgbm_query.zscore_flag_counts(filtered_df, zscore_filters)
 
     # Hitung persentase flagged
     flag_summary["BBU_%_Flagged"] = (flag_summary["BBU_flagged"] / flag_summary["total"] * 100).round(2).astype(str) + "%"
@@ -1331,29 +1308,23 @@ def show_analisis_zscore_flag(df):
         **Catatan**: Grafik ini menunjukkan jumlah data yang dianggap sebagai flag (outlier) untuk setiap indikator (BB/U, TB/U, BB/TB), dikelompokkan berdasarkan kelompok usia. Warna yang berbeda mewakili indikator yang berbeda.
     """, unsafe_allow_html=True)
 
-# Fungsi di lingkup global
-def classify_ciaf(row):
-    stunting = row["ZS_TBU"] < -2
-    wasting = row["ZS_BBTB"] < -2
-    underweight = row["ZS_BBU"] < -2
-
-    if not stunting and not wasting and not underweight:
-        return "A"  # Tidak ada kegagalan
-    elif wasting and not stunting and not underweight:
-        return "B"  # Hanya wasting
-    elif wasting and underweight and not stunting:
-        return "C"  # Wasting dan underweight
-    elif wasting and underweight and stunting:
-        return "D"  # Wasting, underweight, dan stunting
-    elif not wasting and not stunting and underweight:
-        return "E"  # Hanya underweight
-    elif not wasting and stunting and not underweight:
-        return "F"  # Hanya stunting
-    elif not wasting and stunting and underweight:
-        return "Y"  # Stunting dan underweight
-    else:
-        return "Unknown"  # Untuk kombinasi yang tidak sesuai
-    
+ZSCORE_LABELS = {"ZS_BBU": "BB/U", "ZS_TBU": "TB/U", "ZS_BBTB": "BB/TB"}
+ZSCORE_STAT_LABELS = {"mean": "Rata-rata", "std": "Standar Deviasi", "skew": "Kemiringan", "kurt": "Kurtosis"}
+
+
+def _format_zscore_stats(stats, key, kelompok):
+    """Ubah hasil eppgbm_query.zscore_group_stats ke kolom tabel ringkasan Z-Score."""
+    table = pd.DataFrame({
+        "Kelompok": kelompok,
+        "Kategori": stats[key].astype(str) if key else "Semua",
+        "Jumlah Data": stats["n"].astype(float),
+    })
+    for col, label in ZSCORE_LABELS.items():
+        for stat, stat_label in ZSCORE_STAT_LABELS.items():
+            table[f"{label} {stat_label}"] = stats[f"{col}_{stat}"].astype(float)
+    return table
+
+
 def show_analisis_trend_pertumbuhan(df):
     st.subheader("📉 Analisis Tren Pertumbuhan EPPGBM")
 
@@ -1448,132 +1419,22 @@ def show_analisis_trend_pertumbuhan(df):
     # Membuat kelompok usia dalam bulan
     bins_bulan = [-1, 5, 11, 23, 35, 47, 59]
     labels_bulan = ["0-5 bulan", "6-11 bulan", "12-23 bulan", "24-35 bulan", "36-47 bulan", "48-59 bulan"]
-    filtered_df["age_group"] = pd.cut(filtered_df["usia_bulan"], bins=bins_bulan, labels=labels_bulan, right=True, include_lowest=True)
+    if "age_group" not in filtered_df.columns:
+        filtered_df["age_group"] = pd.cut(filtered_df["usia_bulan"], bins=bins_bulan, labels=labels_bulan, right=True, include_lowest=True)
 
     # Ubah jenis kelamin menjadi label yang lebih jelas
-    filtered_df["jk_label"] = filtered_df["jk"].replace({"L": "Laki-laki", "P": "Perempuan"})
-    filtered_df["jk_label"] = filtered_df["jk_label"].fillna("Tidak Diketahui")
-
-    # 1. Ringkasan berdasarkan Kelompok Usia
-    age_group_summary = filtered_df.groupby("age_group").agg({
-        "ZS_BBU": ["count", "mean", "std"],
-        "ZS_TBU": ["mean", "std"],
-        "ZS_BBTB": ["mean", "std"]
-    }).reset_index()
-
-    # Hitung skewness dan kurtosis menggunakan apply
-    age_group_skew_kurt = filtered_df.groupby("age_group").agg({
-        "ZS_BBU": [lambda x: x.skew(), lambda x: x.kurtosis()],
-        "ZS_TBU": [lambda x: x.skew(), lambda x: x.kurtosis()],
-        "ZS_BBTB": [lambda x: x.skew(), lambda x: x.kurtosis()]
-    }).reset_index()
-
-    # Gabungkan hasil
-    age_group_summary.columns = [
-        "Kelompok Usia",
-        "Jumlah Data",
-        "BB/U Rata-rata", "BB/U Standar Deviasi",
-        "TB/U Rata-rata", "TB/U Standar Deviasi",
-        "BB/TB Rata-rata", "BB/TB Standar Deviasi"
-    ]
-    age_group_skew_kurt.columns = [
-        "Kelompok Usia",
-        "BB/U Kemiringan", "BB/U Kurtosis",
-        "TB/U Kemiringan", "TB/U Kurtosis",
-        "BB/TB Kemiringan", "BB/TB Kurtosis"
-    ]
-    age_group_summary = age_group_summary.merge(age_group_skew_kurt, on="Kelompok Usia")
-
-    # Tambahkan baris "Semua" (All)
-    all_summary = filtered_df.agg({
-        "ZS_BBU": ["count", "mean", "std", "skew", "kurtosis"],
-        "ZS_TBU": ["mean", "std", "skew", "kurtosis"],
-        "ZS_BBTB": ["mean", "std", "skew", "kurtosis"]
-    }).T.reset_index()
-    all_row = pd.DataFrame({
-        "Kelompok Usia": ["Semua"],
-        "Jumlah Data": [all_summary.iloc[0, 1]],
-        "BB/U Rata-rata": [all_summary.iloc[0, 2]],
-        "BB/U Standar Deviasi": [all_summary.iloc[0, 3]],
-        "BB/U Kemiringan": [all_summary.iloc[0, 4]],
-        "BB/U Kurtosis": [all_summary.iloc[0, 5]],
-        "TB/U Rata-rata": [all_summary.iloc[1, 2]],
-        "TB/U Standar Deviasi": [all_summary.iloc[1, 3]],
-        "TB/U Kemiringan": [all_summary.iloc[1, 4]],
-        "TB/U Kurtosis": [all_summary.iloc[1, 5]],
-        "BB/TB Rata-rata": [all_summary.iloc[2, 2]],
-        "BB/TB Standar Deviasi": [all_summary.iloc[2, 3]],
-        "BB/TB Kemiringan": [all_summary.iloc[2, 4]],
-        "BB/TB Kurtosis": [all_summary.iloc[2, 5]]
-    })
-    age_group_summary = pd.concat([all_row, age_group_summary], ignore_index=True)
-
-    # 2. Ringkasan berdasarkan Jenis Kelamin
-    jk_summary = filtered_df.groupby("jk_label").agg({
-        "ZS_BBU": ["count", "mean", "std"],
-        "ZS_TBU": ["mean", "std"],
-        "ZS_BBTB": ["mean", "std"]
-    }).reset_index()
-
-    jk_skew_kurt = filtered_df.groupby("jk_label").agg({
-        "ZS_BBU": [lambda x: x.skew(), lambda x: x.kurtosis()],
-        "ZS_TBU": [lambda x: x.skew(), lambda x: x.kurtosis()],
-        "ZS_BBTB": [lambda x: x.skew(), lambda x: x.kurtosis()]
-    }).reset_index()
-
-    jk_summary.columns = [
-        "Jenis Kelamin",
-        "Jumlah Data",
-        "BB/U Rata-rata", "BB/U Standar Deviasi",
-        "TB/U Rata-rata", "TB/U Standar Deviasi",
-        "BB/TB Rata-rata", "BB/TB Standar Deviasi"
-    ]
-    jk_skew_kurt.columns = [
-        "Jenis Kelamin",
-        "BB/U Kemiringan", "BB/U Kurtosis",
-        "TB/U Kemiringan", "TB/U Kurtosis",
-        "BB/TB Kemiringan", "BB/TB Kurtosis"
-    ]
-    jk_summary = jk_summary.merge(jk_skew_kurt, on="Jenis Kelamin")
-
-    # 3. Ringkasan berdasarkan Area (Puskesmas)
-    area_summary = filtered_df.groupby("puskesmas").agg({
-        "ZS_BBU": ["count", "mean", "std"],
-        "ZS_TBU": ["mean", "std"],
-        "ZS_BBTB": ["mean", "std"]
-    }).reset_index()
-
-    area_skew_kurt = filtered_df.groupby("puskesmas").agg({
-        "ZS_BBU": [lambda x: x.skew(), lambda x: x.kurtosis()],
-        "ZS_TBU": [lambda x: x.skew(), lambda x: x.kurtosis()],
-        "ZS_BBTB": [lambda x: x.skew(), lambda x: x.kurtosis()]
-    }).reset_index()
-
-    area_summary.columns = [
-        "Area (Puskesmas)",
-        "Jumlah Data",
-        "BB/U Rata-rata", "BB/U Standar Deviasi",
-        "TB/U Rata-rata", "TB/U Standar Deviasi",
-        "BB/TB Rata-rata", "BB/TB Standar Deviasi"
-    ]
-    area_skew_kurt.columns = [
-        "Area (Puskesmas)",
-        "BB/U Kemiringan", "BB/U Kurtosis",
-        "TB/U Kemiringan", "TB/U Kurtosis",
-        "BB/TB Kemiringan", "BB/TB Kurtosis"
-    ]
-    area_summary = area_summary.merge(area_skew_kurt, on="Area (Puskesmas)")
-
-    # Gabungkan semua ringkasan
-    age_group_summary.insert(0, "Kelompok", "Kelompok Usia")
-    jk_summary.insert(0, "Kelompok", "Jenis Kelamin")
-    area_summary.insert(0, "Kelompok", "Area")
-
-    age_group_summary = age_group_summary.rename(columns={"Kelompok Usia": "Kategori"})
-    jk_summary = jk_summary.rename(columns={"Jenis Kelamin": "Kategori"})
-    area_summary = area_summary.rename(columns={"Area (Puskesmas)": "Kategori"})
-
-    summary_table = pd.concat([age_group_summary, jk_summary, area_summary], ignore_index=True)
+    if "jk_label" not in filtered_df.columns:
+        filtered_df["jk_label"] = filtered_df["jk"].replace({"L": "Laki-laki", "P": "Perempuan"})
+        filtered_df["jk_label"] = filtered_df["jk_label"].fillna("Tidak Diketahui")
+
+    # Statistik Z-Score per kelompok usia, jenis kelamin, dan area (DuckDB bila tersedia)
+    zscore_filters = {"periode": selected_periode, "puskesmas": selected_puskesmas, "kelurahan": selected_kelurahan}
+    zscore_groups = {None: "Kelompok Usia", "age_group": "Kelompok Usia", "jk_label": "Jenis Kelamin", "puskesmas": "Area"}
+    zscore_stats = eppgbm_query.zscore_group_stats(filtered_df, list(zscore_groups), zscore_filters)
+    summary_table = pd.concat(
+        [_format_zscore_stats(zscore_stats[by], by, kelompok) for by, kelompok in zscore_groups.items()],
+        ignore_index=True,
+    )
 
     # Bulatkan nilai numerik untuk tampilan
     numeric_cols = summary_table.select_dtypes(include=[float, int]).columns
@@ -1628,8 +1489,9 @@ def show_analisis_trend_pertumbuhan(df):
             </div>
         """, unsafe_allow_html=True)
 
-    # Terapkan klasifikasi CIAF pada dataset
-    filtered_df["CIAF_Category"] = filtered_df.apply(classify_ciaf, axis=1)
+    # Terapkan klasifikasi CIAF pada dataset (jika belum dihitung saat upload)
+    if "CIAF_Category" not in filtered_df.columns:
+        filtered_df["CIAF_Category"] = eppgbm_derived.ciaf_category(filtered_df["ZS_BBU"], filtered_df["ZS_TBU"], filtered_df["ZS_BBTB"])
 
     # Hitung prevalensi CIAF (persentase anak dengan kegagalan antropometri, kategori B-Y)
     ciaf_prevalence = (filtered_df["CIAF_Category"] != "A").mean() * 100
@@ -1649,19 +1511,22 @@ def show_analisis_trend_pertumbuhan(df):
     st.write("#### Distribusi Kategori CIAF")
     st.dataframe(ciaf_distribution_df, use_container_width=True)
 
+    # Semua rincian CIAF & status gizi dirangkum dari satu groupby (sel agregat)
+    ciaf_cells = eppgbm_query.ciaf_cells(filtered_df)
+
     # Hitung prevalensi CIAF berdasarkan kelompok usia
-    ciaf_by_age = filtered_df.groupby("age_group").apply(lambda x: (x["CIAF_Category"] != "A").mean() * 100).reset_index()
+    ciaf_by_age = eppgbm_query.ciaf_prevalence(ciaf_cells, "age_group").reset_index()
     ciaf_by_age.columns = ["Kelompok Usia", "Prevalensi CIAF (%)"]
 
     # Hitung distribusi kategori CIAF berdasarkan kelompok usia
-    ciaf_dist_by_age = filtered_df.groupby("age_group")["CIAF_Category"].value_counts(normalize=True).unstack().fillna(0) * 100
+    ciaf_dist_by_age = eppgbm_query.ciaf_distribution(ciaf_cells, "age_group")
 
     # Hitung prevalensi CIAF berdasarkan jenis kelamin
-    ciaf_by_jk = filtered_df.groupby("jk_label").apply(lambda x: (x["CIAF_Category"] != "A").mean() * 100).reset_index()
+    ciaf_by_jk = eppgbm_query.ciaf_prevalence(ciaf_cells, "jk_label").reset_index()
     ciaf_by_jk.columns = ["Jenis Kelamin", "Prevalensi CIAF (%)"]
 
     # Hitung prevalensi CIAF berdasarkan area (puskesmas)
-    ciaf_by_area = filtered_df.groupby("puskesmas").apply(lambda x: (x["CIAF_Category"] != "A").mean() * 100).reset_index()
+    ciaf_by_area = eppgbm_query.ciaf_prevalence(ciaf_cells, "puskesmas").reset_index()
     ciaf_by_area.columns = ["Area (Puskesmas)", "Prevalensi CIAF (%)"]
 
     # Tambahkan kolom prevalensi Stunting, Wasting, dan Underweight
@@ -1673,21 +1538,15 @@ def show_analisis_trend_pertumbuhan(df):
         return
 
     # Hitung prevalensi Stunting (TBU: "Pendek" atau "Sangat Pendek")
-    stunting_prevalence = filtered_df.groupby("puskesmas").apply(
-        lambda x: (x["TBU"].isin(["Pendek", "Sangat Pendek"])).sum() / x["TBU"].notna().sum() * 100
-    ).reset_index()
+    stunting_prevalence = eppgbm_query.status_prevalence(ciaf_cells, "puskesmas", "stunting").reset_index()
     stunting_prevalence.columns = ["Area (Puskesmas)", "Prevalensi Stunting (%)"]
 
     # Hitung prevalensi Underweight (BBU: "Kurang" atau "Sangat Kurang")
-    underweight_prevalence = filtered_df.groupby("puskesmas").apply(
-        lambda x: (x["BBU"].isin(["Kurang", "Sangat Kurang"])).sum() / x["BBU"].notna().sum() * 100
-    ).reset_index()
+    underweight_prevalence = eppgbm_query.status_prevalence(ciaf_cells, "puskesmas", "underweight").reset_index()
     underweight_prevalence.columns = ["Area (Puskesmas)", "Prevalensi Underweight (%)"]
 
     # Hitung prevalensi Wasting (BBTB: "Gizi Buruk" atau "Gizi Kurang")
-    wasting_prevalence = filtered_df.groupby("puskesmas").apply(
-        lambda x: (x["BBTB"].isin(["Gizi Buruk", "Gizi Kurang"])).sum() / x["BBTB"].notna().sum() * 100
-    ).reset_index()
+    wasting_prevalence = eppgbm_query.status_prevalence(ciaf_cells, "puskesmas", "wasting").reset_index()
     wasting_prevalence.columns = ["Area (Puskesmas)", "Prevalensi Wasting (%)"]
 
     # Gabungkan semua prevalensi ke dalam tabel ciaf_by_area
@@ -2301,7 +2160,7 @@ def show_daftar_balita_bermasalah_gizi(df):
     
     # Hitung CIAF_Category jika belum ada
     if "CIAF_Category" not in filtered_df.columns:
-        filtered_df["CIAF_Category"] = filtered_df.apply(classify_ciaf, axis=1)
+        filtered_df["CIAF_Category"] = eppgbm_derived.ciaf_category(filtered_df["ZS_BBU"], filtered_df["ZS_TBU"], filtered_df["ZS_BBTB"])
 
     # Pastikan semua kolom yang diperlukan ada di dataset
     required_columns = [
@@ -2412,6 +2271,85 @@ def show_daftar_balita_bermasalah_gizi(df):
                         disabled=True,
                         help="Harap setujui kebijakan privasi terlebih dahulu."
                     )
+# ----------------------------- #
+# 🔁 Matriks Transisi Antar Periode
+# ----------------------------- #
+def show_transition_matrices(cohort, periode_awal, periode_akhir, selected_puskesmas, selected_kelurahan):
+    status_options = {"Stunting": "is_stunting", "Wasting": "is_wasting", "Underweight": "is_underweight"}
+    status_label = st.sidebar.radio("Pilih Status Gizi", list(status_options), key="status_transisi")
+    status = status_options[status_label]
+    if status not in cohort.status:
+        st.warning(f"⚠️ Kolom {status_label.lower()} tidak tersedia di dataset.")
+        return
+
+    with st.expander("📜 Definisi Matriks Transisi", expanded=False):
+        st.markdown(f"""
+        - Baris = status periode awal, kolom = status periode akhir (**Tidak Diukur**, **Tidak {status_label}**, **{status_label}**).
+        - **Kasus Baru**: {status_label.lower()} di periode akhir, sebelumnya tidak {status_label.lower()} atau belum diukur.
+        - **Persisten**: {status_label.lower()} di kedua periode. **Sembuh**: {status_label.lower()} menjadi tidak {status_label.lower()}.
+        - **Tidak Terlacak**: {status_label.lower()} di periode awal tetapi tidak diukur di periode akhir.
+        - Balita dihitung di wilayah pengukuran periode akhir (atau periode awal bila tidak diukur lagi).
+        """)
+
+    # Level & wilayah sesuai filter lokasi (kelurahan dicocokkan per pasangan puskesmas-kelurahan)
+    if selected_puskesmas == "All":
+        level = "puskesmas"
+        title_suffix = "Semua Puskesmas"
+    else:
+        level = "kelurahan"
+        title_suffix = f"Puskesmas: {selected_puskesmas}"
+        if selected_kelurahan != "All":
+            title_suffix += f", Kelurahan: {selected_kelurahan}"
+    labels = cohort.region_labels[level]
+    selected = cohort.region_selection(level, selected_puskesmas, selected_kelurahan)
+
+    matrices = eppgbm_cohort.transition_matrices(status, level)
+    state_labels = ["Tidak Diukur", f"Tidak {status_label}", status_label]
+
+    # Matriks pasangan periode terpilih
+    st.write(f"### Matriks Transisi {status_label} {periode_awal} → {periode_akhir} ({title_suffix})")
+    matrix = matrices.get((periode_awal, periode_akhir))
+    if matrix is None:
+        matrix = cohort.transition_matrices(status, level, [(periode_awal, periode_akhir)])[(periode_awal, periode_akhir)]
+    total_matrix = matrix[selected].sum(axis=0)
+    total_matrix[eppgbm_cohort.STATE_TIDAK_DIUKUR, eppgbm_cohort.STATE_TIDAK_DIUKUR] = 0
+    st.dataframe(pd.DataFrame(
+        total_matrix,
+        index=[f"Awal: {label}" for label in state_labels],
+        columns=[f"Akhir: {label}" for label in state_labels],
+    ), use_container_width=True)
+
+    summary_df = eppgbm_cohort.transition_summary(matrix[selected], labels[selected])
+    if summary_df.empty:
+        st.warning("⚠️ Tidak ada data yang dapat ditampilkan untuk filter yang dipilih.")
+        return
+    st.write(f"#### Ringkasan Transisi per {level.capitalize()}")
+    display_df = summary_df.rename(columns={"Wilayah": level.capitalize()})
+    for col in ["Prevalensi Awal (%)", "Prevalensi Akhir (%)"]:
+        display_df[col] = display_df[col].apply(lambda x: f"{x:.2f}%")
+    st.dataframe(display_df, use_container_width=True)
+
+    # Tren semua pasangan periode berurutan
+    pairs = cohort.consecutive_pairs()
+    st.write(f"### Tren Transisi {status_label} Antar Periode Berurutan ({title_suffix})")
+    trend_df = pd.DataFrame([
+        {"Transisi": f"{awal} → {akhir}", **{
+            name: int(sum(matrices[(awal, akhir)][selected][:, a, b].sum() for a, b in cells))
+            for name, cells in eppgbm_cohort.TRANSITION_SUMMARY.items()
+        }}
+        for awal, akhir in pairs
+    ])
+    st.dataframe(trend_df, use_container_width=True)
+    fig = px.line(
+        trend_df.melt(id_vars="Transisi", value_vars=["Kasus Baru", "Persisten", "Sembuh", "Tidak Terlacak"]),
+        x="Transisi", y="value", color="variable", markers=True,
+        title=f"Tren Transisi {status_label} ({title_suffix})",
+        labels={"value": "Jumlah Balita", "variable": "Kategori"},
+    )
+    fig.update_layout(template="plotly_white", xaxis_tickangle=-45, height=450)
+    st.plotly_chart(fig, use_container_width=True)
+
+
 # Sidebar untuk memilih submenu Analisis Longitudinal
 def analisis_longitudinal_balita(df):
     st.subheader("📈 Analisis Longitudinal Balita")
@@ -2437,56 +2375,43 @@ def analisis_longitudinal_balita(df):
         return
     periode_akhir = st.sidebar.selectbox("Pilih Periode Akhir", periode_akhir_options, index=len(periode_akhir_options)-1, key="periode_akhir_longitudinal")
 
-    # 3. Filter Dataset Berdasarkan Periode
-    df_filtered = df[df["periode"].isin([periode_awal, periode_akhir])].copy()
+    # 3. Filter Dataset Berdasarkan Periode (untuk pilihan lokasi)
+    df_filtered = df[df["periode"].isin([periode_awal, periode_akhir])]
 
-    # 4. Menghitung Usia dalam Bulan
+    # 4. Indeks kohort longitudinal (NIK × periode), dibangun sekali per upload
     try:
-        df_filtered["usia_bulan"] = ((pd.to_datetime(df_filtered["Tgl_ukur"]) - pd.to_datetime(df_filtered["Tgl_Lahir"])) / pd.Timedelta(days=30.4375)).astype(int)
-        df_filtered["usia_bulan"] = df_filtered["usia_bulan"].fillna(0).clip(lower=0)
+        cohort = eppgbm_cohort.cohort_index()
     except Exception as e:
-        st.error(f"⚠️ Gagal menghitung usia_bulan: {str(e)}. Pastikan kolom 'Tgl_ukur' dan 'Tgl_Lahir' memiliki format tanggal yang valid.")
+        st.error(f"⚠️ Gagal membangun indeks longitudinal: {str(e)}. Pastikan kolom 'Tgl_ukur' dan 'Tgl_Lahir' memiliki format tanggal yang valid.")
         return
 
-    # 5. Filter Balita untuk Analisis Longitudinal
-    nik_counts = df_filtered["nik"].value_counts()
-    longitudinal_niks = nik_counts.index
-    df_longitudinal = df_filtered[df_filtered["nik"].isin(longitudinal_niks)]
-
-    # 6. Menambahkan Status Stunting
-    df_longitudinal["is_stunting"] = (df_longitudinal["ZS_TBU"] < -2).fillna(False)
-
-    # 7. Pisahkan Data untuk Periode Awal dan Akhir
-    df_awal = df_longitudinal[df_longitudinal["periode"] == periode_awal]
-    df_akhir = df_longitudinal[df_longitudinal["periode"] == periode_akhir]
-
-    # 8. Filter Berdasarkan Puskesmas dan Kelurahan
+    # 5. Filter Berdasarkan Puskesmas dan Kelurahan
     st.sidebar.subheader("🔍 Filter Lokasi")
-    puskesmas_options = ["All"] + sorted(df_longitudinal["puskesmas"].unique().tolist())
+    puskesmas_options = ["All"] + sorted(df_filtered["puskesmas"].unique().tolist())
     selected_puskesmas = st.sidebar.selectbox("Pilih Puskesmas", puskesmas_options, key="puskesmas_longitudinal")
 
     if selected_puskesmas != "All":
-        kelurahan_options = ["All"] + sorted(df_longitudinal[df_longitudinal["puskesmas"] == selected_puskesmas]["kelurahan"].unique().tolist())
+        kelurahan_options = ["All"] + sorted(df_filtered[df_filtered["puskesmas"] == selected_puskesmas]["kelurahan"].unique().tolist())
         selected_kelurahan = st.sidebar.selectbox("Pilih Kelurahan", kelurahan_options, key="kelurahan_longitudinal")
     else:
         selected_kelurahan = "All"
+    region_filter = {"puskesmas": selected_puskesmas, "kelurahan": selected_kelurahan}
 
-    if selected_puskesmas != "All":
-        df_awal = df_awal[df_awal["puskesmas"] == selected_puskesmas]
-        df_akhir = df_akhir[df_akhir["puskesmas"] == selected_puskesmas]
-    if selected_kelurahan != "All":
-        df_awal = df_awal[df_awal["kelurahan"] == selected_kelurahan]
-        df_akhir = df_akhir[df_akhir["kelurahan"] == selected_kelurahan]
-
-    # 9. Submenu Analisis
+    # 6. Submenu Analisis
     st.sidebar.subheader("📊 Submenu Analisis Longitudinal")
     submenu_options = [
         "Analisis Tabulasi Data Longitudinal Balita Stunting",
-        "Grafik Analisis Data Longitudinal Balita Stunting"
+        "Grafik Analisis Data Longitudinal Balita Stunting",
+        "Matriks Transisi Status Gizi Antar Periode"
     ]
     selected_submenu = st.sidebar.radio("Pilih Submenu Analisis", submenu_options, key="submenu_longitudinal")
 
-    # 10. Fungsi untuk Menghitung Selisih Bulan Antar Periode
+    # Matriks transisi memakai seluruh periode (di-cache per upload), bukan hanya dua periode terpilih
+    if selected_submenu == "Matriks Transisi Status Gizi Antar Periode":
+        show_transition_matrices(cohort, periode_awal, periode_akhir, selected_puskesmas, selected_kelurahan)
+        return
+
+    # 7. Fungsi untuk Menghitung Selisih Bulan Antar Periode
     def calculate_month_diff(periode1, periode2):
         month_map = {
             "januari": 1, "februari": 2, "maret": 3, "april": 4, "mei": 5, "juni": 6,
@@ -2504,29 +2429,12 @@ def analisis_longitudinal_balita(df):
 
     month_diff = calculate_month_diff(periode_awal, periode_akhir)
 
-    # Fungsi untuk mengelompokkan usia ke dalam kategori
-    def categorize_age_group(age_in_months):
-        if 0 <= age_in_months <= 5:
-            return "0-5 bulan"
-        elif 6 <= age_in_months <= 11:
-            return "6-11 bulan"
-        elif 12 <= age_in_months <= 23:
-            return "12-23 bulan"
-        elif 24 <= age_in_months <= 35:
-            return "24-35 bulan"
-        elif 36 <= age_in_months <= 47:
-            return "36-47 bulan"
-        elif 48 <= age_in_months <= 59:
-            return "48-59 bulan"
-        else:
-            return "Lainnya"
-
     # Fungsi untuk menghitung distribusi kasus berdasarkan kelompok usia
     def calculate_age_distribution(df, stunting_col, group_by_col="puskesmas", category=""):
         if "usia_bulan" not in df.columns:
             return pd.DataFrame()
 
-        df["age_group"] = df["usia_bulan"].apply(categorize_age_group)
+        df["age_group"] = eppgbm_derived.age_group(df["usia_bulan"]).astype(object).fillna("Lainnya")
         df_stunting = df[df[stunting_col] == True]
         age_dist = df_stunting.groupby([group_by_col, "age_group"]).size().unstack(fill_value=0)
 
@@ -2572,67 +2480,26 @@ def analisis_longitudinal_balita(df):
 
         return result_df
 
-    # Definisi fungsi calculate_stunting_metrics
-    def calculate_stunting_metrics(df_awal, df_akhir, month_diff, group_by_col):
-        # Hitung Current Stunting (jumlah stunting pada periode akhir per puskesmas)
-        current_stunting = df_akhir[df_akhir["is_stunting"]].groupby(group_by_col).size()
-
-        # Cek apakah df_awal kosong
-        if df_awal.empty:
+    # Definisi fungsi calculate_stunting_metrics (dari hasil lookup indeks kohort)
+    def calculate_stunting_metrics(transitions, group_by_col):
+        # Cek apakah data periode awal kosong
+        if not transitions["is_stunting_awal"].notna().any():
             st.warning("⚠️ Tidak ada data pada periode awal untuk filter yang dipilih. Analisis tidak dapat dilakukan.")
             return pd.DataFrame()
 
-        # Cek apakah kolom usia_bulan ada di df_awal
-        if "usia_bulan" not in df_awal.columns:
-            st.error("⚠️ Kolom 'usia_bulan' tidak ditemukan di data periode awal. Silakan periksa data.")
-            return pd.DataFrame()
-
-        # Merge data awal dan akhir berdasarkan NIK
-        merged_df = pd.merge(
-            df_awal[["nik", "is_stunting", "usia_bulan", group_by_col]],
-            df_akhir[["nik", "is_stunting", group_by_col]],
-            on=["nik", group_by_col],
-            how="outer",
-            suffixes=("_awal", "_akhir")
-        )
-
-        # Isi NaN pada usia_bulan dengan 0
-        merged_df["usia_bulan"] = merged_df["usia_bulan"].fillna(0).astype(int)
-
-        # New Stunting Cases
-        new_cases = merged_df[
-            (merged_df["is_stunting_awal"].isna() | (merged_df["is_stunting_awal"] == False)) & 
-            (merged_df["is_stunting_akhir"] == True)
-        ].groupby(group_by_col).size()
-
-        # Existing Stunting Cases
-        existing_cases = merged_df[
-            (merged_df["is_stunting_awal"] == True) & 
-            (merged_df["is_stunting_akhir"] == True)
-        ].groupby(group_by_col).size()
-
-        # Dropout Stunting Cases
-        dropout_cases = merged_df[
-            (merged_df["is_stunting_awal"] == True) & 
-            (merged_df["is_stunting_akhir"].isna()) & 
-            ((merged_df["usia_bulan"] + month_diff) > 60)
-        ].groupby(group_by_col).size()
-
-        # Recovered Stunting Cases
-        recovered_cases = merged_df[
-            (merged_df["is_stunting_awal"] == True) & 
-            (merged_df["is_stunting_akhir"] == False)
-        ].groupby(group_by_col).size()
-
-        # Gabungkan ke dalam DataFrame
-        result_df = pd.DataFrame({
-            "Puskesmas" if group_by_col == "puskesmas" else "Kelurahan": new_cases.index,
-            "Current Stunting": current_stunting,
-            "New Stunting Cases (Jumlah)": new_cases,
-            "Existing Stunting Cases (Jumlah)": existing_cases,
-            "Dropout Stunting Cases (Jumlah)": dropout_cases,
-            "Recovered Stunting Cases (Jumlah)": recovered_cases
-        }).fillna(0)
+        # Current Stunting (stunting pada periode akhir) dan kategori kohort per wilayah
+        region_col = "Puskesmas" if group_by_col == "puskesmas" else "Kelurahan"
+        counts = pd.DataFrame({
+            region_col: transitions[group_by_col],
+            "Current Stunting": transitions["is_stunting_akhir"] == True,
+            "New Stunting Cases (Jumlah)": transitions["is_stunting_new"],
+            "Existing Stunting Cases (Jumlah)": transitions["is_stunting_existing"],
+            "Dropout Stunting Cases (Jumlah)": transitions["is_stunting_dropout"],
+            "Recovered Stunting Cases (Jumlah)": transitions["is_stunting_recovered"],
+        })
+        result_df = counts.groupby(region_col).sum().reset_index()
+        # Hanya wilayah yang memiliki minimal satu kasus
+        result_df = result_df[result_df.drop(columns=[region_col]).sum(axis=1) > 0].reset_index(drop=True)
 
         # Hitung persentase berdasarkan Current Stunting per puskesmas (simpan sebagai float)
         result_df["New Stunting Cases (%)"] = (result_df["New Stunting Cases (Jumlah)"] / result_df["Current Stunting"] * 100).fillna(0)
@@ -2658,6 +2525,10 @@ def analisis_longitudinal_balita(df):
 
         return result_df
 
+    # Tentukan level analisis berdasarkan filter lalu selesaikan kohort kedua periode (lookup array)
+    group_by_col = "puskesmas" if selected_puskesmas == "All" else "kelurahan"
+    transitions = cohort.transitions(periode_awal, periode_akhir, group_by_col, "is_stunting", region_filter, month_diff)
+
     # Definisi stunting_categories
     stunting_categories = [
         ("New Stunting Cases", "is_stunting_new", "Distribusi Kasus Stunting Baru"),
@@ -2666,7 +2537,7 @@ def analisis_longitudinal_balita(df):
         ("Recovered Stunting Cases", "is_stunting_recovered", "Distribusi Kasus Stunting Sembuh")
     ]
 
-    # 11. Analisis Tabulasi Data Longitudinal (2a)
+    # 8. Analisis Tabulasi Data Longitudinal (2a)
     if selected_submenu == "Analisis Tabulasi Data Longitudinal Balita Stunting":
         with st.expander("📜 Definisi dan Insight Analisis Tabulasi Longitudinal Stunting", expanded=False):
             st.markdown("""
@@ -2699,7 +2570,7 @@ def analisis_longitudinal_balita(df):
             st.write(f"### Matriks Tabulasi Longitudinal Stunting (Puskesmas: {selected_puskesmas}, Kelurahan: {selected_kelurahan}, Periode {periode_awal} - {periode_akhir})")
 
         # Hitung metrik utama
-        tabulation_df = calculate_stunting_metrics(df_awal, df_akhir, month_diff, group_by_col)
+        tabulation_df = calculate_stunting_metrics(transitions, group_by_col)
 
         # Cek apakah tabulation_df kosong
         if tabulation_df.empty:
@@ -2717,35 +2588,12 @@ def analisis_longitudinal_balita(df):
         # Tambahkan bagian distribusi berdasarkan kelompok usia
         st.subheader("📊 Distribusi Kasus Stunting Berdasarkan Kelompok Usia")
 
-        # Buat DataFrame sementara untuk setiap kategori
-        merged_df = pd.merge(
-            df_awal[["nik", "is_stunting", "usia_bulan", group_by_col]],
-            df_akhir[["nik", "is_stunting", "usia_bulan", group_by_col]],
-            on=["nik", group_by_col],
-            how="outer",
-            suffixes=("_awal", "_akhir")
-        )
-        merged_df["usia_bulan_awal"] = merged_df["usia_bulan_awal"].fillna(0).astype(int)
-        merged_df["usia_bulan_akhir"] = merged_df["usia_bulan_akhir"].fillna(0).astype(int)
-
-        # Tambahkan kolom untuk masing-masing kategori
-        merged_df["is_stunting_new"] = (merged_df["is_stunting_awal"].isna() | (merged_df["is_stunting_awal"] == False)) & (merged_df["is_stunting_akhir"] == True)
-        merged_df["is_stunting_existing"] = (merged_df["is_stunting_awal"] == True) & (merged_df["is_stunting_akhir"] == True)
-        merged_df["is_stunting_dropout"] = (merged_df["is_stunting_awal"] == True) & (merged_df["is_stunting_akhir"].isna()) & ((merged_df["usia_bulan_awal"] + month_diff) > 60)
-        merged_df["is_stunting_recovered"] = (merged_df["is_stunting_awal"] == True) & (merged_df["is_stunting_akhir"] == False)
-
-        # Gunakan usia dari periode akhir untuk New dan Existing, usia dari periode awal untuk Dropout dan Recovered
-        merged_df["usia_bulan"] = merged_df.apply(
-            lambda row: row["usia_bulan_akhir"] if row["is_stunting_new"] or row["is_stunting_existing"] else row["usia_bulan_awal"],
-            axis=1
-        )
-
         # Loop untuk setiap kategori stunting
         for category, col, title in stunting_categories:
             st.write(f"#### {title} Berdasarkan Kelompok Usia")
 
             # Hitung distribusi
-            age_dist_df = calculate_age_distribution(merged_df, col, group_by_col, category=category)
+            age_dist_df = calculate_age_distribution(transitions.copy(), col, group_by_col, category=category)
 
             if age_dist_df.empty:
                 st.warning(f"⚠️ Tidak ada data untuk {title.lower()}.")
@@ -2803,7 +2651,7 @@ def analisis_longitudinal_balita(df):
             group_by_col = "kelurahan"
             title_suffix = f"Puskesmas: {selected_puskesmas}, Kelurahan: {selected_kelurahan}"
 
-        tabulation_df = calculate_stunting_metrics(df_awal, df_akhir, month_diff, group_by_col)
+        tabulation_df = calculate_stunting_metrics(transitions, group_by_col)
 
         if tabulation_df.empty:
             st.warning("⚠️ Tidak ada data yang dapat ditampilkan untuk filter yang dipilih.")
@@ -2842,31 +2690,10 @@ def analisis_longitudinal_balita(df):
 
         # Tambahkan grafik distribusi usia (persentase)
         st.subheader("📊 Distribusi Kasus Stunting Berdasarkan Kelompok Usia (Grafik)")
-        
-        # Buat DataFrame sementara untuk setiap kategori
-        merged_df = pd.merge(
-            df_awal[["nik", "is_stunting", "usia_bulan", group_by_col]],
-            df_akhir[["nik", "is_stunting", "usia_bulan", group_by_col]],
-            on=["nik", group_by_col],
-            how="outer",
-            suffixes=("_awal", "_akhir")
-        )
-        merged_df["usia_bulan_awal"] = merged_df["usia_bulan_awal"].fillna(0).astype(int)
-        merged_df["usia_bulan_akhir"] = merged_df["usia_bulan_akhir"].fillna(0).astype(int)
-
-        merged_df["is_stunting_new"] = (merged_df["is_stunting_awal"].isna() | (merged_df["is_stunting_awal"] == False)) & (merged_df["is_stunting_akhir"] == True)
-        merged_df["is_stunting_existing"] = (merged_df["is_stunting_awal"] == True) & (merged_df["is_stunting_akhir"] == True)
-        merged_df["is_stunting_dropout"] = (merged_df["is_stunting_awal"] == True) & (merged_df["is_stunting_akhir"].isna()) & ((merged_df["usia_bulan_awal"] + month_diff) > 60)
-        merged_df["is_stunting_recovered"] = (merged_df["is_stunting_awal"] == True) & (merged_df["is_stunting_akhir"] == False)
-
-        merged_df["usia_bulan"] = merged_df.apply(
-            lambda row: row["usia_bulan_akhir"] if row["is_stunting_new"] or row["is_stunting_existing"] else row["usia_bulan_awal"],
-            axis=1
-        )
 
         for category, col, title in stunting_categories:
             st.write(f"#### {title} Berdasarkan Kelompok Usia (Stacked Bar)")
-            age_dist_df = calculate_age_distribution(merged_df, col, group_by_col, category=category)
+            age_dist_df = calculate_age_distribution(transitions.copy(), col, group_by_col, category=category)
 
             if age_dist_df.empty:
                 st.warning(f"⚠️ Tidak ada data untuk {title.lower()}.")
@@ -2914,12 +2741,7 @@ def analisis_longitudinal_balita(df):
 def show_dashboard():
     st.title("📈 Dashboard EPPGBM")
 
-    # Koneksi ke database data_eppgbm.db
-    conn = sqlite3.connect("data_eppgbm.db")
     try:
-        # Membaca data dari tabel data_eppgbm
-        df = pd.read_sql_query("SELECT * FROM data_eppgbm", conn)
-
         # Pilihan submenu menggunakan radio button
         st.sidebar.header("🔍 Pilih Analisis")
         analysis_options = [
@@ -2933,6 +2755,17 @@ def show_dashboard():
         ]
         selected_analysis = st.sidebar.radio("Pilih submenu:", analysis_options, index=0)
 
+        # Kolom turunan (usia, kelompok usia, flag, CIAF) dihitung ulang sekali bila aturannya
+        # berubah sejak upload terakhir
+        eppgbm_store.ensure_derived()
+
+        # Membaca data dari data_eppgbm (data_eppgbm.db); identitas detail (nama orang tua,
+        # alamat) hanya dimuat untuk daftar balita yang bisa diunduh
+        if selected_analysis == "Daftar Balita Bermasalah":
+            df = data_access.load_eppgbm()
+        else:
+            df = data_access.load_eppgbm(columns=eppgbm_store.analysis_columns())
+
         # Logika untuk menampilkan analisis berdasarkan pilihan
         if selected_analysis == "Informasi Data EPPGBM":
             show_info_data_eppgbm(df)
@@ -2952,8 +2785,6 @@ def show_dashboard():
     except Exception as e:
         st.warning("⚠️ Data belum tersedia atau terjadi kesalahan koneksi ke database.")
         st.error(f"Error: {e}")
-    finally:
-        conn.close()
 
     st.markdown(
         '<p style="text-align: center; font-size: 12px; color: grey;">'
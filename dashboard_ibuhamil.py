@@ -1,5 +1,7 @@
 import streamlit as st
-import sqlite3
+import data_access
+import outlier_detection
+import reporting_coverage
 import pandas as pd
 import plotly.express as px
 import os
@@ -11,19 +13,15 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from io import BytesIO
 import numpy as np
-from scipy import stats
 
 # ----------------------------- #
 # 📥 Fungsi untuk Load Data
 # ----------------------------- #
-@st.cache_data
 def load_data():
     """Memuat data dari database SQLite rcs_data.db."""
     try:
-        conn = sqlite3.connect("rcs_data.db")
-        df = pd.read_sql_query("SELECT * FROM data_ibuhamil", conn)
-        desa_df = pd.read_sql_query("SELECT * FROM dataset_desa", conn)
-        conn.close()
+        df = data_access.load_ibuhamil()
+        desa_df = data_access.load_dataset_desa()
         # Hapus duplikat jika ada
         df = df.drop_duplicates()
         desa_df = desa_df.drop_duplicates()
@@ -38,7 +36,7 @@ def load_data():
 def get_last_upload_time():
     """Mengembalikan waktu terakhir modifikasi file database."""
     try:
-        file_path = "rcs_data.db"
+        file_path = data_access.active_db_path(data_access.RCS_DB_PATH)
         if os.path.exists(file_path):
             last_modified_time = os.path.getmtime(file_path)
             return datetime.datetime.fromtimestamp(last_modified_time).strftime("%d %B %Y, %H:%M:%S")
@@ -103,35 +101,12 @@ def compliance_rate(filtered_df, desa_df, bulan_filter, puskesmas_filter, kelura
 
     st.metric(label="Compliance Rate (%)", value=f"{compliance_value:.2f}%")
 
-    # Tentukan iterable untuk bulan berdasarkan kondisi
-    if bulan_filter == "All" and 'Bulan' in desa_df.columns:
-        bulan_iterable = sorted(desa_df['Bulan'].unique())
+    # Tabel Compliance Rate per Puskesmas (per Bulan bila dataset desa memiliki kolom Bulan)
+    if bulan_filter == "All" and 'Bulan' in desa_df.columns and 'Bulan' in filtered_df.columns:
+        compliance_df = reporting_coverage.compliance_table(filtered_df, desa_df, by=["Bulan", "Puskesmas"])
     else:
-        bulan_iterable = [int(bulan_filter)] if bulan_filter != "All" and bulan_filter.isdigit() else [0]
-
-    # Tabel Compliance Rate per Puskesmas
-    compliance_data = []
-    for bulan in bulan_iterable:
-        for puskesmas in sorted(desa_df['Puskesmas'].unique()):
-            # Filter data berdasarkan Bulan dan Puskesmas
-            desa_filter = desa_df[(desa_df['Puskesmas'] == puskesmas) & 
-                                (desa_df['Bulan'] == bulan if bulan_filter != "All" and 'Bulan' in desa_df.columns else True)]
-            filtered_filter = filtered_df[(filtered_df['Puskesmas'] == puskesmas) & 
-                                        (filtered_df['Bulan'] == bulan if bulan_filter != "All" and 'Bulan' in filtered_df.columns else True)]
-
-            jumlah_desa = desa_filter['Kelurahan'].nunique()
-            jumlah_desa_lapor = filtered_filter['Kelurahan'].nunique()
-            compliance_rate_value = (jumlah_desa_lapor / jumlah_desa * 100) if jumlah_desa else 0
-
-            compliance_data.append({
-                "Bulan": bulan if bulan_filter == "All" else bulan_filter,
-                "Puskesmas": puskesmas,
-                "Jumlah Desa": jumlah_desa,
-                "Jumlah Desa Lapor": jumlah_desa_lapor,
-                "Compliance Rate (%)": f"{compliance_rate_value:.2f}%"
-            })
-
-    compliance_df = pd.DataFrame(compliance_data)
+        compliance_df = reporting_coverage.compliance_table(filtered_df, desa_df)
+        compliance_df.insert(0, "Bulan", bulan_filter)
     st.subheader("📋 Tabel Compliance Rate per Puskesmas")
     st.dataframe(compliance_df, use_container_width=True)
 
@@ -147,9 +122,7 @@ def compliance_rate(filtered_df, desa_df, bulan_filter, puskesmas_filter, kelura
     # Breakdown per Kelurahan jika Puskesmas difilter
     if puskesmas_filter != "All":
         st.subheader(f"📊 Breakdown Compliance Rate di {puskesmas_filter}")
-        kelurahan_data = [{"Kelurahan": kel, "Status Laporan": "✅ Lapor" if kel in desa_terlapor else "❌ Tidak Lapor"}
-                         for kel in desa_df[desa_df['Puskesmas'] == puskesmas_filter]['Kelurahan'].unique()]
-        kelurahan_df = pd.DataFrame(kelurahan_data)
+        kelurahan_df = reporting_coverage.kelurahan_status(desa_df, puskesmas_filter, desa_terlapor)
         st.dataframe(kelurahan_df, use_container_width=True)
 
         fig_kelurahan = px.bar(kelurahan_df, x="Kelurahan", y=kelurahan_df['Status Laporan'].apply(lambda x: 100 if x == "✅ Lapor" else 0),
@@ -161,7 +134,7 @@ def compliance_rate(filtered_df, desa_df, bulan_filter, puskesmas_filter, kelura
 # ----------------------------- #
 # 📋 Completeness Rate
 # ----------------------------- #
-def completeness_rate(filtered_df, desa_df, periode_filter, puskesmas_filter, kelurahan_filter):
+def completeness_rate(coverage_filters, desa_df, periode_filter, puskesmas_filter, kelurahan_filter):
     """Menghitung dan menampilkan tingkat kelengkapan data untuk data ibu hamil."""
     st.header("📋 Completeness Rate")
     # Tambahkan info dengan tone akademik, rendering rumus, penjelasan untuk orang awam, dan background biru muda
@@ -194,99 +167,48 @@ def completeness_rate(filtered_df, desa_df, periode_filter, puskesmas_filter, ke
         """, unsafe_allow_html=True)
 
     # Daftar kolom kunci untuk cek kelengkapan
-    completeness_columns = [
-        "Jumlah_ibu_hamil_periksa_Hb",
-        "Anemia_ringan",
-        "Anemia_sedang",
-        "Anemia_berat",
-        "Jumlah_ibu_hamil_anemia",
-        "Jumlah_ibu_hamil_anemia_yang_mendapat_TTD_oral",
-        "Jumlah_ibu_hamil_anemia_sedang_dan_berat_yang_mendapatkan_tata_laksana_di_tingkat_lanjutan",
-        "Jumlah_Sasaran_Ibu_Hamil",
-        "Jumlah_ibu_hamil_mendapat_minimal_180_tablet_MMS",
-        "Jumlah_ibu_hamil_mendapat_minimal_180_tablet_TTD",
-        "Jumlah_ibu_hamil_mengonsumsi_minimal_180_tablet_MMS",
-        "Jumlah_ibu_hamil_mengonsumsi_minimal_180_tablet_TTD",
-        "Jumlah_ibu_hamil_diukur_LILA_IMT",
-        "Jumlah_ibu_hamil_risiko_KEK",
-        "Jumlah_ibu_hamil_KEK_mendapat_tambahan_asupan_gizi",
-        "Jumlah_ibu_hamil_KEK_mengonsumsi_tambahan_asupan_gizi"
-    ]
+    completeness_columns = reporting_coverage.COMPLETENESS_COLUMNS["data_ibuhamil"]
+
+    # Cube kelengkapan tersimpan saat upload (Tahun × Bulan × Puskesmas × Kelurahan) sesuai filter
+    try:
+        cube = reporting_coverage.load_coverage("data_ibuhamil", coverage_filters)
+    except Exception as e:
+        st.error(f"❌ Gagal memuat data kelengkapan: {e}")
+        return
 
     # Cek kolom yang hilang di dataset
-    missing_cols = [col for col in completeness_columns if col not in filtered_df.columns]
+    missing_cols = [col for col in completeness_columns if col not in cube.columns]
     if missing_cols:
         st.error(f"⚠️ Kolom berikut tidak ditemukan di dataset: {missing_cols}")
         return
 
-    # Tambahkan kolom 'Lengkap' untuk mengecek apakah semua kolom kunci terisi
-    filtered_df['Lengkap'] = filtered_df[completeness_columns].notna().all(axis=1)
-
-    # Tentukan scope berdasarkan filter
-    scope = filtered_df.copy()
+    # Bulan dari filter periode (Triwulan → tiga bulan)
+    bulan_scope = None
     if periode_filter != "All":
-        if 'Bulan' in scope.columns:
-            if isinstance(periode_filter, str) and periode_filter.startswith("Triwulan"):
-                triwulan_map = {
-                    "Triwulan 1": [1, 2, 3],
-                    "Triwulan 2": [4, 5, 6],
-                    "Triwulan 3": [7, 8, 9],
-                    "Triwulan 4": [10, 11, 12]
-                }
-                bulan_triwulan = triwulan_map.get(periode_filter, [])
-                if bulan_triwulan:
-                    scope = scope[scope['Bulan'].isin(bulan_triwulan)]
-            else:
-                try:
-                    bulan_filter_int = int(periode_filter)
-                    scope = scope[scope['Bulan'] == bulan_filter_int]
-                except ValueError:
-                    st.warning("⚠️ Pilihan periode tidak valid. Menampilkan semua data.")
-    if puskesmas_filter != "All":
-        scope = scope[scope['Puskesmas'] == puskesmas_filter]
-    if kelurahan_filter != "All":
-        scope = scope[scope['Kelurahan'] == kelurahan_filter]
+        if isinstance(periode_filter, str) and periode_filter.startswith("Triwulan"):
+            triwulan_map = {
+                "Triwulan 1": [1, 2, 3],
+                "Triwulan 2": [4, 5, 6],
+                "Triwulan 3": [7, 8, 9],
+                "Triwulan 4": [10, 11, 12]
+            }
+            bulan_scope = triwulan_map.get(periode_filter) or None
+        else:
+            try:
+                bulan_scope = int(periode_filter)
+            except ValueError:
+                st.warning("⚠️ Pilihan periode tidak valid. Menampilkan semua data.")
+    cube_periode = reporting_coverage.slice_cube(cube, bulan=bulan_scope)
 
     # Hitung completeness rate
-    lengkap_count = scope['Lengkap'].sum()
-    total_entries = scope.shape[0]
-    completeness_value = (lengkap_count / total_entries * 100) if total_entries else 0
+    scope = reporting_coverage.slice_cube(cube_periode, puskesmas=puskesmas_filter, kelurahan=kelurahan_filter)
+    completeness_value = reporting_coverage.completeness_value(scope)
 
     st.metric(label="Completeness Rate (%)", value=f"{completeness_value:.2f}%",
               help="Persentase entri dengan semua kolom kunci terisi lengkap.")
 
     # Tabel Completeness Rate per Puskesmas
-    completeness_data = []
-    for puskesmas in sorted(desa_df['Puskesmas'].unique()):
-        df_pkm = filtered_df[filtered_df['Puskesmas'] == puskesmas]
-        if periode_filter != "All" and 'Bulan' in df_pkm.columns:
-            if isinstance(periode_filter, str) and periode_filter.startswith("Triwulan"):
-                triwulan_map = {
-                    "Triwulan 1": [1, 2, 3],
-                    "Triwulan 2": [4, 5, 6],
-                    "Triwulan 3": [7, 8, 9],
-                    "Triwulan 4": [10, 11, 12]
-                }
-                bulan_triwulan = triwulan_map.get(periode_filter, [])
-                if bulan_triwulan:
-                    df_pkm = df_pkm[df_pkm['Bulan'].isin(bulan_triwulan)]
-            else:
-                try:
-                    bulan_filter_int = int(periode_filter)
-                    df_pkm = df_pkm[df_pkm['Bulan'] == bulan_filter_int]
-                except ValueError:
-                    st.warning("⚠️ Pilihan periode tidak valid untuk puskesmas ini.")
-        total_entries_pkm = df_pkm.shape[0]
-        lengkap_entries_pkm = df_pkm['Lengkap'].sum()
-        rate = (lengkap_entries_pkm / total_entries_pkm * 100) if total_entries_pkm else 0
-        completeness_data.append({
-            "Puskesmas": puskesmas,
-            "Jumlah Entri": total_entries_pkm,
-            "Entri Lengkap": lengkap_entries_pkm,
-            "Completeness Rate (%)": f"{rate:.2f}%"
-        })
-
-    completeness_df = pd.DataFrame(completeness_data)
+    completeness_df = reporting_coverage.completeness_table(cube_periode, desa_df)
     st.subheader("📊 Tabel Completeness Rate per Puskesmas")
     st.dataframe(completeness_df, use_container_width=True)
 
@@ -306,12 +228,51 @@ def completeness_rate(filtered_df, desa_df, periode_filter, puskesmas_filter, ke
 
     # Detail kelengkapan per kolom (opsional)
     if st.checkbox("🔍 Tampilkan Detail Kelengkapan per Kolom"):
-        completeness_per_col = filtered_df[completeness_columns].notna().mean() * 100
+        completeness_per_col = reporting_coverage.column_completeness(cube, completeness_columns)
         st.subheader("📋 Persentase Kelengkapan per Kolom")
         col_data = [{"Kolom": col, "Kelengkapan (%)": f"{val:.2f}%"} 
                    for col, val in completeness_per_col.items()]
         st.dataframe(pd.DataFrame(col_data), use_container_width=True)
 
+# ----------------------------- #
+# 🗓️ Matriks Cakupan Pelaporan
+# ----------------------------- #
+def coverage_matrix(desa_df, puskesmas_filter, kelurahan_filter):
+    """Menampilkan heatmap cakupan pelaporan dan kelengkapan per kolom untuk seluruh bulan."""
+    st.header("🗓️ Matriks Cakupan Pelaporan")
+    try:
+        cube = reporting_coverage.load_coverage("data_ibuhamil")
+    except Exception as e:
+        st.error(f"❌ Gagal memuat matriks cakupan pelaporan: {e}")
+        return
+    if cube.empty:
+        st.warning("⚠️ Belum ada data untuk matriks cakupan pelaporan.")
+        return
+
+    # Cakupan pelaporan: compliance rate per Puskesmas, atau lapor/tidak per kelurahan
+    level = "Kelurahan" if puskesmas_filter != "All" else "Puskesmas"
+    reporting_df = reporting_coverage.reporting_matrix(cube, desa_df, puskesmas_filter)
+    st.subheader(f"📊 Cakupan Pelaporan per {level} × Bulan")
+    fig_reporting = px.imshow(reporting_df, text_auto=".0f", aspect="auto", zmin=0, zmax=100,
+                              color_continuous_scale="RdYlGn", title=f"Cakupan Pelaporan per {level} × Bulan Indikator Ibu Hamil")
+    fig_reporting.update_layout(xaxis_title="Periode", yaxis_title=level, coloraxis_colorbar_title="Lapor (%)",
+                                title_x=0.5, height=max(400, 25 * len(reporting_df)))
+    st.plotly_chart(fig_reporting, key=f"coverage_reporting_{puskesmas_filter}_{time.time()}", use_container_width=True)
+
+    # Kelengkapan per kolom kunci di wilayah terpilih
+    scope = cube
+    if puskesmas_filter != "All":
+        scope = scope[scope['Puskesmas'] == puskesmas_filter]
+    if kelurahan_filter != "All":
+        scope = scope[scope['Kelurahan'] == kelurahan_filter]
+    completeness_df = reporting_coverage.completeness_matrix(scope)
+    st.subheader("📋 Kelengkapan per Kolom × Bulan")
+    fig_completeness = px.imshow(completeness_df, text_auto=".0f", aspect="auto", zmin=0, zmax=100,
+                                 color_continuous_scale="RdYlGn", title="Kelengkapan Data per Kolom × Bulan")
+    fig_completeness.update_layout(xaxis_title="Periode", yaxis_title="Kolom", coloraxis_colorbar_title="Terisi (%)",
+                                   title_x=0.5, height=max(400, 25 * len(completeness_df)))
+    st.plotly_chart(fig_completeness, key=f"coverage_completeness_{puskesmas_filter}_{kelurahan_filter}_{time.time()}", use_container_width=True)
+
 # ----------------------------- #
 # 🩺 Cakupan Layanan Kesehatan Ibu Hamil Anemia
 # ----------------------------- #
@@ -721,67 +682,23 @@ def cakupan_layanan_anemia_ibu_hamil(filtered_df, desa_df, periode_filter, puske
     # 3.2 ⚙️ Analisis Outlier Statistik (Poin 2)
     st.subheader("⚙️ Analisis Outlier Statistik")
     cols_to_check = list(metrik_data.keys())
-    base_columns = ["Puskesmas", "Metrik", "Nilai", "Metode"]
-    if puskesmas_filter != "All":
-        base_columns.insert(1, "Kelurahan")
-    statistical_outliers_df = pd.DataFrame(columns=base_columns)
 
     outlier_method = st.selectbox(
         "Pilih Metode Deteksi Outlier Statistik",
-        ["Tidak Ada", "Z-Score", "IQR"],
+        outlier_detection.OUTLIER_METHODS,
         key=f"outlier_method_select_ibu_hamil_anemia_{periode_filter}"
     )
 
-    if outlier_method != "Tidak Ada":
-        for metric in cols_to_check:
-            if metric not in recap_df.columns:
-                continue
-
-            if puskesmas_filter == "All":
-                metric_data = recap_df[[metric, "Puskesmas"]].dropna()
-            else:
-                metric_data = recap_df[[metric, "Puskesmas", "Kelurahan"]].dropna()
-
-            if metric_data.empty:
-                continue
-
-            if outlier_method == "Z-Score":
-                z_scores = stats.zscore(metric_data[metric], nan_policy='omit')
-                z_outlier_mask = abs(z_scores) > 3
-                z_outliers = metric_data[z_outlier_mask].copy()
-                if not z_outliers.empty:
-                    z_outliers["Metrik"] = metric
-                    z_outliers["Nilai"] = z_outliers[metric]
-                    z_outliers["Metode"] = "Z-Score"
-                    if puskesmas_filter == "All":
-                        z_outliers_subset = z_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        z_outliers_subset = z_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat(
-                        [statistical_outliers_df, z_outliers_subset],
-                        ignore_index=True
-                    )
-
-            elif outlier_method == "IQR":
-                Q1 = metric_data[metric].quantile(0.25)
-                Q3 = metric_data[metric].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                iqr_outlier_mask = (metric_data[metric] < lower_bound) | (metric_data[metric] > upper_bound)
-                iqr_outliers = metric_data[iqr_outlier_mask].copy()
-                if not iqr_outliers.empty:
-                    iqr_outliers["Metrik"] = metric
-                    iqr_outliers["Nilai"] = iqr_outliers[metric]
-                    iqr_outliers["Metode"] = "IQR"
-                    if puskesmas_filter == "All":
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat(
-                        [statistical_outliers_df, iqr_outliers_subset],
-                        ignore_index=True
-                    )
+    statistical_outliers_df = outlier_detection.statistical_outliers(
+        recap_df, cols_to_check, outlier_method, puskesmas_filter,
+        cache_key=outlier_detection.cache_key(
+            "cakupan_layanan_anemia_ibu_hamil", ["data_ibuhamil", "dataset_desa"], periode_filter, puskesmas_filter, kelurahan_filter, periode_type
+        ),
+        table_name="data_ibuhamil",
+        flag_filters=outlier_detection.flag_filters(
+            puskesmas_filter, kelurahan_filter, periode=periode_filter,
+        ),
+    )
 
     if not statistical_outliers_df.empty:
         st.markdown("### 📊 Tabel Outlier Statistik")
@@ -1519,67 +1436,23 @@ def cakupan_suplementasi_gizi_ibu_hamil(filtered_df, desa_df, periode_filter, pu
     # 3.2 ⚙️ Analisis Outlier Statistik (Poin 2)
     st.subheader("⚙️ Analisis Outlier Statistik")
     cols_to_check = list(metrik_data.keys())
-    base_columns = ["Puskesmas", "Metrik", "Nilai", "Metode"]
-    if puskesmas_filter != "All":
-        base_columns.insert(1, "Kelurahan")
-    statistical_outliers_df = pd.DataFrame(columns=base_columns)
 
     outlier_method = st.selectbox(
         "Pilih Metode Deteksi Outlier Statistik",
-        ["Tidak Ada", "Z-Score", "IQR"],
+        outlier_detection.OUTLIER_METHODS,
         key=f"outlier_method_select_suplementasi_gizi_{periode_filter}"
     )
 
-    if outlier_method != "Tidak Ada":
-        for metric in cols_to_check:
-            if metric not in recap_df.columns:
-                continue
-
-            if puskesmas_filter == "All":
-                metric_data = recap_df[[metric, "Puskesmas"]].dropna()
-            else:
-                metric_data = recap_df[[metric, "Puskesmas", "Kelurahan"]].dropna()
-
-            if metric_data.empty:
-                continue
-
-            if outlier_method == "Z-Score":
-                z_scores = stats.zscore(metric_data[metric], nan_policy='omit')
-                z_outlier_mask = abs(z_scores) > 3
-                z_outliers = metric_data[z_outlier_mask].copy()
-                if not z_outliers.empty:
-                    z_outliers["Metrik"] = metric
-                    z_outliers["Nilai"] = z_outliers[metric]
-                    z_outliers["Metode"] = "Z-Score"
-                    if puskesmas_filter == "All":
-                        z_outliers_subset = z_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        z_outliers_subset = z_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat(
-                        [statistical_outliers_df, z_outliers_subset],
-                        ignore_index=True
-                    )
-
-            elif outlier_method == "IQR":
-                Q1 = metric_data[metric].quantile(0.25)
-                Q3 = metric_data[metric].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                iqr_outlier_mask = (metric_data[metric] < lower_bound) | (metric_data[metric] > upper_bound)
-                iqr_outliers = metric_data[iqr_outlier_mask].copy()
-                if not iqr_outliers.empty:
-                    iqr_outliers["Metrik"] = metric
-                    iqr_outliers["Nilai"] = iqr_outliers[metric]
-                    iqr_outliers["Metode"] = "IQR"
-                    if puskesmas_filter == "All":
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat(
-                        [statistical_outliers_df, iqr_outliers_subset],
-                        ignore_index=True
-                    )
+    statistical_outliers_df = outlier_detection.statistical_outliers(
+        recap_df, cols_to_check, outlier_method, puskesmas_filter,
+        cache_key=outlier_detection.cache_key(
+            "cakupan_suplementasi_gizi_ibu_hamil", ["data_ibuhamil", "dataset_desa"], periode_filter, puskesmas_filter, kelurahan_filter, periode_type
+        ),
+        table_name="data_ibuhamil",
+        flag_filters=outlier_detection.flag_filters(
+            puskesmas_filter, kelurahan_filter, periode=periode_filter,
+        ),
+    )
 
     if not statistical_outliers_df.empty:
         st.markdown("### 📊 Tabel Outlier Statistik")
@@ -2557,67 +2430,23 @@ def cakupan_layanan_kesehatan_ibu_hamil_kek(filtered_df, desa_df, periode_filter
     # 3.2 ⚙️ Analisis Outlier Statistik
     st.subheader("⚙️ Analisis Outlier Statistik")
     cols_to_check = list(metrik_data.keys())
-    base_columns = ["Puskesmas", "Metrik", "Nilai", "Metode"]
-    if puskesmas_filter != "All":
-        base_columns.insert(1, "Kelurahan")
-    statistical_outliers_df = pd.DataFrame(columns=base_columns)
 
     outlier_method = st.selectbox(
         "Pilih Metode Deteksi Outlier Statistik",
-        ["Tidak Ada", "Z-Score", "IQR"],
+        outlier_detection.OUTLIER_METHODS,
         key=f"outlier_method_select_kek_{periode_filter}"
     )
 
-    if outlier_method != "Tidak Ada":
-        for metric in cols_to_check:
-            if metric not in recap_df.columns:
-                continue
-
-            if puskesmas_filter == "All":
-                metric_data = recap_df[[metric, "Puskesmas"]].dropna()
-            else:
-                metric_data = recap_df[[metric, "Puskesmas", "Kelurahan"]].dropna()
-
-            if metric_data.empty:
-                continue
-
-            if outlier_method == "Z-Score":
-                z_scores = stats.zscore(metric_data[metric], nan_policy='omit')
-                z_outlier_mask = abs(z_scores) > 3
-                z_outliers = metric_data[z_outlier_mask].copy()
-                if not z_outliers.empty:
-                    z_outliers["Metrik"] = metric
-                    z_outliers["Nilai"] = z_outliers[metric]
-                    z_outliers["Metode"] = "Z-Score"
-                    if puskesmas_filter == "All":
-                        z_outliers_subset = z_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        z_outliers_subset = z_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat(
-                        [statistical_outliers_df, z_outliers_subset],
-                        ignore_index=True
-                    )
-
-            elif outlier_method == "IQR":
-                Q1 = metric_data[metric].quantile(0.25)
-                Q3 = metric_data[metric].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                iqr_outlier_mask = (metric_data[metric] < lower_bound) | (metric_data[metric] > upper_bound)
-                iqr_outliers = metric_data[iqr_outlier_mask].copy()
-                if not iqr_outliers.empty:
-                    iqr_outliers["Metrik"] = metric
-                    iqr_outliers["Nilai"] = iqr_outliers[metric]
-                    iqr_outliers["Metode"] = "IQR"
-                    if puskesmas_filter == "All":
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Metrik", "Nilai", "Metode"]]
-                    else:
-                        iqr_outliers_subset = iqr_outliers[["Puskesmas", "Kelurahan", "Metrik", "Nilai", "Metode"]]
-                    statistical_outliers_df = pd.concat(
-                        [statistical_outliers_df, iqr_outliers_subset],
-                        ignore_index=True
-                    )
+    statistical_outliers_df = outlier_detection.statistical_outliers(
+        recap_df, cols_to_check, outlier_method, puskesmas_filter,
+        cache_key=outlier_detection.cache_key(
+            "cakupan_layanan_kesehatan_ibu_hamil_kek", ["data_ibuhamil", "dataset_desa"], periode_filter, puskesmas_filter, kelurahan_filter, periode_type, laporan_type
+        ),
+        table_name="data_ibuhamil",
+        flag_filters=outlier_detection.flag_filters(
+            puskesmas_filter, kelurahan_filter, periode=periode_filter,
+        ),
+    )
 
     if not statistical_outliers_df.empty:
         st.markdown("### 📊 Tabel Outlier Statistik")
@@ -3088,6 +2917,10 @@ def show_dashboard():
     if kelurahan_filter != "All" and 'Kelurahan' in filtered_df.columns:
         filtered_df = filtered_df[filtered_df['Kelurahan'] == kelurahan_filter]
 
+    # Filter yang sama untuk cube kelengkapan tersimpan
+    bulan_cube = bulan_triwulan if periode_type == "Triwulan" and periode_filter != "All" else periode_filter
+    coverage_filters = reporting_coverage.coverage_filters(tahun_filter, bulan_cube, puskesmas_filter, kelurahan_filter)
+
     # 📂 Pilih Dashboard
     st.subheader("📂 Pilih Dashboard")
     tab1, tab2 = st.tabs(["📊 Kelengkapan Data Laporan", "📈 Analisis Indikator Ibu Hamil"])
@@ -3095,11 +2928,13 @@ def show_dashboard():
     # Tab 1: Kelengkapan Data Laporan
     with tab1:
         st.subheader("🔍 Pilih Analisis")
-        subtab1, subtab2 = st.tabs(["✅ Compliance Rate", "📋 Completeness Rate"])
+        subtab1, subtab2, subtab3 = st.tabs(["✅ Compliance Rate", "📋 Completeness Rate", "🗓️ Matriks Cakupan Pelaporan"])
         with subtab1:
             compliance_rate(filtered_df, desa_df, periode_filter, puskesmas_filter, kelurahan_filter)
         with subtab2:
-            completeness_rate(filtered_df, desa_df, periode_filter, puskesmas_filter, kelurahan_filter)
+            completeness_rate(coverage_filters, desa_df, periode_filter, puskesmas_filter, kelurahan_filter)
+        with subtab3:
+            coverage_matrix(desa_df, puskesmas_filter, kelurahan_filter)
 
     # Tab 2: Analisis Indikator Ibu Hamil
     with tab2:
@@ -1,23 +1,21 @@
 import datetime
 import io
 import math
-import sqlite3
 
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 
+import data_access
+
 GSHEET_ID_DEFAULT = "1lK97xi4nSpyNoTNNCR2daOnXJfCgZkW9sh4o9ZrbJIc"
 GSHEET_WORKSHEET = "pkp_klarifikasi"
 
 
-def _load_data(table_name="data_pkp", db_path="rcs_data.db"):
+def _load_data(table_name="data_pkp", db_path=data_access.RCS_DB_PATH):
     try:
-        conn = sqlite3.connect(db_path)
-        df = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
-        conn.close()
-        return df
+        return data_access.load_table(table_name, db_path=db_path)
     except Exception as e:
         st.error(f"❌ Gagal memuat data PKP: {e}")
         return pd.DataFrame()
@@ -31,18 +29,15 @@ def _get_col(df, name):
     return _col_map(df).get(name.lower().strip())
 
 
-def _load_klarifikasi(tahun, puskesmas, indikator, db_path="rcs_data.db"):
+def _load_klarifikasi(tahun, puskesmas, indikator, db_path=data_access.RCS_DB_PATH):
     try:
-        conn = sqlite3.connect(db_path)
         query = """
             SELECT * FROM pkp_klarifikasi
             WHERE tahun = ? AND puskesmas = ? AND indikator = ?
             ORDER BY updated_at DESC
             LIMIT 1
         """
-        row = pd.read_sql_query(query, conn, params=[tahun, puskesmas, indikator])
-        conn.close()
-        return row
+        return data_access.query_df(query, params=[tahun, puskesmas, indikator], db_path=db_path)
     except Exception:
         return pd.DataFrame()
 
@@ -123,33 +118,36 @@ def _save_klarifikasi_gs(row_df):
     return True
 
 
-def _save_klarifikasi(row_df, db_path="rcs_data.db"):
-    conn = sqlite3.connect(db_path)
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS pkp_klarifikasi (
-            tahun TEXT,
-            puskesmas TEXT,
-            indikator TEXT,
-            total_sasaran REAL,
-            target_persen REAL,
-            target_sasaran REAL,
-            pencapaian REAL,
-            nilai_kerja REAL,
-            updated_at TEXT
+def _save_klarifikasi(row_df, db_path=data_access.RCS_DB_PATH):
+    with data_access.write_connection(db_path) as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pkp_klarifikasi (
+                tahun TEXT,
+                puskesmas TEXT,
+                indikator TEXT,
+                total_sasaran REAL,
+                target_persen REAL,
+                target_sasaran REAL,
+                pencapaian REAL,
+                nilai_kerja REAL,
+                updated_at TEXT
+            )
+            """
         )
-        """
-    )
-    conn.execute(
-        "DELETE FROM pkp_klarifikasi WHERE tahun = ? AND puskesmas = ? AND indikator = ?",
-        (
-            row_df.loc[0].get("tahun") or row_df.loc[0].get("Tahun"),
-            row_df.loc[0].get("puskesmas") or row_df.loc[0].get("Puskesmas"),
-            row_df.loc[0].get("indikator") or row_df.loc[0].get("Indikator"),
-        ),
-    )
-    row_df.to_sql("pkp_klarifikasi", conn, if_exists="append", index=False)
-    conn.close()
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_pkp_klarifikasi_key ON pkp_klarifikasi (tahun, puskesmas, indikator)"
+        )
+        conn.execute(
+            "DELETE FROM pkp_klarifikasi WHERE tahun = ? AND puskesmas = ? AND indikator = ?",
+            (
+                row_df.loc[0].get("tahun") or row_df.loc[0].get("Tahun"),
+                row_df.loc[0].get("puskesmas") or row_df.loc[0].get("Puskesmas"),
+                row_df.loc[0].get("indikator") or row_df.loc[0].get("Indikator"),
+            ),
+        )
+        row_df.to_sql("pkp_klarifikasi", conn, if_exists="append", index=False)
+        data_access.record_data_version(conn, "pkp_klarifikasi")
 
 
 @st.cache_data(ttl=60)
@@ -170,11 +168,9 @@ def _load_all_klarifikasi_gs():
     return df
 
 
-def _load_all_klarifikasi_sqlite(db_path="rcs_data.db"):
+def _load_all_klarifikasi_sqlite(db_path=data_access.RCS_DB_PATH):
     try:
-        conn = sqlite3.connect(db_path)
-        df = pd.read_sql_query("SELECT * FROM pkp_klarifikasi", conn)
-        conn.close()
+        df = data_access.load_table("pkp_klarifikasi", db_path=db_path)
         if df.empty:
             return df
         df["source"] = "sqlite"
@@ -224,9 +220,8 @@ def _reset_klarifikasi_gs(tahun="ALL", puskesmas="ALL", indikator="ALL"):
     return True
 
 
-def _reset_klarifikasi_sqlite(tahun="ALL", puskesmas="ALL", indikator="ALL", db_path="rcs_data.db"):
+def _reset_klarifikasi_sqlite(tahun="ALL", puskesmas="ALL", indikator="ALL", db_path=data_access.RCS_DB_PATH):
     try:
-        conn = sqlite3.connect(db_path)
         where = []
         params = []
         if tahun != "ALL":
@@ -242,9 +237,9 @@ def _reset_klarifikasi_sqlite(tahun="ALL", puskesmas="ALL", indikator="ALL", db_
             query = "DELETE FROM pkp_klarifikasi WHERE " + " AND ".join(where)
         else:
             query = "DELETE FROM pkp_klarifikasi"
-        conn.execute(query, params)
-        conn.commit()
-        conn.close()
+        with data_access.write_connection(db_path) as conn:
+            conn.execute(query, params)
+            data_access.record_data_version(conn, "pkp_klarifikasi")
         return True
     except Exception:
         return False
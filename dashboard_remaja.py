@@ -1,5 +1,6 @@
 import streamlit as st
-import sqlite3
+import data_access
+import reporting_coverage
 import pandas as pd
 import plotly.express as px
 import os
@@ -9,14 +10,11 @@ import time
 # ----------------------------- #
 # 📥 Fungsi untuk Load Data
 # ----------------------------- #
-@st.cache_data
 def load_data():
     """Memuat data dari database SQLite rcs_data.db untuk remaja putri."""
     try:
-        conn = sqlite3.connect("rcs_data.db")
-        df = pd.read_sql_query("SELECT * FROM data_remaja", conn)
-        desa_df = pd.read_sql_query("SELECT * FROM dataset_desa", conn)
-        conn.close()
+        df = data_access.load_remaja()
+        desa_df = data_access.load_dataset_desa()
         # Hapus duplikat jika ada
         df = df.drop_duplicates()
         desa_df = desa_df.drop_duplicates()
@@ -31,7 +29,7 @@ def load_data():
 def get_last_upload_time():
     """Mengembalikan waktu terakhir modifikasi file database."""
     try:
-        file_path = "rcs_data.db"
+        file_path = data_access.active_db_path(data_access.RCS_DB_PATH)
         if os.path.exists(file_path):
             last_modified_time = os.path.getmtime(file_path)
             return datetime.datetime.fromtimestamp(last_modified_time).strftime("%d %B %Y, %H:%M:%S")
@@ -96,34 +94,12 @@ def compliance_rate(filtered_df, desa_df, bulan_filter, puskesmas_filter, kelura
 
     st.metric(label="Compliance Rate (%)", value=f"{compliance_value:.2f}%")
 
-    # Tentukan iterable untuk bulan
-    if bulan_filter == "All" and 'Bulan' in desa_df.columns:
-        bulan_iterable = sorted(desa_df['Bulan'].unique())
+    # Tabel Compliance Rate per Puskesmas (per Bulan bila dataset desa memiliki kolom Bulan)
+    if bulan_filter == "All" and 'Bulan' in desa_df.columns and 'Bulan' in filtered_df.columns:
+        compliance_df = reporting_coverage.compliance_table(filtered_df, desa_df, by=["Bulan", "Puskesmas"])
     else:
-        bulan_iterable = [int(bulan_filter)] if bulan_filter != "All" and bulan_filter.isdigit() else [0]
-
-    # Tabel Compliance Rate per Puskesmas
-    compliance_data = []
-    for bulan in bulan_iterable:
-        for puskesmas in sorted(desa_df['Puskesmas'].unique()):
-            desa_filter = desa_df[(desa_df['Puskesmas'] == puskesmas) &
-                                 (desa_df['Bulan'] == bulan if bulan_filter != "All" and 'Bulan' in desa_df.columns else True)]
-            filtered_filter = filtered_df[(filtered_df['Puskesmas'] == puskesmas) &
-                                         (filtered_df['Bulan'] == bulan if bulan_filter != "All" and 'Bulan' in filtered_df.columns else True)]
-
-            jumlah_desa = desa_filter['Kelurahan'].nunique()
-            jumlah_desa_lapor = filtered_filter['Kelurahan'].nunique()
-            compliance_rate_value = (jumlah_desa_lapor / jumlah_desa * 100) if jumlah_desa else 0
-
-            compliance_data.append({
-                "Bulan": bulan if bulan_filter == "All" else bulan_filter,
-                "Puskesmas": puskesmas,
-                "Jumlah Desa": jumlah_desa,
-                "Jumlah Desa Lapor": jumlah_desa_lapor,
-                "Compliance Rate (%)": f"{compliance_rate_value:.2f}%"
-            })
-
-    compliance_df = pd.DataFrame(compliance_data)
+        compliance_df = reporting_coverage.compliance_table(filtered_df, desa_df)
+        compliance_df.insert(0, "Bulan", bulan_filter)
     st.subheader("📋 Tabel Compliance Rate per Puskesmas")
     st.dataframe(compliance_df, use_container_width=True)
 
@@ -139,9 +115,7 @@ def compliance_rate(filtered_df, desa_df, bulan_filter, puskesmas_filter, kelura
     # Breakdown per Kelurahan jika Puskesmas difilter
     if puskesmas_filter != "All":
         st.subheader(f"📊 Breakdown Compliance Rate di {puskesmas_filter}")
-        kelurahan_data = [{"Kelurahan": kel, "Status Laporan": "✅ Lapor" if kel in desa_terlapor else "❌ Tidak Lapor"}
-                         for kel in desa_df[desa_df['Puskesmas'] == puskesmas_filter]['Kelurahan'].unique()]
-        kelurahan_df = pd.DataFrame(kelurahan_data)
+        kelurahan_df = reporting_coverage.kelurahan_status(desa_df, puskesmas_filter, desa_terlapor)
         st.dataframe(kelurahan_df, use_container_width=True)
 
         fig_kelurahan = px.bar(kelurahan_df, x="Kelurahan", y=kelurahan_df['Status Laporan'].apply(lambda x: 100 if x == "✅ Lapor" else 0),
@@ -153,7 +127,7 @@ def compliance_rate(filtered_df, desa_df, bulan_filter, puskesmas_filter, kelura
 # ----------------------------- #
 # 📋 Completeness Rate
 # ----------------------------- #
-def completeness_rate(filtered_df, desa_df, bulan_filter, puskesmas_filter, kelurahan_filter):
+def completeness_rate(coverage_filters, desa_df, bulan_filter, puskesmas_filter, kelurahan_filter):
     """Menghitung dan menampilkan tingkat kelengkapan data untuk data remaja putri."""
     st.header("📋 Completeness Rate")
 
@@ -186,75 +160,32 @@ def completeness_rate(filtered_df, desa_df, bulan_filter, puskesmas_filter, kelu
         """, unsafe_allow_html=True)
 
     # Daftar kolom kunci untuk cek kelengkapan
-    completeness_columns = [
-        "Jumlah_sasaran_remaja_putri",
-        "Jumlah_remaja_putri_di_satuan_pendidikan_mendapat_TTD_sesuai_standar",
-        "Jumlah_remaja_putri_di_satuan_pendidikan_mengonsumsi_TTD_sesuai_standar",
-        "Jumlah_remaja_putri_di_satuan_pendidikan_mendapat_TTD_krg26",
-        "Jumlah_remaja_putri_di_satuan_pendidikan_mendapat_TTD_lbh26",
-        "Jumlah_remaja_putri_di_satuan_pendidikan_mengonsumsi_TTD_krg26",
-        "Jumlah_remaja_putri_di_satuan_pendidikan_mengonsumsi_TTD_lbh26",
-        "Jumlah_remaja_putri_kelas_7_di_satuan_pendidikan",
-        "Jumlah_remaja_putri_kelas_7_di_satuan_pendidikan_skrining_anemia",
-        "Jumlah_remaja_putri_kelas_10_di_satuan_pendidikan",
-        "Jumlah_remaja_putri_kelas_10_di_satuan_pendidikan_skrining_anemia",
-        "Jumlah_remaja_putri_kelas_7_dan_10_di_satuan_pendidikan",
-        "Jumlah_remaja_putri_kelas_7_dan_10_di_satuan_pendidikan_skrining_anemia",
-        "Jumlah_Rematri_kelas_7_Anemia_Ringan",
-        "Jumlah_Rematri_kelas_7_Anemia_Sedang",
-        "Jumlah_Rematri_kelas_7_Anemia_Berat",
-        "Jumlah_Anemia_Rematri_Kelas_7",
-        "Jumlah_Rematri_kelas_10_Anemia_Ringan",
-        "Jumlah_Rematri_kelas_10_Anemia_Sedang",
-        "Jumlah_Rematri_kelas_10_Anemia_Berat",
-        "Jumlah_Anemia_Rematri_Kelas_10",
-        "Jumlah_remaja_putri_kelas_7_10_teridentifikasi_anemia",
-        "Jumlah_Rematri_kelas_7_dan_10_mendapatkan_tatalaksana_anemia"
-    ]
+    completeness_columns = reporting_coverage.COMPLETENESS_COLUMNS["data_remaja"]
+
+    # Cube kelengkapan tersimpan saat upload (Tahun × Bulan × Puskesmas × Kelurahan) sesuai filter
+    try:
+        cube = reporting_coverage.load_coverage("data_remaja", coverage_filters)
+    except Exception as e:
+        st.error(f"❌ Gagal memuat data kelengkapan: {e}")
+        return
 
     # Cek kolom yang hilang di dataset
-    missing_cols = [col for col in completeness_columns if col not in filtered_df.columns]
+    missing_cols = [col for col in completeness_columns if col not in cube.columns]
     if missing_cols:
         st.error(f"⚠️ Kolom berikut tidak ditemukan di dataset: {missing_cols}")
         return
 
-    # Tambahkan kolom 'Lengkap' untuk mengecek apakah semua kolom kunci terisi
-    filtered_df['Lengkap'] = filtered_df[completeness_columns].notna().all(axis=1)
-
-    # Tentukan scope berdasarkan filter
-    scope = filtered_df.copy()
-    if bulan_filter != "All":
-        scope = scope[scope['Bulan'] == int(bulan_filter)] if 'Bulan' in scope.columns else scope
-    if puskesmas_filter != "All":
-        scope = scope[scope['Puskesmas'] == puskesmas_filter]
-    if kelurahan_filter != "All":
-        scope = scope[scope['Kelurahan'] == kelurahan_filter]
+    cube_periode = reporting_coverage.slice_cube(cube, bulan=int(bulan_filter) if bulan_filter != "All" else None)
 
     # Hitung completeness rate
-    lengkap_count = scope['Lengkap'].sum()
-    total_entries = scope.shape[0]
-    completeness_value = (lengkap_count / total_entries * 100) if total_entries else 0
+    scope = reporting_coverage.slice_cube(cube_periode, puskesmas=puskesmas_filter, kelurahan=kelurahan_filter)
+    completeness_value = reporting_coverage.completeness_value(scope)
 
     st.metric(label="Completeness Rate (%)", value=f"{completeness_value:.2f}%",
               help="Persentase entri dengan semua kolom kunci terisi lengkap.")
 
     # Tabel Completeness Rate per Puskesmas
-    completeness_data = []
-    for puskesmas in sorted(desa_df['Puskesmas'].unique()):
-        df_pkm = filtered_df[filtered_df['Puskesmas'] == puskesmas]
-        if bulan_filter != "All" and 'Bulan' in df_pkm.columns:
-            df_pkm = df_pkm[df_pkm['Bulan'] == int(bulan_filter)]
-        total_entries_pkm = df_pkm.shape[0]
-        lengkap_entries_pkm = df_pkm['Lengkap'].sum()
-        rate = (lengkap_entries_pkm / total_entries_pkm * 100) if total_entries_pkm else 0
-        completeness_data.append({
-            "Puskesmas": puskesmas,
-            "Jumlah Entri": total_entries_pkm,
-            "Entri Lengkap": lengkap_entries_pkm,
-            "Completeness Rate (%)": f"{rate:.2f}%"
-        })
-
-    completeness_df = pd.DataFrame(completeness_data)
+    completeness_df = reporting_coverage.completeness_table(cube_periode, desa_df)
     st.subheader("📊 Tabel Completeness Rate per Puskesmas")
     st.dataframe(completeness_df, use_container_width=True)
 
@@ -274,12 +205,51 @@ def completeness_rate(filtered_df, desa_df, bulan_filter, puskesmas_filter, kelu
 
     # Detail kelengkapan per kolom (opsional)
     if st.checkbox("🔍 Tampilkan Detail Kelengkapan per Kolom"):
-        completeness_per_col = filtered_df[completeness_columns].notna().mean() * 100
+        completeness_per_col = reporting_coverage.column_completeness(cube, completeness_columns)
         st.subheader("📋 Persentase Kelengkapan per Kolom")
         col_data = [{"Kolom": col, "Kelengkapan (%)": f"{val:.2f}%"} 
                    for col, val in completeness_per_col.items()]
         st.dataframe(pd.DataFrame(col_data), use_container_width=True)
 
+# ----------------------------- #
+# 🗓️ Matriks Cakupan Pelaporan
+# ----------------------------- #
+def coverage_matrix(desa_df, puskesmas_filter, kelurahan_filter):
+    """Menampilkan heatmap cakupan pelaporan dan kelengkapan per kolom untuk seluruh bulan."""
+    st.header("🗓️ Matriks Cakupan Pelaporan")
+    try:
+        cube = reporting_coverage.load_coverage("data_remaja")
+    except Exception as e:
+        st.error(f"❌ Gagal memuat matriks cakupan pelaporan: {e}")
+        return
+    if cube.empty:
+        st.warning("⚠️ Belum ada data untuk matriks cakupan pelaporan.")
+        return
+
+    # Cakupan pelaporan: compliance rate per Puskesmas, atau lapor/tidak per kelurahan
+    level = "Kelurahan" if puskesmas_filter != "All" else "Puskesmas"
+    reporting_df = reporting_coverage.reporting_matrix(cube, desa_df, puskesmas_filter)
+    st.subheader(f"📊 Cakupan Pelaporan per {level} × Bulan")
+    fig_reporting = px.imshow(reporting_df, text_auto=".0f", aspect="auto", zmin=0, zmax=100,
+                              color_continuous_scale="RdYlGn", title=f"Cakupan Pelaporan per {level} × Bulan Indikator Remaja Putri")
+    fig_reporting.update_layout(xaxis_title="Periode", yaxis_title=level, coloraxis_colorbar_title="Lapor (%)",
+                                title_x=0.5, height=max(400, 25 * len(reporting_df)))
+    st.plotly_chart(fig_reporting, key=f"coverage_reporting_{puskesmas_filter}_{time.time()}", use_container_width=True)
+
+    # Kelengkapan per kolom kunci di wilayah terpilih
+    scope = cube
+    if puskesmas_filter != "All":
+        scope = scope[scope['Puskesmas'] == puskesmas_filter]
+    if kelurahan_filter != "All":
+        scope = scope[scope['Kelurahan'] == kelurahan_filter]
+    completeness_df = reporting_coverage.completeness_matrix(scope)
+    st.subheader("📋 Kelengkapan per Kolom × Bulan")
+    fig_completeness = px.imshow(completeness_df, text_auto=".0f", aspect="auto", zmin=0, zmax=100,
+                                 color_continuous_scale="RdYlGn", title="Kelengkapan Data per Kolom × Bulan")
+    fig_completeness.update_layout(xaxis_title="Periode", yaxis_title="Kolom", coloraxis_colorbar_title="Terisi (%)",
+                                   title_x=0.5, height=max(400, 25 * len(completeness_df)))
+    st.plotly_chart(fig_completeness, key=f"coverage_completeness_{puskesmas_filter}_{kelurahan_filter}_{time.time()}", use_container_width=True)
+
 # ----------------------------- #
 # 💊 Cakupan Suplementasi TTD Rematri
 # ----------------------------- #
@@ -1609,15 +1579,20 @@ def show_dashboard():
     else:
         st.dataframe(filtered_df, use_container_width=True)
 
+    # Filter yang sama untuk cube kelengkapan tersimpan
+    coverage_filters = reporting_coverage.coverage_filters(bulan=bulan_filter, puskesmas=puskesmas_filter, kelurahan=kelurahan_filter)
+
     # Menu sidebar untuk analisis
     menu = st.sidebar.radio("📂 Pilih Dashboard", ["📊 Kelengkapan Data", "📈 Analisis Indikator Remaja Putri"])
 
     if menu == "📊 Kelengkapan Data":
-        sub_menu = st.sidebar.radio("🔍 Pilih Analisis", ["✅ Compliance Rate", "📋 Completeness Rate"])
+        sub_menu = st.sidebar.radio("🔍 Pilih Analisis", ["✅ Compliance Rate", "📋 Completeness Rate", "🗓️ Matriks Cakupan Pelaporan"])
         if sub_menu == "✅ Compliance Rate":
             compliance_rate(filtered_df, desa_df, bulan_filter, puskesmas_filter, kelurahan_filter)
         elif sub_menu == "📋 Completeness Rate":
-            completeness_rate(filtered_df, desa_df, bulan_filter, puskesmas_filter, kelurahan_filter)
+            completeness_rate(coverage_filters, desa_df, bulan_filter, puskesmas_filter, kelurahan_filter)
+        elif sub_menu == "🗓️ Matriks Cakupan Pelaporan":
+            coverage_matrix(desa_df, puskesmas_filter, kelurahan_filter)
 
     elif menu == "📈 Analisis Indikator Remaja Putri":
         sub_analisis = st.sidebar.radio("📊 Pilih Sub Analisis", [
@@ -0,0 +1,520 @@
+import datetime
+import os
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pandas as pd
+
+import parquet_store
+import schema
+
+RCS_DB_PATH = "rcs_data.db"
+EPPGBM_DB_PATH = "data_eppgbm.db"
+
+# Ukuran pool per file database; cukup untuk 39 Puskesmas yang mengakses bersamaan
+POOL_SIZE = 8
+# Pragma baca: mmap 256 MB, page cache ~64 MB (nilai negatif = KiB)
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KIB = -64 * 1024
+
+# Tabel metadata versi data (diisi oleh upload_data setiap upload berhasil)
+DATA_VERSION_TABLE = "data_versions"
+# Batas cache DataFrame: jumlah entri & total memori
+CACHE_MAX_ENTRIES = 32
+CACHE_MAX_BYTES = 1024 * 1024 * 1024
+# Upload menulis salinan database baru di folder ini lalu menukar pointer aktif;
+# versi lama disimpan sebentar agar query yang sedang berjalan tetap selesai
+DB_VERSION_DIR = "db_versions"
+KEEP_DB_VERSIONS = 2
+# Salinan di-VACUUM sebelum diaktifkan bila halaman kosong (tabel lama yang dihapus) melebihi rasio ini
+VACUUM_FREE_RATIO = 0.25
+
+
+def _quote_ident(name):
+    """Quote nama tabel/kolom SQLite agar aman dipakai di query dinamis."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _apply_read_pragmas(conn):
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = {CACHE_SIZE_KIB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA query_only = 1")
+
+
+def _enable_wal(db_path):
+    """Aktifkan WAL sekali per file agar pembaca tidak terblokir saat upload."""
+    try:
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
+# ----------------------------- #
+# 🔌 Connection Pool (read-only)
+# ----------------------------- #
+class _ConnectionPool:
+    """Pool koneksi read-only untuk satu file database SQLite, aman untuk multi-thread."""
+
+    def __init__(self, db_path, size=POOL_SIZE):
+        self.db_path = db_path
+        self._idle = queue.LifoQueue(maxsize=size)
+        _enable_wal(db_path)
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            f"file:{self.db_path}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+        )
+        _apply_read_pragmas(conn)
+        return conn
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def release(self, conn):
+        try:
+            conn.rollback()
+            self._idle.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            conn.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_writer_locks = {}
+
+
+def _get_pool(db_path):
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _ConnectionPool(db_path)
+            _pools[db_path] = pool
+        return pool
+
+
+def _drop_pool(db_path):
+    with _pools_lock:
+        pool = _pools.pop(db_path, None)
+    if pool is not None:
+        pool.close_all()
+
+
+def _writer_lock(db_path):
+    """Satu penulis per database: upload dan simpan data lain diantrikan."""
+    with _pools_lock:
+        return _writer_locks.setdefault(db_path, threading.Lock())
+
+
+# ----------------------------- #
+# 🔀 File Database Aktif (versi + pointer)
+# ----------------------------- #
+def _pointer_path(db_path):
+    return f"{db_path}.active"
+
+
+def active_db_path(db_path=RCS_DB_PATH):
+    """File database yang sedang aktif untuk `db_path`.
+
+    Pointer `<db_path>.active` berisi path relatif ke versi terbaru di
+    DB_VERSION_DIR; tanpa pointer, `db_path` sendiri yang dipakai.
+    """
+    pointer = _pointer_path(db_path)
+    try:
+        with open(pointer, "r") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return db_path
+    path = os.path.join(os.path.dirname(pointer), name) if name else db_path
+    return path if os.path.exists(path) else db_path
+
+
+def _new_version_path(db_path):
+    base = os.path.dirname(db_path)
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return os.path.join(base, DB_VERSION_DIR, f"{stem}-{stamp}.db")
+
+
+def _fsync_file(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _activate(db_path, version_path):
+    """Tukar pointer aktif secara atomik (tulis file sementara lalu os.replace)."""
+    pointer = _pointer_path(db_path)
+    tmp = f"{pointer}.tmp"
+    with open(tmp, "w") as f:
+        f.write(os.path.relpath(version_path, os.path.dirname(pointer) or "."))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, pointer)
+
+
+def _remove_db_file(path):
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        try:
+            os.remove(path + suffix)
+        except OSError:
+            # Windows: file masih dibuka pembaca lama; dicoba lagi di upload berikutnya
+            pass
+
+
+def _prune_versions(db_path):
+    version_dir = os.path.join(os.path.dirname(db_path), DB_VERSION_DIR)
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    active = os.path.abspath(active_db_path(db_path))
+    versions = sorted(
+        name for name in os.listdir(version_dir)
+        if name.startswith(f"{stem}-") and name.endswith(".db")
+    )
+    for name in versions[:-KEEP_DB_VERSIONS]:
+        path = os.path.join(version_dir, name)
+        if os.path.abspath(path) == active:
+            continue
+        _drop_pool(path)
+        _remove_db_file(path)
+
+
+@contextmanager
+def read_connection(db_path=RCS_DB_PATH):
+    """Pinjam koneksi read-only dari pool; otomatis dikembalikan setelah dipakai."""
+    pool = _get_pool(active_db_path(db_path))
+    conn = pool.acquire()
+    ok = False
+    try:
+        yield conn
+        ok = True
+    finally:
+        # Koneksi yang error tidak dikembalikan ke pool
+        if ok:
+            pool.release(conn)
+        else:
+            conn.close()
+
+
+@contextmanager
+def write_connection(db_path=RCS_DB_PATH):
+    """Koneksi tulis (WAL) langsung ke file aktif untuk perubahan kecil; commit jika sukses.
+
+    Upload massal memakai `staged_write` agar pembaca tidak pernah melihat
+    tabel yang sedang ditulis ulang.
+    """
+    with _writer_lock(db_path):
+        conn = sqlite3.connect(active_db_path(db_path), timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+
+@contextmanager
+def staged_write(db_path=RCS_DB_PATH):
+    """Tulis ke salinan baru database, validasi, lalu aktifkan dengan menukar pointer.
+
+    Database aktif disalin (backup API SQLite) ke DB_VERSION_DIR dan semua
+    perubahan ditulis ke salinan itu. Pembaca tetap memakai file lama tanpa
+    lock sampai salinan lolos `PRAGMA quick_check`; bila ada error, salinan
+    dibuang dan file aktif tidak berubah.
+    """
+    with _writer_lock(db_path):
+        source = active_db_path(db_path)
+        staged = _new_version_path(db_path)
+        os.makedirs(os.path.dirname(staged), exist_ok=True)
+        conn = sqlite3.connect(staged, timeout=30)
+        try:
+            if os.path.exists(source):
+                src = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+                try:
+                    src.backup(conn)
+                finally:
+                    src.close()
+            # Belum ada pembaca: journal di memori & tanpa fsync per transaksi (cepat);
+            # file di-fsync sekali sebelum diaktifkan
+            conn.execute("PRAGMA journal_mode = MEMORY")
+            conn.execute("PRAGMA synchronous = OFF")
+            yield conn
+            conn.commit()
+            check = conn.execute("PRAGMA quick_check").fetchone()[0]
+            if check != "ok":
+                raise sqlite3.DatabaseError(f"Validasi database baru gagal: {check}")
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if free_pages > VACUUM_FREE_RATIO * conn.execute("PRAGMA page_count").fetchone()[0]:
+                conn.execute("VACUUM")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.close()
+            _fsync_file(staged)
+        except BaseException:
+            conn.close()
+            _remove_db_file(staged)
+            raise
+        _activate(db_path, staged)
+        _prune_versions(db_path)
+
+
+def close_pools():
+    """Tutup semua koneksi idle (dipakai setelah file database diganti)."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+        _pools.clear()
+
+
+# ----------------------------- #
+# 🏷️ Versi Data
+# ----------------------------- #
+def record_data_version(conn, table_name):
+    """Catat versi baru tabel (jumlah baris + waktu upload) memakai koneksi tulis."""
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {DATA_VERSION_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            row_count INTEGER,
+            uploaded_at TEXT
+        )
+        """
+    )
+    row_count = conn.execute(f"SELECT COUNT(*) FROM {_quote_ident(table_name)}").fetchone()[0]
+    conn.execute(
+        f"INSERT OR REPLACE INTO {DATA_VERSION_TABLE} (table_name, row_count, uploaded_at) VALUES (?, ?, ?)",
+        (table_name, row_count, datetime.datetime.now().isoformat(timespec="microseconds")),
+    )
+
+
+def data_version(table_name, db_path=RCS_DB_PATH):
+    """Versi tabel (row_count, uploaded_at), atau None bila belum pernah dicatat."""
+    try:
+        with read_connection(db_path) as conn:
+            row = conn.execute(
+                f"SELECT row_count, uploaded_at FROM {DATA_VERSION_TABLE} WHERE table_name = ?", (table_name,)
+            ).fetchone()
+    except sqlite3.Error:
+        return None
+    return tuple(row) if row else None
+
+
+# ----------------------------- #
+# 🗃️ Cache DataFrame (LRU, dikunci versi data)
+# ----------------------------- #
+class _DataFrameCache:
+    """LRU thread-safe dengan batas jumlah entri dan total memori."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, df):
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (df, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+_df_cache = _DataFrameCache()
+
+
+def clear_cache():
+    _df_cache.clear()
+
+
+def _freeze(value):
+    # Kunci cache harus hashable: list/set filter diubah jadi tuple terurut
+    if isinstance(value, (list, tuple, set)):
+        return tuple(sorted((_to_sql_param(v) for v in value), key=repr))
+    return _to_sql_param(value)
+
+
+def _cache_key(table_name, columns, filters, db_path, version):
+    frozen_filters = tuple(sorted((col, _freeze(v)) for col, v in (filters or {}).items()))
+    return (db_path, table_name, tuple(columns) if columns else None, frozen_filters, version)
+
+
+# ----------------------------- #
+# 📥 Loader Data
+# ----------------------------- #
+def query_df(sql, params=None, db_path=RCS_DB_PATH):
+    """Jalankan query SELECT berparameter dan kembalikan DataFrame."""
+    with read_connection(db_path) as conn:
+        return pd.read_sql_query(sql, conn, params=params)
+
+
+def load_table(table_name: str, columns=None, db_path: str = RCS_DB_PATH) -> pd.DataFrame:
+    """Memuat satu tabel; `columns` membatasi kolom yang dibaca dari SQLite."""
+    return load_filtered(table_name, columns=columns, db_path=db_path)
+
+
+# ----------------------------- #
+# 🧱 Query Builder (projection + predicate pushdown)
+# ----------------------------- #
+ALL_VALUES = {"All", "ALL", None, ""}
+
+
+def build_where(filters=None):
+    """Ubah dict filter {kolom: nilai} menjadi klausa WHERE berparameter.
+
+    Nilai "All"/"ALL"/None dilewati, list/tuple/set menjadi `IN (...)`,
+    nilai tunggal menjadi `= ?`.
+    """
+    clauses, params = [], []
+    for col, value in (filters or {}).items():
+        if isinstance(value, (list, tuple, set)):
+            values = [v for v in value if v not in ALL_VALUES]
+            if not values:
+                clauses.append("0 = 1")
+                continue
+            clauses.append(f"{_quote_ident(col)} IN ({', '.join('?' * len(values))})")
+            params.extend(_to_sql_param(v) for v in values)
+        elif value in ALL_VALUES:
+            continue
+        else:
+            clauses.append(f"{_quote_ident(col)} = ?")
+            params.append(_to_sql_param(value))
+    where_sql = " WHERE " + " AND ".join(clauses) if clauses else ""
+    return where_sql, params
+
+
+def _to_sql_param(value):
+    # Nilai numpy (np.int64 dsb.) tidak bisa di-bind langsung oleh sqlite3
+    return value.item() if hasattr(value, "item") else value
+
+
+def build_select(table_name, columns=None, filters=None):
+    """Susun (sql, params) SELECT hanya untuk kolom & baris yang dibutuhkan."""
+    col_sql = ", ".join(_quote_ident(c) for c in columns) if columns else "*"
+    where_sql, params = build_where(filters)
+    return f"SELECT {col_sql} FROM {_quote_ident(table_name)}{where_sql}", params
+
+
+def load_filtered(table_name: str, columns=None, filters=None, db_path: str = RCS_DB_PATH) -> pd.DataFrame:
+    """Memuat tabel dengan filter dan proyeksi kolom.
+
+    Hasil di-cache per versi data tabel sehingga hanya upload baru yang memicu
+    baca ulang. Snapshot Parquet (bila ada) dibaca lebih dulu; jika tidak ada,
+    query dijalankan langsung di SQLite. Dtype dari registry `schema` diterapkan
+    sebelum disimpan di cache.
+    """
+    version = data_version(table_name, db_path)
+    key = _cache_key(table_name, columns, filters, db_path, version) if version else None
+    if key is not None:
+        cached = _df_cache.get(key)
+        if cached is not None:
+            # Salinan agar perubahan di dashboard tidak mengotori cache
+            return cached.copy()
+    df = parquet_store.read_snapshot(table_name, columns=columns, filters=filters)
+    if df is None:
+        sql, params = build_select(table_name, columns, filters)
+        df = query_df(sql, params=params, db_path=db_path)
+    df = schema.apply_schema(df, table_name)
+    if key is not None:
+        _df_cache.put(key, df)
+        return df.copy()
+    return df
+
+
+def distinct_values(table_name: str, column: str, filters=None, db_path: str = RCS_DB_PATH) -> list:
+    """Nilai unik satu kolom (untuk opsi selectbox) tanpa memuat seluruh tabel."""
+    where_sql, params = build_where(filters)
+    col = _quote_ident(column)
+    sql = f"SELECT DISTINCT {col} FROM {_quote_ident(table_name)}{where_sql}"
+    with read_connection(db_path) as conn:
+        rows = conn.execute(sql, params).fetchall()
+    return [r[0] for r in rows if r[0] is not None]
+
+
+def table_exists(table_name: str, db_path: str = RCS_DB_PATH) -> bool:
+    with read_connection(db_path) as conn:
+        row = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+        ).fetchone()
+    return row is not None
+
+
+def table_columns(table_name: str, db_path: str = RCS_DB_PATH) -> list:
+    """Nama kolom tabel/view sesuai urutan di database."""
+    with read_connection(db_path) as conn:
+        return [row[1] for row in conn.execute(f"PRAGMA table_info({_quote_ident(table_name)})")]
+
+
+def load_dataset_desa() -> pd.DataFrame:
+    """Referensi Puskesmas → Kelurahan."""
+    return load_table("dataset_desa").drop_duplicates()
+
+
+def load_balita_gizi() -> pd.DataFrame:
+    return load_table("data_balita_gizi")
+
+
+def load_balita_kia() -> pd.DataFrame:
+    return load_table("data_balita_kia")
+
+
+def load_ibuhamil() -> pd.DataFrame:
+    return load_table("data_ibuhamil")
+
+
+def load_remaja() -> pd.DataFrame:
+    return load_table("data_remaja")
+
+
+def load_bultim(level="puskesmas") -> pd.DataFrame:
+    """Data bulan timbang level 'puskesmas' atau 'kelurahan'."""
+    return load_table("data_bultim_kelurahan" if level == "kelurahan" else "data_bultim")
+
+
+def load_pkp() -> pd.DataFrame:
+    return load_table("data_pkp")
+
+
+def load_eppgbm(columns=None) -> pd.DataFrame:
+    return load_table("data_eppgbm", columns=columns, db_path=EPPGBM_DB_PATH)
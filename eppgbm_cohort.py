@@ -0,0 +1,318 @@
+import functools
+import io
+import re
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+import data_access
+import eppgbm_derived
+
+EPPGBM_TABLE = "data_eppgbm"
+# Indeks kohort tersimpan (satu BLOB array NumPy), dibangun saat upload
+COHORT_TABLE = "eppgbm_cohort"
+REGION_COLUMNS = ["puskesmas", "kelurahan"]
+# Status gizi yang dilacak antar periode (kolom boolean hasil eppgbm_derived)
+STATUS_COLUMNS = list(eppgbm_derived.STATUS_COLUMNS)
+SOURCE_COLUMNS = (
+    ["nik", "periode", "Tgl_ukur", "Tgl_Lahir", "usia_bulan"]
+    + REGION_COLUMNS + STATUS_COLUMNS + list(eppgbm_derived.STATUS_COLUMNS.values())
+)
+
+# State transisi per anak per periode (kode integer)
+STATE_TIDAK_DIUKUR, STATE_TIDAK, STATE_YA = 0, 1, 2
+STATE_LABELS = ["Tidak Diukur", "Tidak", "Ya"]
+# Ringkasan transisi: nama → daftar sel (state awal, state akhir)
+TRANSITION_SUMMARY = {
+    "Tetap Tidak": [(STATE_TIDAK, STATE_TIDAK)],
+    "Kasus Baru": [(STATE_TIDAK, STATE_YA), (STATE_TIDAK_DIUKUR, STATE_YA)],
+    "Persisten": [(STATE_YA, STATE_YA)],
+    "Sembuh": [(STATE_YA, STATE_TIDAK)],
+    "Tidak Terlacak": [(STATE_YA, STATE_TIDAK_DIUKUR)],
+}
+MONTHS = {
+    "januari": 1, "februari": 2, "maret": 3, "april": 4, "mei": 5, "juni": 6,
+    "juli": 7, "agustus": 8, "september": 9, "oktober": 10, "november": 11, "desember": 12,
+}
+
+
+def periode_sort_key(periode):
+    """Kunci urutan kronologis untuk label periode seperti 'Februari 2025' atau 'februari_2025'."""
+    parts = re.split(r"[\s_\-]+", str(periode).strip().lower())
+    if len(parts) == 2 and parts[0] in MONTHS and parts[1].isdigit():
+        return (0, int(parts[1]), MONTHS[parts[0]], "")
+    return (1, 0, 0, str(periode))
+
+
+class CohortIndex:
+    """Panel longitudinal balita: satu pengukuran per NIK per periode dalam array NumPy.
+
+    Baris diurutkan per (anak, periode) dan `row_at[periode, anak]` berisi posisi
+    baris (-1 bila anak tidak diukur di periode itu), sehingga pasangan periode
+    mana pun diselesaikan dengan lookup array tanpa merge berbasis string.
+    Bila satu NIK diukur lebih dari sekali dalam satu periode, pengukuran
+    terakhir (Tgl_ukur) yang dipakai.
+    """
+
+    def __init__(self, df):
+        df = df[df["nik"].notna() & df["periode"].notna()]
+        tgl_ukur = pd.to_datetime(df["Tgl_ukur"], errors="coerce") if "Tgl_ukur" in df.columns else None
+        child, self.niks = pd.factorize(df["nik"], sort=True)
+        periode, self.periodes = pd.factorize(df["periode"], sort=True)
+        # Urut per anak, periode, lalu tanggal ukur; ambil baris terakhir tiap (anak, periode)
+        order_keys = [np.arange(len(df))]
+        if tgl_ukur is not None:
+            order_keys.append(tgl_ukur.to_numpy(dtype="datetime64[ns]").astype("int64"))
+        order = np.lexsort(order_keys + [periode, child])
+        child, periode = child[order], periode[order]
+        last = np.ones(len(order), dtype=bool)
+        last[:-1] = (child[1:] != child[:-1]) | (periode[1:] != periode[:-1])
+        rows = order[last]
+        self.child = child[last]
+        self.periode = periode[last]
+
+        # Kelurahan dikodekan per pasangan (puskesmas, kelurahan): nama kelurahan yang sama
+        # di puskesmas lain menjadi wilayah berbeda; `region_parent` = puskesmas tiap kode
+        pkm_code, pkm_labels = pd.factorize(df["puskesmas"], sort=True)
+        kel_code, kel_labels = pd.factorize(df["kelurahan"], sort=True)
+        pair = np.where((pkm_code >= 0) & (kel_code >= 0), pkm_code * max(len(kel_labels), 1) + kel_code, -1)
+        pair_code, pairs = pd.factorize(pair, sort=True)
+        if len(pairs) and pairs[0] == -1:
+            pair_code, pairs = pair_code - 1, pairs[1:]
+        pairs = np.asarray(pairs, dtype=np.int64)
+        self.region_code = {"puskesmas": pkm_code[rows], "kelurahan": pair_code[rows]}
+        self.region_labels = {
+            "puskesmas": np.asarray(pkm_labels, dtype=object),
+            "kelurahan": np.asarray(kel_labels, dtype=object)[pairs % max(len(kel_labels), 1)],
+        }
+        self.region_parent = {"kelurahan": np.asarray(pkm_labels, dtype=object)[pairs // max(len(kel_labels), 1)]}
+
+        if "usia_bulan" in df.columns:
+            usia = pd.to_numeric(df["usia_bulan"], errors="coerce")
+        else:
+            usia = eppgbm_derived.usia_bulan(df["Tgl_ukur"], df["Tgl_Lahir"]).astype("float64")
+        self.usia = usia.fillna(0).clip(lower=0).to_numpy()[rows].astype(int)
+
+        self.status = {}
+        for name, zs_col in eppgbm_derived.STATUS_COLUMNS.items():
+            if name in df.columns:
+                values = df[name].fillna(False).to_numpy(dtype=bool)
+            elif zs_col in df.columns:
+                values = (df[zs_col] < -2).fillna(False).to_numpy(dtype=bool)
+            else:
+                continue
+            self.status[name] = values[rows]
+
+        self.row_at = np.full((len(self.periodes), len(self.niks)), -1, dtype=np.int64)
+        self.row_at[self.periode, self.child] = np.arange(len(self.child))
+        self.periodes_chrono = sorted(self.periodes, key=periode_sort_key)
+
+    # ----------------------------- #
+    # 💾 Simpan / Muat Indeks
+    # ----------------------------- #
+    def to_bytes(self):
+        """Serialisasi array indeks ke format .npz (tanpa pickle)."""
+        arrays = {
+            "niks": np.asarray(self.niks).astype(str),
+            "periodes": np.asarray(self.periodes).astype(str),
+            "child": self.child,
+            "periode": self.periode,
+            "usia": self.usia,
+            "parent__kelurahan": self.region_parent["kelurahan"].astype(str),
+        }
+        for col in REGION_COLUMNS:
+            arrays[f"code__{col}"] = self.region_code[col]
+            arrays[f"labels__{col}"] = self.region_labels[col].astype(str)
+        for name, values in self.status.items():
+            arrays[f"status__{name}"] = values
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, payload):
+        """Muat indeks hasil `to_bytes` tanpa membangun ulang dari data mentah."""
+        arrays = np.load(io.BytesIO(payload), allow_pickle=False)
+        index = cls.__new__(cls)
+        index.niks, index.periodes = arrays["niks"], arrays["periodes"]
+        index.child, index.periode, index.usia = arrays["child"], arrays["periode"], arrays["usia"]
+        index.region_code = {col: arrays[f"code__{col}"] for col in REGION_COLUMNS}
+        index.region_labels = {col: arrays[f"labels__{col}"].astype(object) for col in REGION_COLUMNS}
+        index.region_parent = {"kelurahan": arrays["parent__kelurahan"].astype(object)}
+        index.status = {key[len("status__"):]: arrays[key] for key in arrays.files if key.startswith("status__")}
+        index.row_at = np.full((len(index.periodes), len(index.niks)), -1, dtype=np.int64)
+        index.row_at[index.periode, index.child] = np.arange(len(index.child))
+        index.periodes_chrono = sorted(index.periodes.tolist(), key=periode_sort_key)
+        return index
+
+    def periode_code(self, periode):
+        return int(np.searchsorted(self.periodes, periode))
+
+    def region_selection(self, level, puskesmas=None, kelurahan=None):
+        """Mask kode wilayah `level` untuk filter puskesmas/kelurahan ("All" dilewati).
+
+        Kelurahan dicocokkan per pasangan (puskesmas, kelurahan), bukan nama saja.
+        """
+        selected = np.ones(len(self.region_labels[level]), dtype=bool)
+        if puskesmas not in data_access.ALL_VALUES:
+            selected &= self.region_parent.get(level, self.region_labels[level]) == puskesmas
+        if level == "kelurahan" and kelurahan not in data_access.ALL_VALUES:
+            selected &= self.region_labels[level] == kelurahan
+        return selected
+
+    def _in_filter(self, rows, region_filter):
+        keep = rows >= 0
+        region_filter = region_filter or {}
+        puskesmas, kelurahan = region_filter.get("puskesmas"), region_filter.get("kelurahan")
+        for level in REGION_COLUMNS:
+            if region_filter.get(level) in data_access.ALL_VALUES:
+                continue
+            codes = np.flatnonzero(self.region_selection(level, puskesmas, kelurahan))
+            keep &= np.isin(self.region_code[level][np.where(keep, rows, 0)], codes)
+        return keep
+
+    def transitions(self, periode_awal, periode_akhir, level, status="is_stunting", region_filter=None, month_diff=6):
+        """Satu baris per (anak, wilayah `level`) untuk dua periode, seperti merge outer per NIK + wilayah.
+
+        Kolom: wilayah, status awal/akhir (NaN bila tidak diukur), usia awal/akhir
+        (0 bila tidak diukur), dan kategori kohort baru/lama/dropout/sembuh.
+        Anak yang pindah wilayah muncul sebagai dua baris (hanya awal & hanya akhir).
+        """
+        rows_awal = self.row_at[self.periode_code(periode_awal)]
+        rows_akhir = self.row_at[self.periode_code(periode_akhir)]
+        keep_awal = self._in_filter(rows_awal, region_filter)
+        keep_akhir = self._in_filter(rows_akhir, region_filter)
+        region = self.region_code[level]
+        matched = keep_awal & keep_akhir & (region[np.where(keep_awal, rows_awal, 0)] == region[np.where(keep_akhir, rows_akhir, 0)])
+        only_awal = keep_awal & ~matched
+        only_akhir = keep_akhir & ~matched
+
+        # Baris: pasangan lengkap, lalu hanya-awal, lalu hanya-akhir
+        r_awal = np.concatenate([rows_awal[matched], rows_awal[only_awal], np.full(only_akhir.sum(), -1)])
+        r_akhir = np.concatenate([rows_akhir[matched], np.full(only_awal.sum(), -1), rows_akhir[only_akhir]])
+        has_awal, has_akhir = r_awal >= 0, r_akhir >= 0
+        either = np.where(has_awal, r_awal, r_akhir)
+
+        values = self.status[status]
+        awal_true = has_awal & values[np.where(has_awal, r_awal, 0)]
+        akhir_true = has_akhir & values[np.where(has_akhir, r_akhir, 0)]
+        usia_awal = np.where(has_awal, self.usia[np.where(has_awal, r_awal, 0)], 0)
+        usia_akhir = np.where(has_akhir, self.usia[np.where(has_akhir, r_akhir, 0)], 0)
+        codes = region[either] if len(either) else np.array([], dtype=int)
+
+        result = pd.DataFrame({
+            level: pd.Series(self.region_labels[level][np.maximum(codes, 0)], dtype=object).where(codes >= 0),
+            f"{status}_awal": pd.Series(awal_true, dtype=object).where(has_awal),
+            f"{status}_akhir": pd.Series(akhir_true, dtype=object).where(has_akhir),
+            "usia_bulan_awal": usia_awal,
+            "usia_bulan_akhir": usia_akhir,
+        })
+        result[f"{status}_new"] = ~awal_true & akhir_true
+        result[f"{status}_existing"] = awal_true & akhir_true
+        result[f"{status}_dropout"] = awal_true & ~has_akhir & (usia_awal + month_diff > 60)
+        result[f"{status}_recovered"] = awal_true & has_akhir & ~akhir_true
+        # Usia periode akhir untuk kasus baru/lama, usia periode awal untuk dropout/sembuh
+        result["usia_bulan"] = np.where(result[f"{status}_new"] | result[f"{status}_existing"], usia_akhir, usia_awal)
+        return result
+
+    def states(self, status):
+        """Matriks state periode × anak: 0 tidak diukur, 1 tidak, 2 ya (status gizi)."""
+        rows = self.row_at
+        values = self.status[status]
+        return np.where(rows >= 0, STATE_TIDAK + values[np.maximum(rows, 0)], STATE_TIDAK_DIUKUR).astype(np.int64)
+
+    def transition_matrices(self, status, level, pairs):
+        """{(awal, akhir): array (wilayah, 3, 3)} jumlah anak per state awal × state akhir.
+
+        Setiap anak yang diukur di salah satu periode dihitung sekali di wilayah
+        pengukuran periode akhir (atau periode awal bila tidak diukur lagi);
+        sel dihitung dengan satu np.bincount per pasangan periode.
+        """
+        states = self.states(status)
+        region_of_row = self.region_code[level]
+        n_region = len(self.region_labels[level])
+        matrices = {}
+        for awal, akhir in pairs:
+            p_awal, p_akhir = self.periode_code(awal), self.periode_code(akhir)
+            rows = np.where(self.row_at[p_akhir] >= 0, self.row_at[p_akhir], self.row_at[p_awal])
+            region = np.where(rows >= 0, region_of_row[np.maximum(rows, 0)], -1)
+            keep = region >= 0
+            cell = (region[keep] * 3 + states[p_awal][keep]) * 3 + states[p_akhir][keep]
+            matrices[(awal, akhir)] = np.bincount(cell, minlength=n_region * 9).reshape(n_region, 3, 3)
+        return matrices
+
+    def consecutive_pairs(self):
+        return list(zip(self.periodes_chrono[:-1], self.periodes_chrono[1:]))
+
+    def all_pairs(self):
+        """Semua pasangan (awal, akhir) dengan awal lebih dulu secara kronologis."""
+        chrono = self.periodes_chrono
+        return [(chrono[i], chrono[j]) for i in range(len(chrono)) for j in range(i + 1, len(chrono))]
+
+
+def transition_summary(matrix, labels):
+    """Ringkasan transisi per wilayah dari matriks (wilayah, 3, 3) → DataFrame."""
+    summary = pd.DataFrame({"Wilayah": labels})
+    for name, cells in TRANSITION_SUMMARY.items():
+        summary[name] = sum(matrix[:, a, b] for a, b in cells)
+    measured_awal = matrix[:, 1:, :].sum(axis=(1, 2))
+    measured_akhir = matrix[:, :, 1:].sum(axis=(1, 2))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        summary["Prevalensi Awal (%)"] = matrix[:, STATE_YA, :].sum(axis=1) / measured_awal * 100
+        summary["Prevalensi Akhir (%)"] = matrix[:, :, STATE_YA].sum(axis=1) / measured_akhir * 100
+    return summary[(measured_awal + measured_akhir) > 0].reset_index(drop=True)
+
+
+# ----------------------------- #
+# 🧮 Bangun Indeks (dipanggil saat upload)
+# ----------------------------- #
+def build_cohort(conn):
+    """Bangun indeks kohort dari `data_eppgbm` dan simpan sebagai BLOB di database EPPGBM.
+
+    Dijalankan di transaksi upload yang sama dengan normalisasi sehingga
+    dashboard hanya memuat indeks jadi. Data tanpa kolom NIK/periode/wilayah dilewati.
+    """
+    conn.execute(f'DROP TABLE IF EXISTS "{COHORT_TABLE}"')
+    available = [row[1] for row in conn.execute(f'PRAGMA table_info("{EPPGBM_TABLE}")')]
+    if not {"nik", "periode", *REGION_COLUMNS}.issubset(available):
+        return None
+    columns = [c for c in SOURCE_COLUMNS if c in available]
+    select_sql = ", ".join(f'"{c}"' for c in columns)
+    index = CohortIndex(pd.read_sql_query(f'SELECT {select_sql} FROM "{EPPGBM_TABLE}"', conn))
+    conn.execute(f'CREATE TABLE "{COHORT_TABLE}" (payload BLOB)')
+    conn.execute(f'INSERT INTO "{COHORT_TABLE}" (payload) VALUES (?)', (sqlite3.Binary(index.to_bytes()),))
+    data_access.record_data_version(conn, COHORT_TABLE)
+    return COHORT_TABLE
+
+
+@functools.lru_cache(maxsize=2)
+def _cached_index(db_path, version):
+    if data_access.table_exists(COHORT_TABLE, db_path=db_path):
+        with data_access.read_connection(db_path) as conn:
+            row = conn.execute(f'SELECT payload FROM "{COHORT_TABLE}"').fetchone()
+        if row:
+            return CohortIndex.from_bytes(row[0])
+    # Data yang diunggah sebelum indeks disimpan: bangun dari tabel (sekali per versi)
+    columns = [c for c in SOURCE_COLUMNS if c in data_access.table_columns(EPPGBM_TABLE, db_path=db_path)]
+    return CohortIndex(data_access.load_table(EPPGBM_TABLE, columns=columns, db_path=db_path))
+
+
+def _index_version(db_path):
+    return (data_access.data_version(COHORT_TABLE, db_path), data_access.data_version(EPPGBM_TABLE, db_path))
+
+
+def cohort_index(db_path=data_access.EPPGBM_DB_PATH):
+    """Indeks kohort EPPGBM yang disimpan saat upload (dimuat sekali per versi data)."""
+    return _cached_index(db_path, _index_version(db_path))
+
+
+@functools.lru_cache(maxsize=12)
+def _cached_matrices(db_path, version, status, level):
+    index = _cached_index(db_path, version)
+    return index.transition_matrices(status, level, index.all_pairs())
+
+
+def transition_matrices(status="is_stunting", level="puskesmas", db_path=data_access.EPPGBM_DB_PATH):
+    """Matriks transisi semua pasangan periode (di-cache per versi data, status & level)."""
+    return _cached_matrices(db_path, _index_version(db_path), status, level)
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+# Naikkan setiap kali aturan di bawah berubah; data tersimpan dihitung ulang otomatis
+DERIVED_VERSION = "1"
+
+AGE_BINS = [-1, 5, 11, 23, 35, 47, 59]
+AGE_LABELS = ["0-5 bulan", "6-11 bulan", "12-23 bulan", "24-35 bulan", "36-47 bulan", "48-59 bulan"]
+JK_LABELS = {"L": "Laki-laki", "P": "Perempuan"}
+JK_UNKNOWN = "Tidak Diketahui"
+# Batas flag Z-Score (pedoman WHO): kolom → (bawah, atas)
+FLAG_LIMITS = {"ZS_BBU": (-6, 5), "ZS_TBU": (-6, 6), "ZS_BBTB": (-5, 5)}
+# Status gizi: kolom boolean → kolom Z-Score (< -2)
+STATUS_COLUMNS = {"is_stunting": "ZS_TBU", "is_wasting": "ZS_BBTB", "is_underweight": "ZS_BBU"}
+
+# Kolom turunan → (tipe SQLite, kolom sumber)
+DERIVED_COLUMNS = {
+    "usia_bulan": ("INTEGER", ["Tgl_ukur", "Tgl_Lahir"]),
+    "age_group": ("TEXT", ["Tgl_ukur", "Tgl_Lahir"]),
+    "jk_label": ("TEXT", ["jk"]),
+    "BBU_flag": ("INTEGER", ["ZS_BBU"]),
+    "TBU_flag": ("INTEGER", ["ZS_TBU"]),
+    "BBTB_flag": ("INTEGER", ["ZS_BBTB"]),
+    "is_stunting": ("INTEGER", ["ZS_TBU"]),
+    "is_wasting": ("INTEGER", ["ZS_BBTB"]),
+    "is_underweight": ("INTEGER", ["ZS_BBU"]),
+    "CIAF_Category": ("TEXT", ["ZS_BBU", "ZS_TBU", "ZS_BBTB"]),
+}
+SOURCE_COLUMNS = ["Tgl_ukur", "Tgl_Lahir", "jk", "ZS_BBU", "ZS_TBU", "ZS_BBTB"]
+
+
+def derivable_columns(available):
+    """Kolom turunan yang semua kolom sumbernya tersedia."""
+    available = set(available)
+    return [col for col, (_, sources) in DERIVED_COLUMNS.items() if available.issuperset(sources)]
+
+
+# ----------------------------- #
+# 🧮 Rumus (vectorized)
+# ----------------------------- #
+def usia_bulan(tgl_ukur, tgl_lahir):
+    """Usia dalam bulan penuh (30.4375 hari/bulan, dibulatkan ke arah nol); NA bila tanggal tidak valid."""
+    selisih = pd.to_datetime(tgl_ukur, errors="coerce") - pd.to_datetime(tgl_lahir, errors="coerce")
+    return np.trunc(selisih / pd.Timedelta(days=30.4375)).astype("Int64")
+
+
+def age_group(usia):
+    """Kelompok usia 0-59 bulan; di luar rentang → NaN."""
+    return pd.cut(usia.astype("float64"), bins=AGE_BINS, labels=AGE_LABELS, right=True, include_lowest=True)
+
+
+def jk_label(jk):
+    return jk.replace(JK_LABELS).fillna(JK_UNKNOWN)
+
+
+# Kode CIAF per kombinasi bit stunting (4) | wasting (2) | underweight (1);
+# stunting + wasting tanpa underweight tidak punya kategori → "Unknown"
+CIAF_LOOKUP = np.array(["A", "E", "B", "C", "F", "Y", "Unknown", "D"], dtype=object)
+
+
+def ciaf_bits(zs_bbu, zs_tbu, zs_bbtb):
+    """Flag stunting/wasting/underweight dipadatkan ke satu bilangan 0-7 per anak."""
+    return (
+        (zs_tbu < -2).to_numpy(dtype=np.uint8) << 2
+        | (zs_bbtb < -2).to_numpy(dtype=np.uint8) << 1
+        | (zs_bbu < -2).to_numpy(dtype=np.uint8)
+    )
+
+
+def ciaf_category(zs_bbu, zs_tbu, zs_bbtb):
+    """Kategori CIAF A–F/Y (NaN dianggap tidak gagal, sama seperti perbandingan baris per baris)."""
+    return pd.Series(CIAF_LOOKUP[ciaf_bits(zs_bbu, zs_tbu, zs_bbtb)], index=zs_bbu.index)
+
+
+def compute(df):
+    """DataFrame kolom turunan (indeks sama dengan `df`) untuk kolom sumber yang tersedia."""
+    out = pd.DataFrame(index=df.index)
+    columns = derivable_columns(df.columns)
+    if "usia_bulan" in columns:
+        out["usia_bulan"] = usia_bulan(df["Tgl_ukur"], df["Tgl_Lahir"])
+        out["age_group"] = age_group(out["usia_bulan"])
+    if "jk_label" in columns:
+        out["jk_label"] = jk_label(df["jk"])
+    for col, (lo, hi) in FLAG_LIMITS.items():
+        if f"{col[3:]}_flag" in columns:
+            out[f"{col[3:]}_flag"] = (df[col] < lo) | (df[col] > hi)
+    for name, col in STATUS_COLUMNS.items():
+        if name in columns:
+            out[name] = df[col] < -2
+    if "CIAF_Category" in columns:
+        out["CIAF_Category"] = ciaf_category(df["ZS_BBU"], df["ZS_TBU"], df["ZS_BBTB"])
+    return out
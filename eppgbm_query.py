@@ -0,0 +1,349 @@
+import functools
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+import eppgbm_derived
+import parquet_store
+
+try:
+    import duckdb
+except ImportError:  # duckdb opsional; tanpa duckdb semua agregasi jalan di pandas
+    duckdb = None
+
+# "auto" = DuckDB bila tersedia & snapshot Parquet ada, "pandas" = selalu pandas
+QUERY_BACKEND = os.environ.get("RCS_QUERY_BACKEND", "auto")
+EPPGBM_TABLE = "data_eppgbm"
+
+ZSCORE_COLUMNS = ["ZS_BBU", "ZS_TBU", "ZS_BBTB"]
+AGE_BINS = eppgbm_derived.AGE_BINS
+AGE_LABELS = eppgbm_derived.AGE_LABELS
+JK_LABELS = eppgbm_derived.JK_LABELS
+FLAG_LIMITS = eppgbm_derived.FLAG_LIMITS
+# Kolom turunan yang dipakai langsung dari snapshot bila sudah tersimpan saat upload
+PERSISTED_COLUMNS = {"usia_bulan", "age_group", "jk_label"}
+
+# Rincian CIAF yang bisa diminta dari sel agregat
+CIAF_KEYS = ["age_group", "jk_label", "puskesmas", "kelurahan", "periode"]
+# Status gizi dari kolom kategori: nama → (kolom, nilai bermasalah)
+STATUS_CATEGORIES = {
+    "stunting": ("TBU", ["Pendek", "Sangat Pendek"]),
+    "underweight": ("BBU", ["Kurang", "Sangat Kurang"]),
+    "wasting": ("BBTB", ["Gizi Buruk", "Gizi Kurang"]),
+}
+# Prevalensi dari Z-Score: indikator → (kolom Z-Score, arah, batas, kolom boolean tersimpan)
+PREVALENCE_RULES = {
+    "Stunting": ("ZS_TBU", "<", -2, "is_stunting"),
+    "Wasting": ("ZS_BBTB", "<", -2, "is_wasting"),
+    "Underweight": ("ZS_BBU", "<", -2, "is_underweight"),
+    "Overweight": ("ZS_BBU", ">", 2, None),
+}
+
+
+def active_backend():
+    """Nama backend yang dipakai saat ini: 'duckdb' atau 'pandas'."""
+    if QUERY_BACKEND == "pandas" or duckdb is None:
+        return "pandas"
+    return "duckdb" if _snapshot_files() else "pandas"
+
+
+def _snapshot_files():
+    return glob.glob(os.path.join(parquet_store.snapshot_path(EPPGBM_TABLE), "**", "*.parquet"), recursive=True)
+
+
+# ----------------------------- #
+# 🦆 DuckDB (in-process, membaca snapshot Parquet)
+# ----------------------------- #
+def _duckdb_query(sql, params):
+    con = duckdb.connect()
+    try:
+        return con.execute(sql, params).df()
+    finally:
+        con.close()
+
+
+def _duckdb_source(filters):
+    """CTE `src` berisi baris EPPGBM terfilter dengan usia_bulan, age_group & jk_label, plus params.
+
+    Baris dengan tanggal yang tidak bisa di-parse tetap disertakan (usia_bulan
+    NULL) agar pemanggil bisa mendeteksinya dalam scan yang sama.
+    """
+    path = os.path.join(parquet_store.snapshot_path(EPPGBM_TABLE), "**", "*.parquet")
+    where, params = ["1 = 1"], [path]
+    for col, value in (filters or {}).items():
+        if value not in (None, "All", "ALL", ""):
+            where.append(f'"{col}" = ?')
+            params.append(value)
+    where += [f'"{c}" IS NOT NULL' for c in ZSCORE_COLUMNS]
+    if PERSISTED_COLUMNS.issubset(parquet_store.snapshot_columns(EPPGBM_TABLE)):
+        # Kolom turunan sudah dihitung saat upload: tanpa parsing tanggal per query
+        derived_usia, derived_labels = "", ""
+    else:
+        age_case = " ".join(
+            f"WHEN usia_bulan <= {upper} THEN '{label}'" for upper, label in zip(AGE_BINS[1:], AGE_LABELS)
+        )
+        derived_usia = """,
+                CAST(trunc((epoch(TRY_CAST(Tgl_ukur AS TIMESTAMP)) - epoch(TRY_CAST(Tgl_Lahir AS TIMESTAMP)))
+                           / (30.4375 * 86400)) AS INTEGER) AS usia_bulan"""
+        derived_labels = f""",
+                CASE {age_case} END AS age_group,
+                COALESCE(CASE jk WHEN 'L' THEN '{JK_LABELS["L"]}' WHEN 'P' THEN '{JK_LABELS["P"]}' ELSE jk END,
+                         '{eppgbm_derived.JK_UNKNOWN}') AS jk_label"""
+    sql = f"""
+        WITH raw AS (
+            SELECT *{derived_usia}
+            FROM read_parquet(?, hive_partitioning = true, hive_types_autocast = false)
+            WHERE {' AND '.join(where)}
+        ),
+        src AS (
+            SELECT *{derived_labels}
+            FROM raw
+            WHERE usia_bulan IS NULL OR usia_bulan BETWEEN 0 AND 59
+        )
+    """
+    return sql, params
+
+
+def _duckdb_cells(filters):
+    """Satu scan: jumlah pangkat Z-Score & flag per sel usia × jenis kelamin × puskesmas.
+
+    Semua ringkasan (semua/usia/jenis kelamin/area dan flag) bersifat aditif
+    sehingga bisa dirangkum dari sel ini tanpa membaca snapshot lagi.
+    """
+    sql, params = _duckdb_source(filters)
+    aggs = ["count(*) AS n", "count(nama_balita) AS total"]
+    for col in ZSCORE_COLUMNS:
+        aggs += [f'sum(power("{col}", {k})) AS "{col}_s{k}"' for k in range(1, 5)]
+    for col, (lo, hi) in FLAG_LIMITS.items():
+        aggs.append(f'count(*) FILTER (WHERE "{col}" < {lo} OR "{col}" > {hi}) AS "{col[3:]}_flagged"')
+    cells = _duckdb_query(
+        sql + f"SELECT age_group, jk_label, puskesmas, {', '.join(aggs)} FROM src GROUP BY ALL", params
+    )
+    # age_group NULL = tanggal tidak valid; jalur pandas yang dipakai (perilaku asli)
+    return None if cells["age_group"].isna().any() else cells
+
+
+@functools.lru_cache(maxsize=16)
+def _cells_cached(frozen_filters, snapshot_mtime):
+    return _duckdb_cells(dict(frozen_filters))
+
+
+def _moment_stats(sums, col):
+    """mean/std/skew/kurt dari jumlah pangkat, rumus bias-corrected yang sama dengan pandas."""
+    n = sums["n"].astype(float)
+    mean = sums[f"{col}_s1"] / n
+    # Jumlah simpangan pangkat 2/3/4 terhadap rata-rata
+    m2 = sums[f"{col}_s2"] - n * mean ** 2
+    m3 = sums[f"{col}_s3"] - 3 * mean * sums[f"{col}_s2"] + 2 * n * mean ** 3
+    m4 = (sums[f"{col}_s4"] - 4 * mean * sums[f"{col}_s3"] + 6 * mean ** 2 * sums[f"{col}_s2"]
+          - 3 * n * mean ** 4)
+    m2 = m2.clip(lower=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std = np.sqrt(m2 / (n - 1))
+        skew = np.sqrt(n * (n - 1)) / (n - 2) * (m3 / n) / (m2 / n) ** 1.5
+        kurt = n * (n + 1) * (n - 1) * m4 / ((n - 2) * (n - 3) * m2 ** 2) - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+    # Varians nol → skew/kurt 0 seperti pandas; sampel terlalu kecil → NaN
+    skew = skew.where(m2 > 0, 0.0).where(n >= 3)
+    kurt = kurt.where(m2 > 0, 0.0).where(n >= 4)
+    return {
+        f"{col}_mean": mean,
+        f"{col}_std": std.where(n >= 2),
+        f"{col}_skew": skew,
+        f"{col}_kurt": kurt,
+    }
+
+
+def _stats_from_cells(cells, by):
+    sum_cols = ["n"] + [f"{col}_s{k}" for col in ZSCORE_COLUMNS for k in range(1, 5)]
+    sums = cells.groupby(by)[sum_cols].sum().reset_index() if by else cells[sum_cols].sum().to_frame().T
+    stats = pd.DataFrame({by: sums[by]}) if by else pd.DataFrame(index=sums.index)
+    stats["n"] = sums["n"].astype("int64")
+    for col in ZSCORE_COLUMNS:
+        for name, values in _moment_stats(sums, col).items():
+            stats[name] = values.astype(float)
+    return stats
+
+
+# ----------------------------- #
+# 🐼 Pandas (perilaku asli dashboard)
+# ----------------------------- #
+def _pandas_group_stats(filtered_df, by):
+    if by is None:
+        row = {"n": filtered_df[ZSCORE_COLUMNS[0]].count()}
+        for col in ZSCORE_COLUMNS:
+            s = filtered_df[col]
+            row.update({f"{col}_mean": s.mean(), f"{col}_std": s.std(), f"{col}_skew": s.skew(), f"{col}_kurt": s.kurtosis()})
+        return pd.DataFrame([row])
+    aggs = {"n": (ZSCORE_COLUMNS[0], "count")}
+    for col in ZSCORE_COLUMNS:
+        aggs[f"{col}_mean"] = (col, "mean")
+        aggs[f"{col}_std"] = (col, "std")
+        aggs[f"{col}_skew"] = (col, "skew")
+        aggs[f"{col}_kurt"] = (col, lambda x: x.kurtosis())
+    return filtered_df.groupby(by).agg(**aggs).reset_index()
+
+
+def _pandas_flag_counts(filtered_df):
+    flags = {}
+    for col, (lo, hi) in FLAG_LIMITS.items():
+        flags[f"{col[3:]}_flagged"] = (filtered_df[col] < lo) | (filtered_df[col] > hi)
+    frame = filtered_df[["age_group", "nama_balita"]].assign(**flags)
+    return frame.groupby("age_group").agg(
+        total=("nama_balita", "count"),
+        **{name: (name, "sum") for name in flags},
+    ).reset_index()
+
+
+# ----------------------------- #
+# 🧮 Kernel Agregasi Grup (factorize + np.bincount)
+# ----------------------------- #
+def _group_ids(columns, dropna=True):
+    """Id sel gabungan per baris untuk kolom kunci {nama: Series} → (baris, id sel, kunci per sel).
+
+    Kunci di-factorize terurut sehingga id sel mengikuti urutan groupby pandas.
+    Dengan `dropna`, baris yang kuncinya kosong dilewati (seperti groupby).
+    """
+    codes, levels = [], []
+    for values in columns.values():
+        code, level = pd.factorize(values, sort=True, use_na_sentinel=dropna)
+        codes.append(code)
+        levels.append(level)
+    rows = np.flatnonzero(np.logical_and.reduce([c >= 0 for c in codes])) if codes else np.array([], dtype=int)
+    shape = [max(len(level), 1) for level in levels]
+    cell_ids, cell_of_row = np.unique(np.ravel_multi_index([c[rows] for c in codes], shape), return_inverse=True)
+    keys = pd.DataFrame({
+        name: level.take(code) for name, level, code in zip(columns, levels, np.unravel_index(cell_ids, shape))
+    })
+    return rows, cell_of_row, keys
+
+
+def _count(cell_of_row, n_cells, mask=None):
+    if mask is None:
+        return np.bincount(cell_of_row, minlength=n_cells)
+    return np.bincount(cell_of_row, weights=mask.astype(float), minlength=n_cells).astype("int64")
+
+
+def prevalence(df, by, indicators=tuple(PREVALENCE_RULES)):
+    """Jumlah balita, jumlah kasus & prevalensi (%) Stunting/Wasting/Underweight/Overweight per grup.
+
+    Satu lintasan untuk daftar kunci apa pun (`by`, mis. ["puskesmas", "kelurahan"]);
+    hasil sama dengan groupby(by).apply per grup: penyebut = semua baris grup,
+    pembilang = Z-Score melewati batas (kolom boolean tersimpan dipakai bila ada).
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    rows, cell_of_row, result = _group_ids({k: df[k] for k in by})
+    total = _count(cell_of_row, len(result))
+    result["Jumlah_Balita"] = total
+    for name in indicators:
+        col, op, limit, stored = PREVALENCE_RULES[name]
+        if stored in df.columns:
+            mask = df[stored].fillna(False).to_numpy(dtype=bool)
+        else:
+            values = df[col].to_numpy(dtype=float)
+            with np.errstate(invalid="ignore"):
+                mask = values < limit if op == "<" else values > limit
+        result[f"Kasus_{name}"] = _count(cell_of_row, len(result), mask[rows])
+    for name in indicators:
+        result[f"Prevalensi_{name}"] = result[f"Kasus_{name}"] / total * 100
+    return result
+
+
+# ----------------------------- #
+# 🧩 CIAF (satu groupby untuk semua rincian)
+# ----------------------------- #
+def ciaf_cells(filtered_df):
+    """Jumlah anak per sel usia × jenis kelamin × puskesmas × kelurahan × periode × kategori CIAF.
+
+    Semua jumlah dihitung dengan kernel grup di atas dalam satu lintasan;
+    pembilang & penyebut status gizi (TBU/BBU/BBTB) ikut dijumlahkan sehingga
+    setiap rincian cukup merangkum sel kecil ini.
+    """
+    keys = [k for k in CIAF_KEYS if k in filtered_df.columns]
+    if "CIAF_Category" in filtered_df.columns:
+        categories = filtered_df["CIAF_Category"]
+    else:
+        categories = eppgbm_derived.ciaf_category(filtered_df["ZS_BBU"], filtered_df["ZS_TBU"], filtered_df["ZS_BBTB"])
+    columns = {k: filtered_df[k] for k in keys}
+    columns["CIAF_Category"] = categories
+    rows, cell_of_row, cells = _group_ids(columns, dropna=False)
+    cells["n"] = _count(cell_of_row, len(cells))
+    for name, (col, values) in STATUS_CATEGORIES.items():
+        if col in filtered_df.columns:
+            cells[f"{name}_kasus"] = _count(cell_of_row, len(cells), filtered_df[col].isin(values).to_numpy())
+            cells[f"{name}_diukur"] = _count(cell_of_row, len(cells), filtered_df[col].notna().to_numpy())
+    return cells
+
+
+def ciaf_prevalence(cells, by):
+    """Prevalensi CIAF (% kategori selain A) per `by`, urutan & grup kosong seperti groupby pandas."""
+    total = cells.groupby(by, observed=False)["n"].sum()
+    gagal = cells[cells["CIAF_Category"] != "A"].groupby(by, observed=False)["n"].sum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (gagal.reindex(total.index, fill_value=0) / total * 100).astype(float)
+
+
+def ciaf_distribution(cells, by):
+    """Persentase tiap kategori CIAF per `by` (baris = grup, kolom = kategori)."""
+    counts = cells.groupby([by, "CIAF_Category"], observed=False)["n"].sum().unstack(fill_value=0)
+    return counts.div(counts.sum(axis=1), axis=0).fillna(0) * 100
+
+
+def status_prevalence(cells, by, name):
+    """Prevalensi status gizi (stunting/underweight/wasting) per `by` dari kolom kategori."""
+    sums = cells.groupby(by, observed=False)[[f"{name}_kasus", f"{name}_diukur"]].sum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (sums[f"{name}_kasus"] / sums[f"{name}_diukur"] * 100).astype(float)
+
+
+# ----------------------------- #
+# 📊 API untuk Dashboard
+# ----------------------------- #
+def _duckdb_cells_for(filters):
+    """Sel agregat DuckDB (di-cache per filter sampai snapshot ditulis ulang), atau None."""
+    if active_backend() != "duckdb":
+        return None
+    try:
+        mtime = os.path.getmtime(parquet_store.snapshot_path(EPPGBM_TABLE))
+        return _cells_cached(tuple(sorted((filters or {}).items())), mtime)
+    except Exception:
+        return None
+
+
+def _order_like_pandas(result, by):
+    """Samakan urutan & baris kosong dengan groupby pandas (kategori usia tetap lengkap)."""
+    if by == "age_group":
+        return result.set_index("age_group").reindex(AGE_LABELS).rename_axis("age_group").reset_index()
+    if by:
+        return result.dropna(subset=[by]).sort_values(by).reset_index(drop=True)
+    return result
+
+
+def zscore_group_stats(filtered_df, groupings=(None,), filters=None):
+    """count/mean/std/skew/kurtosis Z-Score per pengelompokan → {by: DataFrame}.
+
+    `groupings` berisi kolom 'age_group', 'jk_label', 'puskesmas' atau None
+    (seluruh data). `filtered_df` adalah data yang sudah difilter dashboard
+    (dipakai jalur pandas); `filters` ({kolom: nilai}) dipakai jalur DuckDB
+    untuk membaca baris yang sama langsung dari snapshot Parquet.
+    """
+    cells = _duckdb_cells_for(filters)
+    if cells is not None:
+        results = {}
+        for by in groupings:
+            result = _order_like_pandas(_stats_from_cells(cells, by), by)
+            result["n"] = result["n"].fillna(0).astype("int64")
+            results[by] = result
+        return results
+    return {by: _pandas_group_stats(filtered_df, by) for by in groupings}
+
+
+def zscore_flag_counts(filtered_df, filters=None):
+    """Jumlah data & data ter-flag per kelompok usia."""
+    cells = _duckdb_cells_for(filters)
+    if cells is not None:
+        flag_cols = ["total"] + [f"{col[3:]}_flagged" for col in FLAG_LIMITS]
+        result = _order_like_pandas(cells.groupby("age_group")[flag_cols].sum().reset_index(), "age_group")
+        return result.fillna({c: 0 for c in flag_cols}).astype({c: "int64" for c in flag_cols})
+    return _pandas_flag_counts(filtered_df)
@@ -0,0 +1,295 @@
+import sqlite3
+
+import pandas as pd
+
+import data_access
+import eppgbm_cohort
+import eppgbm_derived
+import parquet_store
+
+# Nama tabel lebar (hasil upload) — setelah normalisasi menjadi VIEW dengan nama yang sama
+WIDE_TABLE = "data_eppgbm"
+STAGING_TABLE = "eppgbm__wide"
+
+# Dimensi balita: identitas yang berulang di setiap baris pengukuran/periode
+CHILD_TABLE = "eppgbm_balita"
+IDENTITY_COLUMNS = ["nik", "nama_balita", "jk", "Tgl_Lahir", "BB_Lahir", "TB_Lahir", "Nama_Ortu", "alamat"]
+# Dimensi kecil lain: kolom → (tabel, kolom id)
+DIMENSIONS = {
+    "periode": ("eppgbm_periode", "periode_id"),
+    "puskesmas": ("eppgbm_puskesmas", "puskesmas_id"),
+    "kelurahan": ("eppgbm_kelurahan", "kelurahan_id"),
+}
+# Fakta pengukuran: id dimensi + kolom pengukuran (bb, tinggi, Z-Score, cara_ukur, ...)
+FACT_TABLE = "eppgbm_ukur"
+
+# Identitas yang hanya dibutuhkan untuk unduhan daftar balita (tidak dimuat di analisis)
+DETAIL_COLUMNS = ["Nama_Ortu", "alamat"]
+
+# Metadata normalisasi (versi aturan kolom turunan)
+META_TABLE = "eppgbm_meta"
+DERIVED_TMP_TABLE = "eppgbm__turunan"
+DERIVED_CHUNK_SIZE = 100000
+
+
+def _q(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _object_type(conn, name):
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def _columns(conn, table_name):
+    """[(nama, tipe deklarasi)] sesuai urutan kolom tabel/view."""
+    return [(row[1], row[2] or "") for row in conn.execute(f"PRAGMA table_info({_q(table_name)})")]
+
+
+def is_normalized(conn):
+    return _object_type(conn, WIDE_TABLE) == "view"
+
+
+def _drop_normalized_tables(conn):
+    if is_normalized(conn):
+        conn.execute(f"DROP VIEW {_q(WIDE_TABLE)}")
+    for table in [FACT_TABLE, CHILD_TABLE, META_TABLE] + [t for t, _ in DIMENSIONS.values()]:
+        conn.execute(f"DROP TABLE IF EXISTS {_q(table)}")
+
+
+# ----------------------------- #
+# 🗑️ Persiapan Tulis (dipanggil di transaksi upload)
+# ----------------------------- #
+def drop(conn):
+    """Hapus data EPPGBM (view + tabel normalisasi, atau tabel lebar) sebelum upload ganti tabel."""
+    _drop_normalized_tables(conn)
+    conn.execute(f"DROP TABLE IF EXISTS {_q(WIDE_TABLE)}")
+
+
+def denormalize(conn):
+    """Kembalikan data ke satu tabel lebar `data_eppgbm` (untuk upload incremental)."""
+    if not is_normalized(conn):
+        return False
+    conn.execute(f"DROP TABLE IF EXISTS {_q(STAGING_TABLE)}")
+    # Urutan baris asli (rowid fakta) hanya dibutuhkan di sini; VIEW sendiri tanpa ORDER BY
+    select_sql = _view_select(conn, [c for c, _ in _columns(conn, WIDE_TABLE)])
+    conn.execute(f"CREATE TABLE {_q(STAGING_TABLE)} AS {select_sql} ORDER BY f.rowid")
+    _drop_normalized_tables(conn)
+    conn.execute(f"ALTER TABLE {_q(STAGING_TABLE)} RENAME TO {_q(WIDE_TABLE)}")
+    return True
+
+
+# ----------------------------- #
+# 🧩 Normalisasi (dimensi balita + fakta pengukuran)
+# ----------------------------- #
+def normalize(conn):
+    """Pecah tabel lebar `data_eppgbm` menjadi dimensi + fakta, lalu buat VIEW pengganti.
+
+    Dimensi balita berisi satu baris per kombinasi identitas unik (NIK, nama,
+    tanggal lahir, orang tua, alamat, ...) dengan `child_id` integer; periode,
+    puskesmas dan kelurahan disimpan sebagai id. VIEW `data_eppgbm` menyusun
+    kembali kolom aslinya sehingga pembaca lama tidak berubah.
+    """
+    if _object_type(conn, WIDE_TABLE) != "table":
+        return False
+    columns = _columns(conn, WIDE_TABLE)
+    declared = dict(columns)
+    identity = [c for c in IDENTITY_COLUMNS if c in declared]
+    dimensions = {c: DIMENSIONS[c] for c in DIMENSIONS if c in declared}
+    measures = [c for c, _ in columns if c not in identity and c not in dimensions]
+    if not identity:
+        return False
+
+    _drop_normalized_tables(conn)
+    conn.execute(f"DROP TABLE IF EXISTS {_q(STAGING_TABLE)}")
+    conn.execute(f"ALTER TABLE {_q(WIDE_TABLE)} RENAME TO {_q(STAGING_TABLE)}")
+
+    def col_defs(names):
+        return ", ".join(f"{_q(c)} {declared[c]}".rstrip() for c in names)
+
+    # Dimensi periode/puskesmas/kelurahan
+    for col, (table, id_col) in dimensions.items():
+        conn.execute(f"CREATE TABLE {_q(table)} ({_q(id_col)} INTEGER PRIMARY KEY, {col_defs([col])})")
+        conn.execute(f"INSERT INTO {_q(table)} ({_q(col)}) SELECT DISTINCT {_q(col)} FROM {_q(STAGING_TABLE)}")
+        conn.execute(f"CREATE INDEX {_q('idx_' + table)} ON {_q(table)} ({_q(col)})")
+
+    # Dimensi balita: satu baris per kombinasi identitas (nilai NULL ikut dibedakan)
+    identity_sql = ", ".join(_q(c) for c in identity)
+    conn.execute(f"CREATE TABLE {_q(CHILD_TABLE)} (child_id INTEGER PRIMARY KEY, {col_defs(identity)})")
+    conn.execute(f"INSERT INTO {_q(CHILD_TABLE)} ({identity_sql}) SELECT DISTINCT {identity_sql} FROM {_q(STAGING_TABLE)}")
+    # Indeks identitas hanya untuk membangun fakta; dihapus setelahnya agar file tetap kecil
+    conn.execute(f"CREATE INDEX {_q('tmp_idx_' + CHILD_TABLE)} ON {_q(CHILD_TABLE)} ({identity_sql})")
+
+    # Fakta pengukuran, urutan baris mengikuti tabel lebar
+    id_cols = ["child_id"] + [id_col for _, id_col in dimensions.values()]
+    fact_defs = ", ".join(f"{_q(c)} INTEGER" for c in id_cols)
+    if measures:
+        fact_defs += ", " + col_defs(measures)
+    conn.execute(f"CREATE TABLE {_q(FACT_TABLE)} ({fact_defs})")
+    joins = [
+        f"JOIN {_q(CHILD_TABLE)} b ON " + " AND ".join(f"w.{_q(c)} IS b.{_q(c)}" for c in identity)
+    ]
+    select = ["b.child_id"]
+    for i, (col, (table, id_col)) in enumerate(dimensions.items()):
+        joins.append(f"JOIN {_q(table)} d{i} ON w.{_q(col)} IS d{i}.{_q(col)}")
+        select.append(f"d{i}.{_q(id_col)}")
+    select += [f"w.{_q(c)}" for c in measures]
+    conn.execute(
+        f"INSERT INTO {_q(FACT_TABLE)} ({', '.join(_q(c) for c in id_cols + measures)}) "
+        f"SELECT {', '.join(select)} FROM {_q(STAGING_TABLE)} w {' '.join(joins)} ORDER BY w.rowid"
+    )
+    filter_ids = [id_col for _, id_col in dimensions.values()]
+    if filter_ids:
+        conn.execute(
+            f"CREATE INDEX {_q('idx_' + FACT_TABLE + '_filter')} ON {_q(FACT_TABLE)} "
+            f"({', '.join(_q(c) for c in filter_ids)})"
+        )
+    conn.execute(f"CREATE INDEX {_q('idx_' + FACT_TABLE + '_child')} ON {_q(FACT_TABLE)} (child_id)")
+    conn.execute(f"CREATE INDEX {_q('idx_' + CHILD_TABLE + '_nik')} ON {_q(CHILD_TABLE)} ({_q(identity[0])})")
+    conn.execute(f"DROP INDEX {_q('tmp_idx_' + CHILD_TABLE)}")
+    conn.execute(f"DROP TABLE {_q(STAGING_TABLE)}")
+
+    # Kolom turunan, lalu VIEW dengan nama & urutan kolom tabel lebar
+    write_derived(conn)
+    _create_view(conn, [c for c, _ in columns])
+    conn.execute(f"ANALYZE {_q(FACT_TABLE)}")
+    conn.execute(f"ANALYZE {_q(CHILD_TABLE)}")
+    return True
+
+
+def _view_select(conn, columns):
+    """SELECT yang menyusun kembali kolom tabel lebar dari fakta (alias `f`) + dimensi."""
+    identity = {c for c, _ in _columns(conn, CHILD_TABLE)} - {"child_id"}
+    fact = {c for c, _ in _columns(conn, FACT_TABLE)}
+    dimensions = {c: DIMENSIONS[c] for c in DIMENSIONS if DIMENSIONS[c][1] in fact}
+    source = {c: f"f.{_q(c)}" for c in fact}
+    source.update({c: f"b.{_q(c)}" for c in identity})
+    source.update({col: f"d{i}.{_q(col)}" for i, col in enumerate(dimensions)})
+    view_joins = [f"JOIN {_q(CHILD_TABLE)} b ON b.child_id = f.child_id"]
+    view_joins += [
+        f"JOIN {_q(table)} d{i} ON d{i}.{_q(id_col)} = f.{_q(id_col)}"
+        for i, (table, id_col) in enumerate(dimensions.values())
+    ]
+    return (
+        "SELECT " + ", ".join(f"{source[c]} AS {_q(c)}" for c in columns)
+        + f" FROM {_q(FACT_TABLE)} f {' '.join(view_joins)}"
+    )
+
+
+def _view_is_ordered(conn):
+    """True bila VIEW masih versi lama dengan ORDER BY (filter tidak memakai indeks fakta)."""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = ?", (WIDE_TABLE,)).fetchone()
+    return bool(row) and "ORDER BY" in row[0].upper()
+
+
+def _create_view(conn, columns):
+    """VIEW `data_eppgbm` dengan urutan kolom tabel lebar + kolom turunan di akhir.
+
+    Tanpa ORDER BY agar filter wilayah/periode pada VIEW tetap memakai indeks
+    komposit id dimensi di tabel fakta.
+    """
+    fact = {c for c, _ in _columns(conn, FACT_TABLE)}
+    columns = list(columns) + [c for c in eppgbm_derived.DERIVED_COLUMNS if c in fact and c not in columns]
+    if is_normalized(conn):
+        conn.execute(f"DROP VIEW {_q(WIDE_TABLE)}")
+    conn.execute(f"CREATE VIEW {_q(WIDE_TABLE)} AS {_view_select(conn, columns)}")
+
+
+# ----------------------------- #
+# 🧮 Kolom Turunan (usia, kelompok usia, flag, CIAF, status gizi)
+# ----------------------------- #
+def derived_version(conn):
+    """Versi aturan kolom turunan yang tersimpan, atau None."""
+    if _object_type(conn, META_TABLE) != "table":
+        return None
+    row = conn.execute(f"SELECT value FROM {_q(META_TABLE)} WHERE key = 'derived_version'").fetchone()
+    return row[0] if row else None
+
+
+def write_derived(conn):
+    """Hitung kolom turunan sekali (vectorized, per chunk) dan simpan di tabel fakta.
+
+    Hasil ditulis ke tabel sementara berkunci rowid fakta lalu disalin dengan
+    satu UPDATE, sehingga kolom turunan ikut ter-VIEW seperti kolom pengukuran.
+    """
+    fact = dict(_columns(conn, FACT_TABLE))
+    child = dict(_columns(conn, CHILD_TABLE))
+    sources = {c: f"f.{_q(c)}" for c in eppgbm_derived.SOURCE_COLUMNS if c in fact and c not in eppgbm_derived.DERIVED_COLUMNS}
+    sources.update({c: f"b.{_q(c)}" for c in eppgbm_derived.SOURCE_COLUMNS if c in child})
+    derived = eppgbm_derived.derivable_columns(sources)
+    if derived:
+        for col in derived:
+            if col not in fact:
+                conn.execute(f"ALTER TABLE {_q(FACT_TABLE)} ADD COLUMN {_q(col)} {eppgbm_derived.DERIVED_COLUMNS[col][0]}")
+        col_defs = ", ".join(f"{_q(c)} {eppgbm_derived.DERIVED_COLUMNS[c][0]}" for c in derived)
+        conn.execute(f"DROP TABLE IF EXISTS temp.{_q(DERIVED_TMP_TABLE)}")
+        conn.execute(f"CREATE TEMP TABLE {_q(DERIVED_TMP_TABLE)} (rid INTEGER PRIMARY KEY, {col_defs})")
+        insert = (
+            f"INSERT INTO temp.{_q(DERIVED_TMP_TABLE)} (rid, {', '.join(_q(c) for c in derived)}) "
+            f"VALUES ({', '.join('?' * (len(derived) + 1))})"
+        )
+        chunks = pd.read_sql_query(
+            f"SELECT f.rowid AS rid, {', '.join(f'{expr} AS {_q(c)}' for c, expr in sources.items())} "
+            f"FROM {_q(FACT_TABLE)} f JOIN {_q(CHILD_TABLE)} b ON b.child_id = f.child_id",
+            conn,
+            chunksize=DERIVED_CHUNK_SIZE,
+        )
+        for chunk in chunks:
+            values = eppgbm_derived.compute(chunk)[derived].astype(object)
+            values = values.where(values.notna(), None)
+            values.insert(0, "rid", chunk["rid"].astype(object))
+            conn.executemany(insert, values.itertuples(index=False, name=None))
+        assigned = ", ".join(_q(c) for c in derived)
+        conn.execute(
+            f"UPDATE {_q(FACT_TABLE)} SET ({assigned}) = "
+            f"(SELECT {assigned} FROM temp.{_q(DERIVED_TMP_TABLE)} t WHERE t.rid = {_q(FACT_TABLE)}.rowid)"
+        )
+        conn.execute(f"DROP TABLE temp.{_q(DERIVED_TMP_TABLE)}")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {_q(META_TABLE)} (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute(
+        f"INSERT OR REPLACE INTO {_q(META_TABLE)} (key, value) VALUES ('derived_version', ?)",
+        (eppgbm_derived.DERIVED_VERSION,),
+    )
+    return derived
+
+
+def ensure_derived(db_path=data_access.EPPGBM_DB_PATH):
+    """Hitung ulang kolom turunan bila versi aturannya berubah sejak upload terakhir.
+
+    VIEW versi lama (dengan ORDER BY) ikut dibuat ulang. Berjalan sebagai
+    staged write (pembaca tetap memakai data lama) lalu snapshot & versi data
+    diperbarui. True bila data dihitung ulang.
+    """
+    try:
+        with data_access.read_connection(db_path) as conn:
+            if not is_normalized(conn):
+                return False
+            stale = derived_version(conn) != eppgbm_derived.DERIVED_VERSION
+            if not stale and not _view_is_ordered(conn):
+                return False
+    except sqlite3.Error:
+        return False
+    with data_access.staged_write(db_path) as conn:
+        view_columns = [c for c, _ in _columns(conn, WIDE_TABLE)]
+        if stale:
+            write_derived(conn)
+        _create_view(conn, view_columns)
+        eppgbm_cohort.build_cohort(conn)
+    if parquet_store.is_available():
+        try:
+            with data_access.read_connection(db_path) as conn:
+                parquet_store.write_snapshot(conn, WIDE_TABLE)
+        except Exception:
+            pass  # snapshot gagal sudah dihapus; dashboard membaca langsung dari database
+    with data_access.write_connection(db_path) as conn:
+        data_access.record_data_version(conn, WIDE_TABLE)
+    return True
+
+
+# ----------------------------- #
+# 📥 Kolom untuk Dashboard
+# ----------------------------- #
+def analysis_columns(db_path=data_access.EPPGBM_DB_PATH):
+    """Kolom `data_eppgbm` tanpa identitas detail (nama orang tua, alamat)."""
+    columns = data_access.table_columns(WIDE_TABLE, db_path=db_path)
+    return [c for c in columns if c not in DETAIL_COLUMNS]
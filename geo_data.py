@@ -0,0 +1,119 @@
+import json
+import os
+
+import numpy as np
+import streamlit as st
+
+PUSKESMAS_GEOJSON = "puskesmas_fix.geojson"
+KELURAHAN_GEOJSON = "desa_fix.geojson"
+
+# Toleransi penyederhanaan poligon (derajat); ~0.0005° ≈ 55 m, ~0.0002° ≈ 22 m
+SIMPLIFY_TOLERANCE = {
+    "puskesmas": 0.0005,
+    "kelurahan": 0.0002,
+}
+# 5 desimal ≈ 1 m, cukup untuk peta choropleth
+COORD_PRECISION = 5
+
+
+# ----------------------------- #
+# ✂️ Penyederhanaan Geometri
+# ----------------------------- #
+def _simplify_ring(coords, tolerance):
+    """Douglas-Peucker untuk satu ring tertutup; minimal 4 titik tetap dipertahankan."""
+    pts = np.asarray(coords, dtype=float)[:, :2]
+    if tolerance <= 0 or len(pts) <= 4:
+        return pts
+    keep = np.zeros(len(pts), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(pts) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        seg = pts[start + 1:end]
+        a, b = pts[start], pts[end]
+        d = b - a
+        norm = np.hypot(d[0], d[1])
+        if norm == 0:
+            dist = np.hypot(seg[:, 0] - a[0], seg[:, 1] - a[1])
+        else:
+            dist = np.abs(d[0] * (seg[:, 1] - a[1]) - d[1] * (seg[:, 0] - a[0])) / norm
+        idx = int(np.argmax(dist))
+        if dist[idx] > tolerance:
+            mid = start + 1 + idx
+            keep[mid] = True
+            stack.append((start, mid))
+            stack.append((mid, end))
+    simplified = pts[keep]
+    return simplified if len(simplified) >= 4 else pts
+
+
+def _compact_polygon(rings, tolerance):
+    out = []
+    for i, ring in enumerate(rings):
+        simplified = _simplify_ring(ring, tolerance)
+        # Lubang (ring dalam) yang menyusut habis dibuang saja
+        if i > 0 and len(simplified) < 4:
+            continue
+        out.append(np.round(simplified, COORD_PRECISION).tolist())
+    return out
+
+
+def _compact_geometry(geometry, tolerance):
+    if geometry["type"] == "Polygon":
+        coords = _compact_polygon(geometry["coordinates"], tolerance)
+    elif geometry["type"] == "MultiPolygon":
+        coords = [_compact_polygon(poly, tolerance) for poly in geometry["coordinates"]]
+    else:
+        return geometry
+    return {"type": geometry["type"], "coordinates": coords}
+
+
+# ----------------------------- #
+# 🗺️ Loader GeoJSON (sekali per proses)
+# ----------------------------- #
+@st.cache_resource(show_spinner=False)
+def _load_compact(path, name_field, tolerance, mtime):
+    with open(path, "r") as f:
+        raw = json.load(f)
+    features = []
+    for feature in raw["features"]:
+        # Hanya properti nama yang dipakai Plotly; sisanya dibuang agar payload kecil
+        name = str(feature["properties"][name_field]).strip().title()
+        features.append({
+            "type": "Feature",
+            "properties": {name_field: name},
+            "geometry": _compact_geometry(feature["geometry"], tolerance),
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def load_geojson(path, name_field, tolerance=0.0):
+    """GeoJSON ringkas dengan nama ter-normalisasi (strip + title case).
+
+    Hasil dipakai bersama antar sesi sehingga tidak boleh diubah di tempat.
+    Cache otomatis diperbarui bila file GeoJSON diganti.
+    """
+    return _load_compact(path, name_field, tolerance, os.path.getmtime(path))
+
+
+def load_puskesmas_geojson():
+    return load_geojson(PUSKESMAS_GEOJSON, "nama_puskesmas", SIMPLIFY_TOLERANCE["puskesmas"])
+
+
+def load_kelurahan_geojson():
+    return load_geojson(KELURAHAN_GEOJSON, "nama_desa", SIMPLIFY_TOLERANCE["kelurahan"])
+
+
+def feature_names(geojson_data, name_field):
+    return [f["properties"][name_field] for f in geojson_data["features"]]
+
+
+def subset_features(geojson_data, name_field, names):
+    """FeatureCollection berisi fitur terpilih saja (untuk trace highlight)."""
+    names = set(names)
+    return {
+        "type": "FeatureCollection",
+        "features": [f for f in geojson_data["features"] if f["properties"][name_field] in names],
+    }
@@ -0,0 +1,325 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+import data_access
+import rollup
+
+# Metode robust: flag dihitung batch saat upload (kelurahan × bulan × indikator)
+ROBUST_METHODS = ["MAD", "Hampel", "Residual Bulanan"]
+# Pilihan metode di selectbox dashboard
+OUTLIER_METHODS = ["Tidak Ada", "Z-Score", "IQR"] + ROBUST_METHODS
+Z_THRESHOLD = 3
+IQR_FACTOR = 1.5
+# Modified Z-Score (Iglewicz & Hoaglin): |x - median| / (1.4826 × MAD) > 3.5
+MAD_SCALE = 1.4826
+MEAN_AD_SCALE = 1.2533
+ROBUST_THRESHOLD = 3.5
+# Hampel: jendela ±6 bulan (13 bulan) agar skala MAD tidak terlalu bising pada seri pendek
+HAMPEL_HALF_WINDOW = 6
+HAMPEL_THRESHOLD = 3.5
+MIN_OBSERVATIONS = 3
+REGION_COLUMNS = ["Puskesmas", "Kelurahan"]
+
+# Indikator per dataset: nama metrik → (numerator, denominator), sama dengan metric_to_columns di dashboard
+INDICATORS = {
+    "data_balita_gizi": {
+        "Metrik Bayi Mendapat IMD (%)": ("Jumlah_Bayi_Mendapat_IMD", "Jumlah_bayi_baru_lahir_bulan_ini_B"),
+        "Metrik Jumlah Bayi ASI Eksklusif Sampai 6 Bulan (%)": ("Jumlah_Bayi_Asi_Eksklusif_sampai_6_bulan", "Jumlah_Bayi_usia_6_bulan"),
+        "Metrik Bayi 0-5 Bulan ASI Eksklusif Recall 24 Jam (%)": ("Jumlah_Bayi_usia_0-5_bulan_yang_mendapat_ASI_Eksklusif_berdasarkan_recall_24_jam", "Jumlah_Bayi_usia_0-5_bulan_yang_direcall"),
+        "Metrik Proporsi Sampling Bayi 0-5 Bulan Recall ASI (%)": ("Jumlah_Bayi_usia_0-5_bulan_yang_direcall", "Jumlah_Bayi_usia_0-5_bulan"),
+        "Metrik Anak Usia 6-23 Bulan Di Wawancarai": ("Jumlah_anak_usia_6-23_bulan_yang_diwawancarai", "Jumlah_anak_usia_6-23_bulan"),
+        "Metrik Anak Usia 6-23 Bulan Konsumsi 5 dari 8 Kelompok Makanan (%)": ("Jumlah_anak_usia_6-23_bulan_yang_mengkonsumsi_makanan_dan_minuman_setidaknya_5_dari_8_jenis_kelompok_makanan_pada_hari_kemarin_sebelum_wawancara", "Jumlah_anak_usia_6-23_bulan_yang_diwawancarai"),
+        "Metrik Anak Usia 6-23 Bulan Konsumsi Telur, Ikan, Daging (%)": ("Jumlah_anak_usia_6-23_bulan_yang_mengkonsumsi_telur_ikan_dan_atau_daging_pada_hari_kemarin_sebelum_wawancara", "Jumlah_anak_usia_6-23_bulan_yang_diwawancarai"),
+        "Metrik Anak Usia 6-23 Bulan Mendapat MPASI Baik (%)": ("Jumlah_anak_usia_6-23_bulan_yang_mendapat_MPASI_baik", "Jumlah_anak_usia_6-23_bulan_yang_diwawancarai"),
+        "Jumlah Bayi 6-11 Bulan Mendapat Vitamin A (%)": ("Jumlah_bayi_6-11_bulan_mendapat_Vitamin_A", "Jumlah_bayi_6-11_bulan"),
+        "Jumlah Anak 12-59 Bulan Mendapat Vitamin A (%)": ("Jumlah_anak_12-59_bulan_mendapat_Vitamin_A", "Jumlah_anak_12-59_bulan"),
+        "Metrik Balita yang Mendapatkan Suplementasi Gizi Mikro (%)": ("Jumlah_balita_yang_mendapatkan_suplementasi_gizi_mikro", "Jumlah_balita_Underweight_suplemen"),
+        "Balita ditimbang (Proyeksi)": ("Jumlah_balita_ditimbang", "Jumlah_sasaran_balita"),
+        "Balita ditimbang (Data Rill)": ("Jumlah_balita_ditimbang", "Jumlah_balita_bulan_ini"),
+        "Balita ditimbang & diukur": ("Jumlah_balita_ditimbang_dan_diukur", "Jumlah_balita_bulan_ini"),
+        "Balita diukur PB/TB": ("Jumlah_balita_diukur_PBTB", "Jumlah_balita_bulan_ini"),
+        "Balita memiliki Buku KIA": ("Jumlah_balita_punya_KIA", "Jumlah_balita_bulan_ini"),
+        "Balita Naik BB": ("Jumlah_balita_naik_berat_badannya_N", "Jumlah_balita_bulan_ini"),
+        "Balita Naik dengan D Koreksi": ("Jumlah_balita_naik_berat_badannya_N", "Jumlah_balita_ditimbang_terkoreksi_Daksen"),
+        "Balita Tidak Naik BB": ("Jumlah_balita_tidak_naik_berat_badannya_T", "Jumlah_balita_bulan_ini"),
+        "Balita Tidak Timbang Bulan Lalu": ("Jumlah_balita_tidak_ditimbang_bulan_lalu_O", "Jumlah_balita_bulan_ini"),
+        "Prevalensi Stunting": ("Jumlah_balita_stunting", "Jumlah_balita_diukur_PBTB"),
+        "Prevalensi Wasting": ("Jumlah_balita_wasting", "Jumlah_balita_ditimbang_dan_diukur"),
+        "Prevalensi Underweight": ("Jumlah_balita_underweight", "Jumlah_balita_ditimbang"),
+        "Prevalensi Overweight": ("Jumlah_balita_overweight", "Jumlah_balita_ditimbang"),
+    },
+    "data_balita_kia": {
+        "Cakupan Bayi Lahir Prematur (%)": ("Jumlah_bayi_lahir_37_minggu", "Jumlah_bayi_baru_lahir_hidup"),
+        "Cakupan Bayi BBLR (%)": ("Jumlah_bayi_BBLR", "Jumlah_bayi_baru_lahir_hidup"),
+        "Cakupan Bayi Prematur & BBLR Mendapat Buku KIA (%)": ("Jumlah_bayi_prematur_dan_BBLR_yang_mendapat_buku_KIA_bayi_kecil", "Jumlah_bayi_BBLR"),
+        "Cakupan Bayi BBLR Mendapat Tatalaksana (%)": ("Jumlah_bayi_baru_lahir_dengan_BBLR_mendapat_tata_laksana", "Jumlah_bayi_BBLR"),
+        "Cakupan Bayi PBLR (%)": ("Jumlah_Bayi_PBLR", "Jumlah_bayi_baru_lahir_hidup"),
+        "Cakupan Bayi LIKA Rendah (%)": ("Jumlah_Bayi_LIKA_Rendah", "Jumlah_bayi_baru_lahir_hidup"),
+        "Metrik Balita dengan perkembangan normal (%)": ("Jumlah_balita_dengan_perkembangan_normal", "Jumlah_balita_diskrining_perkembangan"),
+        "Metrik Balita dengan perkembangan meragukan (%)": ("Jumlah_balita_dengan_perkembangan_meragukan", "Jumlah_balita_diskrining_perkembangan"),
+        "Metrik Balita dengan kemungkinan penyimpangan (%)": ("Jumlah_balita_dengan_kemungkinan_penyimpangan", "Jumlah_balita_diskrining_perkembangan"),
+        "Metrik Anak prasekolah ditimbang (%)": ("Jumlah_anak_prasekolah_ditimbang", "Jumlah_anak_prasekolah_bulan_ini"),
+        "Metrik Anak prasekolah punya buku KIA (%)": ("Jumlah_anak_prasekolah_punya_Buku_KIA", "Jumlah_anak_prasekolah_bulan_ini"),
+        "Metrik Anak prasekolah dengan perkembangan normal (%)": ("Jumlah_anak_prasekolah_dengan_perkembangan_normal", "Jumlah_anak_prasekolah_diskrining_perkembangan"),
+        "Metrik Anak prasekolah dengan perkembangan meragukan (%)": ("Jumlah_anak_prasekolah_dengan_perkembangan_meragukan", "Jumlah_anak_prasekolah_diskrining_perkembangan"),
+        "Metrik Anak prasekolah dengan kemungkinan penyimpangan (%)": ("Jumlah_anak_prasekolah_dengan_kemungkinan_penyimpangan", "Jumlah_anak_prasekolah_diskrining_perkembangan"),
+        "Metrik Balita dipantau pertumbuhan dan perkembangan (%)": ("Jumlah_balita_pantau_tumbang", "Jumlah_balita_usia_12-59_bulan_sampai_bulan_ini"),
+        "Metrik balita yang terdeteksi ada gangguan atau penyimpangan perkembangan yang mendapat intervensi (%)": ("Jumlah_balita_yang_terdeteksi_gangguan_tumbang_mendapat_intervensi", "Jumlah_balita_terdeteksi_gangguan_tumbang"),
+        "Metrik balita mendapat pelayanan SDIDTK di Fasyankes (%)": ("Jumlah_balita_mendapat_pelayanan_SDIDTK_di_FKTP", "Jumlah_sasaran_balita"),
+        "Metrik Balita yang Buku KIA nya terisi lengkap bagian pemantauan perkembangan (%)": ("Jumlah_balita_Buku_KIA_terisi_lengkap_bagian_pemantauan_perkembangan", "Jumlah_balita_punya_KIA"),
+        "Metrik balita yang ibu/orangtua/wali/keluarga/pengasuh telah mengikuti minimal 4 (empat) kali kelas ibu balita (%)": ("Jumlah_balita_ortu_mengikuti_minimal_4_kali_kelas_ibu_balita", "Jumlah_sasaran_balita"),
+        "Metrik Apras yang terdeteksi ada gangguan atau penyimpangan perkembangan yang mendapat intervensi (%)": ("Jumlah_Apras_yang_terdeteksi_gangguan_tumbang_mendapat_intervensi", "Jumlah_Apras_terdeteksi_gangguan_tumbang"),
+        "Metrik Apras mendapat pelayanan SDIDTK di Fasyankes (%)": ("Jumlah_Apras_mendapat_pelayanan_SDIDTK_di_FKTP", "Jumlah_apras"),
+        "Metrik Apras yang Buku KIA nya terisi lengkap bagian pemantauan perkembangan (%)": ("Jumlah_Apras_Buku_KIA_terisi_lengkap_bagian_pemantauan_perkembangan", "Jumlah_anak_prasekolah_punya_Buku_KIA"),
+        "Metrik Apras yang ibu/orangtua/wali/keluarga/pengasuh telah mengikuti minimal 4 (empat) kali kelas ibu balita (%)": ("Jumlah_Apras_ortu_mengikuti_minimal_4_kali_kelas_ibu_balita", "Jumlah_apras"),
+    },
+    "data_ibuhamil": {
+        "Metrik Prevalensi Ibu Hamil Anemia Ringan (%)": ("Anemia_ringan", "Jumlah_ibu_hamil_periksa_Hb"),
+        "Metrik Prevalensi Ibu Hamil Anemia Sedang (%)": ("Anemia_sedang", "Jumlah_ibu_hamil_periksa_Hb"),
+        "Metrik Prevalensi Ibu Hamil Anemia Berat (%)": ("Anemia_berat", "Jumlah_ibu_hamil_periksa_Hb"),
+        "Metrik Prevalensi Ibu Hamil Anemia (%)": ("Jumlah_ibu_hamil_anemia", "Jumlah_ibu_hamil_periksa_Hb"),
+        "Metrik Ibu Hamil Anemia Ringan yang Mendapat TTD Oral (%)": ("Jumlah_ibu_hamil_anemia_yang_mendapat_TTD_oral", "Anemia_ringan"),
+        "Metrik Ibu Hamil Mendapat Minimal 180 Tablet MMS (%)": ("Jumlah_ibu_hamil_mendapat_minimal_180_tablet_MMS", "Jumlah_Sasaran_Ibu_Hamil"),
+        "Metrik Ibu Hamil Mendapat Minimal 180 Tablet TTD (%)": ("Jumlah_ibu_hamil_mendapat_minimal_180_tablet_TTD", "Jumlah_Sasaran_Ibu_Hamil"),
+        "Metrik Ibu Hamil Mengonsumsi Minimal 180 Tablet MMS (%)": ("Jumlah_ibu_hamil_mengonsumsi_minimal_180_tablet_MMS", "Jumlah_Sasaran_Ibu_Hamil"),
+        "Metrik Ibu Hamil Mengonsumsi Minimal 180 Tablet TTD (%)": ("Jumlah_ibu_hamil_mengonsumsi_minimal_180_tablet_TTD", "Jumlah_Sasaran_Ibu_Hamil"),
+        "Metrik Prevalensi Ibu Hamil Risiko KEK/KEK (%)": ("Jumlah_ibu_hamil_risiko_KEK", "Jumlah_ibu_hamil_diukur_LILA_IMT"),
+        "Metrik Ibu Hamil KEK Mendapat Tambahan Asupan Gizi (%)": ("Jumlah_ibu_hamil_KEK_mendapat_tambahan_asupan_gizi", "Jumlah_ibu_hamil_risiko_KEK"),
+        "Metrik Ibu Hamil KEK Mengonsumsi Tambahan Asupan Gizi (%)": ("Jumlah_ibu_hamil_KEK_mengonsumsi_tambahan_asupan_gizi", "Jumlah_ibu_hamil_risiko_KEK"),
+    },
+}
+
+PERIODE_BULAN = {
+    "Tribulan I": [1, 2, 3], "Tribulan II": [4, 5, 6], "Tribulan III": [7, 8, 9], "Tribulan IV": [10, 11, 12],
+    "Triwulan 1": [1, 2, 3], "Triwulan 2": [4, 5, 6], "Triwulan 3": [7, 8, 9], "Triwulan 4": [10, 11, 12],
+}
+
+# Skor per (dataset, versi data, filter, metrik) → ganti metode tidak menghitung ulang
+_score_cache = data_access._DataFrameCache(max_entries=64, max_bytes=64 * 1024 * 1024)
+
+
+def clear_cache():
+    _score_cache.clear()
+
+
+def cache_key(scope, tables, *filters, db_path=data_access.RCS_DB_PATH):
+    """Kunci cache dari nama fungsi, versi tabel sumber, dan nilai filter; None bila versi belum tercatat."""
+    versions = tuple(data_access.data_version(table, db_path) for table in tables)
+    if None in versions:
+        return None
+    return (scope, db_path, versions, tuple(repr(value) for value in filters))
+
+
+# ----------------------------- #
+# 🧮 Statistik (2-D, semua metrik sekaligus)
+# ----------------------------- #
+def _bounds(values, groups=None):
+    """Z-Score serta batas bawah/atas IQR untuk setiap sel matriks baris × metrik.
+
+    Tanpa `groups` statistik dihitung per kolom (seperti stats.zscore & quantile
+    per metrik); dengan `groups` dihitung per grup memakai groupby.transform.
+    """
+    with warnings.catch_warnings(), np.errstate(divide="ignore", invalid="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        if groups is None:
+            mean = np.nanmean(values, axis=0)
+            std = np.nanstd(values, axis=0)
+            q1, q3 = np.nanquantile(values, [0.25, 0.75], axis=0)
+        else:
+            grouped = pd.DataFrame(values).groupby(groups)
+            mean = grouped.transform("mean").to_numpy()
+            std = grouped.transform("std", ddof=0).to_numpy()
+            q1 = grouped.transform("quantile", 0.25).to_numpy()
+            q3 = grouped.transform("quantile", 0.75).to_numpy()
+        z_scores = (values - mean) / std
+    iqr = q3 - q1
+    return z_scores, q1 - IQR_FACTOR * iqr, q3 + IQR_FACTOR * iqr
+
+
+def outlier_scores(df, metrics, key_columns, group_by=None):
+    """Flag Z-Score & IQR untuk semua metrik → DataFrame panjang (kunci, Metrik, Nilai, Z-Score, IQR).
+
+    Baris tanpa nilai metrik atau tanpa kolom kunci diabaikan per metrik
+    (setara `dropna()` per metrik); urutan hasil per metrik lalu per baris.
+    """
+    metrics = [m for m in dict.fromkeys(metrics) if m in df.columns]
+    values = df[metrics].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    valid = ~np.isnan(values) & df[key_columns].notna().all(axis=1).to_numpy()[:, None]
+    values = np.where(valid, values, np.nan)
+
+    z_scores, lower, upper = _bounds(values, df[group_by].to_numpy() if group_by else None)
+    with np.errstate(invalid="ignore"):
+        flags = {
+            "Z-Score": np.abs(z_scores) > Z_THRESHOLD,
+            "IQR": (values < lower) | (values > upper),
+        }
+
+    metric_idx, row_idx = np.nonzero(valid.T)
+    result = df[key_columns].iloc[row_idx].reset_index(drop=True)
+    result["Metrik"] = np.asarray(metrics, dtype=object)[metric_idx]
+    result["Nilai"] = values[row_idx, metric_idx]
+    for method, flag in flags.items():
+        result[method] = flag[row_idx, metric_idx]
+    return result
+
+
+def statistical_outliers(df, metrics, method, puskesmas_filter, cache_key=None, group_by=None, include_metric=True,
+                         table_name=None, flag_filters=None):
+    """Tabel outlier statistik (Puskesmas[, Kelurahan], Metrik, Nilai, Metode) untuk metode terpilih.
+
+    Skor Z-Score & IQR dihitung sekali dan di-cache per `cache_key`, sehingga
+    mengganti pilihan metode hanya memfilter hasil yang sudah ada. Metode
+    robust membaca flag tersimpan `table_name` (kelurahan × bulan) sesuai
+    `flag_filters`.
+    """
+    if method in ROBUST_METHODS:
+        return robust_outliers(table_name, metrics, method, flag_filters, include_metric)
+    key_columns = ["Puskesmas"] if puskesmas_filter == "All" else ["Puskesmas", "Kelurahan"]
+    columns = key_columns + (["Metrik"] if include_metric else []) + ["Nilai", "Metode"]
+    if method not in OUTLIER_METHODS[1:]:
+        return pd.DataFrame(columns=columns)
+
+    key = None
+    if cache_key is not None:
+        # Hash isi kolom yang dipakai: frame berbentuk sama dari filter lain (mis. tahun) tidak berbagi hasil
+        used = [c for c in dict.fromkeys(key_columns + list(metrics) + ([group_by] if group_by else [])) if c in df.columns]
+        content = int(pd.util.hash_pandas_object(df[used], index=False).sum())
+        key = cache_key + (tuple(metrics), tuple(key_columns), group_by, len(df), content)
+    scores = _score_cache.get(key) if key is not None else None
+    if scores is None:
+        scores = outlier_scores(df, metrics, key_columns, group_by)
+        if key is not None:
+            _score_cache.put(key, scores)
+
+    outliers = scores[scores[method]].reset_index(drop=True)
+    outliers["Metode"] = method
+    return outliers[columns]
+
+
+# ----------------------------- #
+# 🛡️ Metode Robust (batch saat upload)
+# ----------------------------- #
+def flags_table_name(table_name):
+    return f"{table_name}__outlier"
+
+
+def _robust_z(x, sample, axis):
+    """(x - median) / (1.4826 × MAD) terhadap `sample`; MAD = 0 → mean absolute deviation.
+
+    NaN bila sampel berisi kurang dari MIN_OBSERVATIONS nilai.
+    """
+    with warnings.catch_warnings(), np.errstate(divide="ignore", invalid="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median = np.nanmedian(sample, axis=axis, keepdims=True)
+        deviation = np.abs(sample - median)
+        mad = MAD_SCALE * np.nanmedian(deviation, axis=axis, keepdims=True)
+        mean_ad = MEAN_AD_SCALE * np.nanmean(deviation, axis=axis, keepdims=True)
+        scale = np.where(mad > 0, mad, mean_ad)
+        enough = np.sum(~np.isnan(sample), axis=axis, keepdims=True) >= MIN_OBSERVATIONS
+        return np.where(enough, (x - median) / scale, np.nan)
+
+
+def robust_scores(cube):
+    """Skor robust untuk kubus wilayah × bulan × indikator (NaN = tidak ada data).
+
+    - MAD: antar kelurahan pada bulan & indikator yang sama.
+    - Hampel: terhadap jendela ±HAMPEL_HALF_WINDOW bulan pada seri kelurahan itu sendiri.
+    - Residual Bulanan: perubahan dari bulan sebelumnya dibanding perubahan kelurahan lain di bulan yang sama.
+    """
+    h = HAMPEL_HALF_WINDOW
+    padded = np.pad(cube, ((0, 0), (h, h), (0, 0)), constant_values=np.nan)
+    windows = sliding_window_view(padded, 2 * h + 1, axis=1)
+    change = np.full(cube.shape, np.nan)
+    change[:, 1:, :] = cube[:, 1:, :] - cube[:, :-1, :]
+    return {
+        "MAD": _robust_z(cube, cube, axis=0),
+        "Hampel": _robust_z(cube[..., None], windows, axis=-1)[..., 0],
+        "Residual Bulanan": _robust_z(change, change, axis=0),
+    }
+
+
+def robust_flags(df, indicators):
+    """Flag robust semua indikator dari rollup kelurahan × bulan → DataFrame panjang (hanya sel ter-flag)."""
+    indicators = {name: cols for name, cols in indicators.items() if set(cols).issubset(df.columns)}
+    df = df.dropna(subset=["Tahun", "Bulan"] + REGION_COLUMNS)
+    columns = ["Tahun", "Bulan"] + REGION_COLUMNS + ["Metrik", "Nilai"] + [f"Skor {m}" for m in ROBUST_METHODS] + ROBUST_METHODS
+    if df.empty or not indicators:
+        return pd.DataFrame(columns=columns)
+
+    region, regions = pd.factorize(pd.MultiIndex.from_frame(df[REGION_COLUMNS]))
+    month = df["Tahun"].astype(int).to_numpy() * 12 + df["Bulan"].astype(int).to_numpy() - 1
+    first = month.min()
+    numerator = df[[num for num, _ in indicators.values()]].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    denominator = df[[den for _, den in indicators.values()]].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(denominator > 0, numerator / denominator * 100, np.nan)
+
+    # Kubus wilayah × bulan kalender × indikator (bulan tanpa laporan = NaN)
+    cube = np.full((len(regions), month.max() - first + 1, len(indicators)), np.nan)
+    cube[region, month - first] = ratio
+    scores = robust_scores(cube)
+    with np.errstate(invalid="ignore"):
+        flags = {
+            "MAD": np.abs(scores["MAD"]) > ROBUST_THRESHOLD,
+            "Hampel": np.abs(scores["Hampel"]) > HAMPEL_THRESHOLD,
+            "Residual Bulanan": np.abs(scores["Residual Bulanan"]) > ROBUST_THRESHOLD,
+        }
+    flagged = ~np.isnan(cube) & (flags["MAD"] | flags["Hampel"] | flags["Residual Bulanan"])
+
+    r, t, k = np.nonzero(flagged)
+    result = pd.DataFrame({
+        "Tahun": (t + first) // 12,
+        "Bulan": (t + first) % 12 + 1,
+        "Puskesmas": regions.get_level_values(0)[r],
+        "Kelurahan": regions.get_level_values(1)[r],
+        "Metrik": np.asarray(list(indicators), dtype=object)[k],
+        "Nilai": cube[r, t, k],
+    })
+    for method in ROBUST_METHODS:
+        result[f"Skor {method}"] = scores[method][r, t, k]
+    for method in ROBUST_METHODS:
+        result[method] = flags[method][r, t, k].astype(int)
+    return result[columns]
+
+
+def build_outlier_flags(conn, table_name):
+    """Hitung & simpan flag robust dataset dari rollup kelurahan × bulan (dipanggil saat upload).
+
+    Dijalankan di transaksi upload yang sama dengan rollup; dataset tanpa
+    definisi indikator atau tanpa rollup dilewati.
+    """
+    target = flags_table_name(table_name)
+    source = rollup.rollup_table_name(table_name, "kelurahan", "bulan")
+    conn.execute(f'DROP TABLE IF EXISTS "{target}"')
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (source,)).fetchone()
+    if table_name not in INDICATORS or not exists:
+        return None
+    flags = robust_flags(pd.read_sql_query(f'SELECT * FROM "{source}"', conn), INDICATORS[table_name])
+    flags.to_sql(target, conn, index=False)
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{target}" ON "{target}" ("Tahun", "Bulan", "Puskesmas", "Kelurahan")')
+    data_access.record_data_version(conn, target)
+    return target
+
+
+def flag_filters(puskesmas_filter, kelurahan_filter, tahun=None, periode=None):
+    """Filter tabel flag dari pilihan dashboard; `periode` = bulan, daftar bulan, atau nama tribulan/triwulan."""
+    bulan = PERIODE_BULAN.get(periode, periode) if isinstance(periode, str) else periode
+    try:
+        return rollup.rollup_filters(tahun, bulan, puskesmas_filter, kelurahan_filter)
+    except (TypeError, ValueError):
+        return rollup.rollup_filters(None, None, puskesmas_filter, kelurahan_filter)
+
+
+def robust_outliers(table_name, metrics, method, filters=None, include_metric=True):
+    """Baris kelurahan × bulan yang di-flag `method` untuk `metrics` (dibaca dari tabel flag)."""
+    columns = ["Tahun", "Bulan"] + REGION_COLUMNS + (["Metrik"] if include_metric else []) + ["Nilai", "Metode"]
+    target = flags_table_name(table_name) if table_name else None
+    if target is None or not data_access.table_exists(target):
+        return pd.DataFrame(columns=columns)
+    flags = data_access.load_filtered(target, filters=filters)
+    outliers = flags[flags["Metrik"].isin(metrics) & flags[method].astype(bool)].reset_index(drop=True)
+    outliers["Metode"] = method
+    return outliers[columns]
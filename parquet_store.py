@@ -0,0 +1,165 @@
+import os
+import shutil
+import uuid
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow opsional; tanpa pyarrow semua baca kembali ke SQLite
+    pa = None
+
+SNAPSHOT_ROOT = "parquet_cache"
+EXPORT_CHUNK_SIZE = 50000
+
+# Kolom partisi per tabel (hanya yang ada di tabel yang dipakai)
+AGGREGATE_PARTITION_COLUMNS = ["Tahun", "Bulan"]
+PARTITION_COLUMNS = {
+    "data_eppgbm": ["periode"],
+}
+# Tabel individual: kolom teks disimpan sebagai Arrow string (hemat memori vs object)
+ARROW_STRING_TABLES = {"data_eppgbm"}
+
+
+def is_available():
+    return pa is not None
+
+
+def snapshot_path(table_name):
+    return os.path.join(SNAPSHOT_ROOT, table_name)
+
+
+def _arrow_type(declared):
+    declared = (declared or "").upper()
+    if "INT" in declared:
+        return pa.int64()
+    if "REAL" in declared or "FLOA" in declared or "DOUB" in declared:
+        return pa.float64()
+    return pa.string()
+
+
+def _table_schema(conn, table_name):
+    fields = [(row[1], _arrow_type(row[2])) for row in conn.execute(f'PRAGMA table_info("{table_name}")')]
+    return pa.schema(fields)
+
+
+def _partition_fields(table_name, schema):
+    wanted = PARTITION_COLUMNS.get(table_name, AGGREGATE_PARTITION_COLUMNS)
+    return [schema.field(name) for name in wanted if name in schema.names]
+
+
+def _to_arrow_chunk(chunk, schema):
+    for field in schema:
+        if pa.types.is_string(field.type):
+            # SQLite bisa menyimpan angka di kolom TEXT; samakan jadi teks
+            col = chunk[field.name]
+            chunk[field.name] = col.where(col.isna(), col.astype(str))
+    return pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+
+
+# ----------------------------- #
+# 💾 Tulis Snapshot
+# ----------------------------- #
+def write_snapshot(conn, table_name):
+    """Ekspor tabel SQLite ke Parquet (zstd, partisi Tahun/Bulan atau periode).
+
+    Ekspor dilakukan per chunk agar memori tetap kecil, ditulis ke folder
+    sementara lalu ditukar sehingga pembaca tidak melihat snapshot setengah jadi.
+    """
+    if pa is None:
+        return False
+    schema = _table_schema(conn, table_name)
+    if not len(schema):
+        remove_snapshot(table_name)
+        return False
+    partition_cols = [f.name for f in _partition_fields(table_name, schema)]
+    target = snapshot_path(table_name)
+    tmp_dir = f"{target}.tmp-{uuid.uuid4().hex}"
+    os.makedirs(tmp_dir)
+    try:
+        chunks = pd.read_sql_query(f'SELECT * FROM "{table_name}"', conn, chunksize=EXPORT_CHUNK_SIZE)
+        for i, chunk in enumerate(chunks):
+            pq.write_to_dataset(
+                _to_arrow_chunk(chunk, schema),
+                root_path=tmp_dir,
+                partition_cols=partition_cols or None,
+                basename_template=f"part-{i}-{{i}}.parquet",
+                compression="zstd",
+                existing_data_behavior="overwrite_or_ignore",
+            )
+        # Simpan skema lengkap (urutan kolom & tipe partisi) untuk dibaca ulang
+        pq.write_metadata(schema, os.path.join(tmp_dir, "_common_metadata"))
+        _swap_dir(tmp_dir, target)
+        return True
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        remove_snapshot(table_name)
+        raise
+
+
+def _swap_dir(tmp_dir, target):
+    old_dir = None
+    if os.path.exists(target):
+        old_dir = f"{target}.old-{uuid.uuid4().hex}"
+        os.rename(target, old_dir)
+    os.rename(tmp_dir, target)
+    if old_dir:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def remove_snapshot(table_name):
+    """Hapus snapshot agar pembaca kembali ke SQLite (mis. bila ekspor gagal)."""
+    shutil.rmtree(snapshot_path(table_name), ignore_errors=True)
+
+
+# ----------------------------- #
+# 📤 Baca Snapshot
+# ----------------------------- #
+def _filter_expression(filters, schema):
+    expr = None
+    for col, value in (filters or {}).items():
+        if isinstance(value, (list, tuple, set)):
+            values = [v for v in value if v not in {"All", "ALL", None, ""}]
+            cond = ds.field(col).isin(values) if values else ds.scalar(False)
+        elif value in {"All", "ALL", None, ""}:
+            continue
+        else:
+            cond = ds.field(col) == value
+        expr = cond if expr is None else expr & cond
+    return expr
+
+
+def snapshot_columns(table_name):
+    """Nama kolom snapshot (dari _common_metadata), atau [] bila tidak ada."""
+    if pa is None:
+        return []
+    try:
+        return pq.read_schema(os.path.join(snapshot_path(table_name), "_common_metadata")).names
+    except Exception:
+        return []
+
+
+def read_snapshot(table_name, columns=None, filters=None):
+    """Baca snapshot Parquet dengan proyeksi kolom & partition pruning.
+
+    Mengembalikan None bila snapshot tidak ada/tidak bisa dibaca sehingga
+    pemanggil kembali ke SQLite.
+    """
+    path = snapshot_path(table_name)
+    if pa is None or not os.path.isdir(path):
+        return None
+    try:
+        schema = pq.read_schema(os.path.join(path, "_common_metadata"))
+        partitioning = ds.partitioning(pa.schema(_partition_fields(table_name, schema)), flavor="hive")
+        dataset = ds.dataset(path, format="parquet", partitioning=partitioning, schema=schema)
+        table = dataset.to_table(
+            columns=list(columns) if columns else schema.names,
+            filter=_filter_expression(filters, schema),
+        )
+        if table_name in ARROW_STRING_TABLES:
+            return table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+        return table.to_pandas()
+    except Exception:
+        return None
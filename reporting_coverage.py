@@ -0,0 +1,258 @@
+import pandas as pd
+
+import data_access
+
+REGION_COLUMNS = ["Puskesmas", "Kelurahan"]
+# Grain cube kelengkapan yang disimpan saat upload (Tahun opsional)
+CUBE_KEYS = ["Tahun", "Bulan"] + REGION_COLUMNS
+ENTRY_COLUMN = "Jumlah_Entri"
+COMPLETE_COLUMN = "Entri_Lengkap"
+STATUS_LAPOR = "✅ Lapor"
+STATUS_TIDAK_LAPOR = "❌ Tidak Lapor"
+
+# Kolom kunci kelengkapan per dataset (sama dengan completeness_rate di dashboard)
+COMPLETENESS_COLUMNS = {
+    "data_balita_gizi": [
+        "Jumlah_sasaran_balita", "Jumlah_balita_bulan_ini", "Jumlah_balita_ditimbang",
+        "Jumlah_balita_ditimbang_dan_diukur", "Jumlah_balita_diukur_PBTB", "Jumlah_balita_punya_KIA",
+        "Jumlah_balita_naik_berat_badannya_N", "Jumlah_balita_tidak_naik_berat_badannya_T",
+        "Jumlah_balita_tidak_ditimbang_bulan_lalu_O", "Jumlah_bayi_baru_lahir_bulan_ini_B",
+        "Jumlah_balita_ditimbang_terkoreksi_Daksen", "Jumlah_balita_stunting", "Jumlah_balita_wasting",
+        "Jumlah_balita_overweight", "Jumlah_balita_underweight", "Jumlah_Bayi_Mendapat_IMD",
+        "Jumlah_Bayi_usia_0-5_bulan", "Jumlah_Bayi_usia_0-5_bulan_yang_direcall",
+        "Jumlah_Bayi_usia_0-5_bulan_yang_mendapat_ASI_Eksklusif_berdasarkan_recall_24_jam",
+    ],
+    "data_balita_kia": [
+        "Jumlah_bayi_baru_lahir_hidup", "Jumlah_bayi_BBLR",
+        "Jumlah_bayi_prematur_dan_BBLR_yang_mendapat_buku_KIA_bayi_kecil",
+        "Jumlah_anak_prasekolah_bulan_ini", "Jumlah_anak_prasekolah_punya_Buku_KIA",
+        "Jumlah_balita_diskrining_perkembangan", "Jumlah_balita_usia_12-59_bulan_sampai_bulan_ini",
+        "Jumlah_balita_pantau_tumbang", "Jumlah_balita_mendapat_pelayanan_SDIDTK_di_FKTP",
+        "Cakupan_bayi_dilayani_PKAT",
+    ],
+    "data_ibuhamil": [
+        "Jumlah_ibu_hamil_periksa_Hb", "Anemia_ringan", "Anemia_sedang", "Anemia_berat",
+        "Jumlah_ibu_hamil_anemia", "Jumlah_ibu_hamil_anemia_yang_mendapat_TTD_oral",
+        "Jumlah_ibu_hamil_anemia_sedang_dan_berat_yang_mendapatkan_tata_laksana_di_tingkat_lanjutan",
+        "Jumlah_Sasaran_Ibu_Hamil", "Jumlah_ibu_hamil_mendapat_minimal_180_tablet_MMS",
+        "Jumlah_ibu_hamil_mendapat_minimal_180_tablet_TTD", "Jumlah_ibu_hamil_mengonsumsi_minimal_180_tablet_MMS",
+        "Jumlah_ibu_hamil_mengonsumsi_minimal_180_tablet_TTD", "Jumlah_ibu_hamil_diukur_LILA_IMT",
+        "Jumlah_ibu_hamil_risiko_KEK", "Jumlah_ibu_hamil_KEK_mendapat_tambahan_asupan_gizi",
+        "Jumlah_ibu_hamil_KEK_mengonsumsi_tambahan_asupan_gizi",
+    ],
+    "data_remaja": [
+        "Jumlah_sasaran_remaja_putri",
+        "Jumlah_remaja_putri_di_satuan_pendidikan_mendapat_TTD_sesuai_standar",
+        "Jumlah_remaja_putri_di_satuan_pendidikan_mengonsumsi_TTD_sesuai_standar",
+        "Jumlah_remaja_putri_di_satuan_pendidikan_mendapat_TTD_krg26",
+        "Jumlah_remaja_putri_di_satuan_pendidikan_mendapat_TTD_lbh26",
+        "Jumlah_remaja_putri_di_satuan_pendidikan_mengonsumsi_TTD_krg26",
+        "Jumlah_remaja_putri_di_satuan_pendidikan_mengonsumsi_TTD_lbh26",
+        "Jumlah_remaja_putri_kelas_7_di_satuan_pendidikan",
+        "Jumlah_remaja_putri_kelas_7_di_satuan_pendidikan_skrining_anemia",
+        "Jumlah_remaja_putri_kelas_10_di_satuan_pendidikan",
+        "Jumlah_remaja_putri_kelas_10_di_satuan_pendidikan_skrining_anemia",
+        "Jumlah_remaja_putri_kelas_7_dan_10_di_satuan_pendidikan",
+        "Jumlah_remaja_putri_kelas_7_dan_10_di_satuan_pendidikan_skrining_anemia",
+        "Jumlah_Rematri_kelas_7_Anemia_Ringan", "Jumlah_Rematri_kelas_7_Anemia_Sedang",
+        "Jumlah_Rematri_kelas_7_Anemia_Berat", "Jumlah_Anemia_Rematri_Kelas_7",
+        "Jumlah_Rematri_kelas_10_Anemia_Ringan", "Jumlah_Rematri_kelas_10_Anemia_Sedang",
+        "Jumlah_Rematri_kelas_10_Anemia_Berat", "Jumlah_Anemia_Rematri_Kelas_10",
+        "Jumlah_remaja_putri_kelas_7_10_teridentifikasi_anemia",
+        "Jumlah_Rematri_kelas_7_dan_10_mendapatkan_tatalaksana_anemia",
+    ],
+}
+
+
+# ----------------------------- #
+# 🗂️ Dimensi Puskesmas → Kelurahan
+# ----------------------------- #
+def desa_dimension(desa_df):
+    """Pasangan unik (Bulan,) Puskesmas → Kelurahan dari dataset desa (referensi desa yang wajib lapor)."""
+    columns = [c for c in ["Bulan"] + REGION_COLUMNS if c in desa_df.columns]
+    return desa_df[columns].dropna(subset=REGION_COLUMNS).drop_duplicates()
+
+
+# ----------------------------- #
+# ✅ Compliance Rate
+# ----------------------------- #
+def compliance_table(reported_df, desa_df, by=("Puskesmas",)):
+    """Jumlah desa, jumlah desa lapor, dan compliance rate per `by` dalam satu groupby.
+
+    Desa yang diharapkan dihitung dari dimensi desa; bila dimensi tidak punya
+    kolom `Bulan`, jumlah per Puskesmas dipakai untuk setiap bulan. Semua
+    Puskesmas di dataset desa muncul (0 desa lapor bila tidak ada laporan).
+    """
+    by = list(by)
+    dimension = desa_dimension(desa_df)
+    expected_by = [c for c in by if c in dimension.columns]
+    # Level diambil sebelum baris tanpa Kelurahan dibuang agar Puskesmas tanpa desa tetap tampil
+    levels = [sorted((desa_df if c in expected_by else reported_df)[c].dropna().unique()) for c in by]
+    table = pd.MultiIndex.from_product(levels, names=by).to_frame(index=False)
+    expected = dimension.groupby(expected_by)["Kelurahan"].nunique().rename("Jumlah Desa")
+    reported = reported_df.groupby(by)["Kelurahan"].nunique().rename("Jumlah Desa Lapor")
+    table = table.join(expected, on=expected_by).join(reported, on=by)
+    table[["Jumlah Desa", "Jumlah Desa Lapor"]] = table[["Jumlah Desa", "Jumlah Desa Lapor"]].fillna(0).astype(int)
+    rate = (table["Jumlah Desa Lapor"] / table["Jumlah Desa"].where(table["Jumlah Desa"] > 0) * 100).fillna(0)
+    table["Compliance Rate (%)"] = rate.map("{:.2f}%".format)
+    return table
+
+
+def kelurahan_status(desa_df, puskesmas, reported_kelurahan):
+    """Status lapor tiap kelurahan di satu Puskesmas (urutan sesuai dataset desa)."""
+    dimension = desa_dimension(desa_df)
+    kelurahan = dimension.loc[dimension["Puskesmas"] == puskesmas, "Kelurahan"].drop_duplicates()
+    lapor = kelurahan.isin(reported_kelurahan)
+    return pd.DataFrame({
+        "Kelurahan": kelurahan.to_numpy(),
+        "Status Laporan": lapor.map({True: STATUS_LAPOR, False: STATUS_TIDAK_LAPOR}).to_numpy(),
+    })
+
+
+# ----------------------------- #
+# 📋 Cube Kelengkapan (Tahun × Bulan × Puskesmas × Kelurahan)
+# ----------------------------- #
+def coverage_table_name(table_name):
+    return f"{table_name}__coverage"
+
+
+def completeness_cube(df, columns, by=CUBE_KEYS):
+    """Jumlah entri, entri lengkap, dan jumlah nilai terisi per kolom untuk setiap grup `by`.
+
+    Satu matriks bit `notna()` dijumlahkan dengan satu groupby; `df` tidak diubah.
+    """
+    by = [c for c in by if c in df.columns]
+    bits = df[columns].notna()
+    bits.insert(0, COMPLETE_COLUMN, bits.all(axis=1))
+    bits.insert(0, ENTRY_COLUMN, True)
+    cube = bits.groupby([df[c] for c in by], dropna=False, sort=True).sum()
+    return cube.astype("int64").reset_index()
+
+
+def slice_cube(cube, puskesmas=None, kelurahan=None, bulan=None):
+    """Potong cube per Puskesmas/Kelurahan/Bulan ("All" dilewati; `bulan` boleh daftar bulan)."""
+    mask = pd.Series(True, index=cube.index)
+    if puskesmas not in data_access.ALL_VALUES:
+        mask &= cube["Puskesmas"] == puskesmas
+    if kelurahan not in data_access.ALL_VALUES:
+        mask &= cube["Kelurahan"] == kelurahan
+    if bulan is not None and "Bulan" in cube.columns:
+        mask &= cube["Bulan"].isin(bulan if isinstance(bulan, (list, tuple, set)) else [bulan])
+    return cube[mask]
+
+
+def completeness_value(cube):
+    """Completeness rate (%) gabungan seluruh baris cube (0 bila tidak ada entri)."""
+    total = cube[ENTRY_COLUMN].sum()
+    return (cube[COMPLETE_COLUMN].sum() / total * 100) if total else 0
+
+
+def completeness_table(cube, desa_df):
+    """Jumlah entri, entri lengkap, dan completeness rate untuk setiap Puskesmas di dataset desa."""
+    puskesmas = sorted(desa_df["Puskesmas"].dropna().unique())
+    totals = cube.groupby("Puskesmas")[[ENTRY_COLUMN, COMPLETE_COLUMN]].sum().reindex(puskesmas, fill_value=0)
+    rate = (totals[COMPLETE_COLUMN] / totals[ENTRY_COLUMN].where(totals[ENTRY_COLUMN] > 0) * 100).fillna(0)
+    return pd.DataFrame({
+        "Puskesmas": puskesmas,
+        "Jumlah Entri": totals[ENTRY_COLUMN].to_numpy(),
+        "Entri Lengkap": totals[COMPLETE_COLUMN].to_numpy(),
+        "Completeness Rate (%)": rate.map("{:.2f}%".format).to_numpy(),
+    })
+
+
+def column_completeness(cube, columns):
+    """Persentase nilai terisi per kolom kunci dari cube (NaN bila tidak ada entri)."""
+    total = cube[ENTRY_COLUMN].sum()
+    return cube[columns].sum() / total * 100 if total else pd.Series(float("nan"), index=columns)
+
+
+def build_coverage(conn, table_name):
+    """Hitung & simpan cube kelengkapan dataset dalam satu pass (dipanggil saat upload).
+
+    Dataset tanpa kolom Bulan, Puskesmas dan Kelurahan (mis. dataset desa) dilewati.
+    """
+    target = coverage_table_name(table_name)
+    conn.execute(f'DROP TABLE IF EXISTS "{target}"')
+    available = [row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')]
+    if not {"Bulan", *REGION_COLUMNS}.issubset(available):
+        return None
+    keys = [c for c in CUBE_KEYS if c in available]
+    columns = [c for c in COMPLETENESS_COLUMNS.get(table_name, []) if c in available]
+    select_sql = ", ".join(f'"{c}"' for c in keys + columns)
+    cube = completeness_cube(pd.read_sql_query(f'SELECT {select_sql} FROM "{table_name}"', conn), columns, keys)
+    cube.to_sql(target, conn, index=False)
+    index_cols = ", ".join(f'"{c}"' for c in keys)
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{target}" ON "{target}" ({index_cols})')
+    data_access.record_data_version(conn, target)
+    return target
+
+
+def coverage_filters(tahun="All", bulan="All", puskesmas="All", kelurahan="All"):
+    """Filter `load_coverage` dari pilihan sidebar; Tahun/Bulan ke int, `bulan` boleh daftar bulan."""
+    def as_int(value):
+        if isinstance(value, (list, tuple, set)):
+            return [int(v) for v in value]
+        if value in data_access.ALL_VALUES:
+            return "All"
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return "All"  # pilihan tidak valid: semua data, sama seperti filter dashboard
+    return {"Tahun": as_int(tahun), "Bulan": as_int(bulan), "Puskesmas": puskesmas, "Kelurahan": kelurahan}
+
+
+def load_coverage(table_name, filters=None, db_path=data_access.RCS_DB_PATH):
+    """Baca cube kelengkapan tersimpan; dihitung dari tabel mentah bila belum dibangun (data lama).
+
+    Filter untuk kolom yang tidak ada di tabel (mis. Tahun) dilewati.
+    """
+    target = coverage_table_name(table_name)
+    source = target if data_access.table_exists(target, db_path=db_path) else table_name
+    available = data_access.table_columns(source, db_path=db_path)
+    filters = {c: v for c, v in (filters or {}).items() if c in available} or None
+    if source == target:
+        return data_access.load_filtered(target, filters=filters, db_path=db_path)
+    df = data_access.load_filtered(table_name, filters=filters, db_path=db_path)
+    columns = [c for c in COMPLETENESS_COLUMNS.get(table_name, []) if c in df.columns]
+    return completeness_cube(df, columns)
+
+
+# ----------------------------- #
+# 🗓️ Matriks Cakupan Pelaporan × Bulan
+# ----------------------------- #
+def periode_labels(cube):
+    """Label periode 'Tahun-Bulan' (atau bulan saja bila tanpa Tahun) yang terurut kronologis."""
+    bulan = cube["Bulan"].astype("Int64").astype(str).str.zfill(2)
+    if "Tahun" in cube.columns:
+        return cube["Tahun"].astype("Int64").astype(str) + "-" + bulan
+    return bulan
+
+
+def reporting_matrix(cube, desa_df, puskesmas=None):
+    """Matriks cakupan pelaporan × periode dari cube kelengkapan.
+
+    Tanpa Puskesmas: compliance rate (%) per Puskesmas; dengan Puskesmas:
+    100/0 (lapor/tidak) per kelurahan di Puskesmas tersebut.
+    """
+    dimension = desa_dimension(desa_df)
+    periode = periode_labels(cube)
+    periodes = sorted(periode.dropna().unique())
+    reported = cube[cube[ENTRY_COLUMN] > 0].assign(Periode=periode)
+    if puskesmas in data_access.ALL_VALUES:
+        puskesmas_all = sorted(desa_df["Puskesmas"].dropna().unique())
+        expected = dimension.groupby("Puskesmas")["Kelurahan"].nunique().reindex(puskesmas_all, fill_value=0)
+        lapor = reported.groupby(["Puskesmas", "Periode"])["Kelurahan"].nunique().unstack()
+        lapor = lapor.reindex(index=expected.index, columns=periodes).fillna(0)
+        return lapor.div(expected.where(expected > 0), axis=0).fillna(0) * 100
+    kelurahan = dimension.loc[dimension["Puskesmas"] == puskesmas, "Kelurahan"].drop_duplicates()
+    reported = reported[reported["Puskesmas"] == puskesmas]
+    lapor = pd.crosstab(reported["Kelurahan"], reported["Periode"]) > 0
+    return lapor.reindex(index=sorted(kelurahan), columns=periodes, fill_value=False).astype(int) * 100
+
+
+def completeness_matrix(cube):
+    """Kelengkapan (%) per kolom kunci × periode, ditambah baris entri lengkap (semua kolom)."""
+    columns = [c for c in cube.columns if c not in CUBE_KEYS and c != ENTRY_COLUMN]
+    totals = cube.groupby(periode_labels(cube))[[ENTRY_COLUMN] + columns].sum()
+    percent = totals[columns].div(totals[ENTRY_COLUMN].where(totals[ENTRY_COLUMN] > 0), axis=0) * 100
+    return percent.T.rename(index={COMPLETE_COLUMN: "Entri Lengkap (semua kolom)"})
@@ -0,0 +1,160 @@
+import data_access
+
+# Grain wilayah → kolom pengelompokan (total kabupaten = jumlah baris grain puskesmas)
+ROLLUP_GRAINS = {
+    "kelurahan": ["Puskesmas", "Kelurahan"],
+    "puskesmas": ["Puskesmas"],
+}
+# Periode → kolom waktu di tabel rollup
+ROLLUP_PERIODS = {
+    "bulan": "Bulan",
+    "tribulan": "Tribulan",
+}
+# Rollup yang benar-benar dibaca: tabel → {grain: [periode]}; kombinasi lain tidak dibangun.
+# kelurahan × bulan adalah sumber flag outlier robust (outlier_detection.INDICATORS)
+ROLLUP_TABLES = {
+    # + rekap per Puskesmas (growth_development_metrics), filter bulan atau tribulan
+    "data_balita_gizi": {"kelurahan": ["bulan", "tribulan"], "puskesmas": ["bulan", "tribulan"]},
+    "data_balita_kia": {"kelurahan": ["bulan"]},
+    "data_ibuhamil": {"kelurahan": ["bulan"]},
+    # Cube overview EPPGBM di app.py
+    "data_bultim": {"puskesmas": ["bulan"]},
+    "data_bultim_kelurahan": {"kelurahan": ["bulan"]},
+}
+PERIOD_KEY_COLUMNS = ["Tahun", "Bulan"]
+
+
+def rollup_table_name(table_name, grain, period):
+    return f"{table_name}__{grain}_{period}"
+
+
+def bulan_to_tribulan(bulan):
+    return (int(bulan) - 1) // 3 + 1
+
+
+def _q(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _columns_by_name(conn, table_name):
+    """Peta lowercase → (nama asli, tipe deklarasi) dari PRAGMA table_info."""
+    return {
+        row[1].lower(): (row[1], (row[2] or "").upper())
+        for row in conn.execute(f"PRAGMA table_info({_q(table_name)})")
+    }
+
+
+# ----------------------------- #
+# 🧮 Bangun Rollup (dipanggil saat upload)
+# ----------------------------- #
+def _drop_stale_rollups(conn, table_name, keep):
+    """Hapus rollup lama `table_name` yang tidak dibangun ulang (mis. grain yang tidak lagi dibaca)."""
+    prefix = f"{table_name}__"
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+        if name.startswith(prefix) and name.rsplit("_", 1)[-1] in ROLLUP_PERIODS and name not in keep:
+            conn.execute(f"DROP TABLE {_q(name)}")
+
+
+def build_rollups(conn, table_name):
+    """Bangun tabel rollup (grain × periode sesuai ROLLUP_TABLES) di SQLite.
+
+    Semua kolom numerik dijumlahkan setelah baris duplikat dibuang (sama
+    dengan drop_duplicates() di load_data dashboard). Tabel tanpa kolom
+    Tahun, Bulan dan Puskesmas (mis. EPPGBM individual) atau yang rollup-nya
+    tidak dibaca dashboard dilewati. Dijalankan di transaksi upload yang sama
+    sehingga rollup selalu sinkron dengan data mentah.
+    """
+    wanted = ROLLUP_TABLES.get(table_name, {})
+    columns = _columns_by_name(conn, table_name)
+    if not wanted or not all(c.lower() in columns for c in PERIOD_KEY_COLUMNS + ["Puskesmas"]):
+        _drop_stale_rollups(conn, table_name, keep=[])
+        return []
+    tahun, bulan = columns["tahun"][0], columns["bulan"][0]
+    key_names = {c.lower() for c in PERIOD_KEY_COLUMNS + ROLLUP_GRAINS["kelurahan"]}
+    measures = [
+        name for lower, (name, declared) in columns.items()
+        if lower not in key_names and ("INT" in declared or "REAL" in declared or "FLOA" in declared or "DOUB" in declared)
+    ]
+    if not measures:
+        _drop_stale_rollups(conn, table_name, keep=[])
+        return []
+    sum_sql = ", ".join(f"SUM({_q(m)}) AS {_q(m)}" for m in measures)
+    period_sql = {
+        "bulan": f"CAST({_q(bulan)} AS INTEGER)",
+        "tribulan": f"(CAST({_q(bulan)} AS INTEGER) - 1) / 3 + 1",
+    }
+
+    created = []
+    for grain, periods in wanted.items():
+        grain_cols = ROLLUP_GRAINS[grain]
+        if not all(c.lower() in columns for c in grain_cols):
+            continue
+        region_cols = [columns[c.lower()][0] for c in grain_cols]
+        for period in periods:
+            period_col = ROLLUP_PERIODS[period]
+            target = rollup_table_name(table_name, grain, period)
+            select_cols = [f"{_q(tahun)} AS \"Tahun\"", f"{period_sql[period]} AS {_q(period_col)}"]
+            select_cols += [f"{_q(c)} AS {_q(g)}" for c, g in zip(region_cols, grain_cols)]
+            group_sql = ", ".join(["1", "2"] + [str(i + 3) for i in range(len(region_cols))])
+            conn.execute(f"DROP TABLE IF EXISTS {_q(target)}")
+            conn.execute(
+                f"CREATE TABLE {_q(target)} AS "
+                f"SELECT {', '.join(select_cols)}, {sum_sql} FROM (SELECT DISTINCT * FROM {_q(table_name)}) GROUP BY {group_sql}"
+            )
+            index_cols = ", ".join(_q(c) for c in ["Tahun", period_col] + grain_cols)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {_q('idx_' + target)} ON {_q(target)} ({index_cols})")
+            data_access.record_data_version(conn, target)
+            created.append(target)
+    _drop_stale_rollups(conn, table_name, keep=created)
+    return created
+
+
+# ----------------------------- #
+# 📥 Baca Rollup
+# ----------------------------- #
+def load_rollup(table_name, grain, period="bulan", filters=None, db_path=data_access.RCS_DB_PATH):
+    """Baca rollup pada grain yang dibutuhkan; None bila rollup belum dibangun."""
+    target = rollup_table_name(table_name, grain, period)
+    try:
+        if not data_access.table_exists(target, db_path=db_path):
+            return None
+        return data_access.load_filtered(target, filters=filters, db_path=db_path)
+    except Exception:
+        return None
+
+
+def rollup_filters(tahun=None, bulan=None, puskesmas=None, kelurahan=None, period="bulan"):
+    """Susun filter rollup dari pilihan dashboard ("All" dilewati)."""
+    filters = {}
+    if tahun not in data_access.ALL_VALUES:
+        filters["Tahun"] = int(tahun)
+    if bulan is not None and not (isinstance(bulan, str) and bulan in data_access.ALL_VALUES):
+        if isinstance(bulan, (list, tuple, set)):
+            values = sorted({bulan_to_tribulan(b) if period == "tribulan" else int(b) for b in bulan})
+        else:
+            values = [bulan_to_tribulan(bulan) if period == "tribulan" else int(bulan)]
+        filters[ROLLUP_PERIODS[period]] = values
+    if puskesmas not in data_access.ALL_VALUES:
+        filters["Puskesmas"] = puskesmas
+    if kelurahan not in data_access.ALL_VALUES:
+        filters["Kelurahan"] = kelurahan
+    return filters
+
+
+def summarize_by(table_name, by, columns, tahun=None, bulan=None, puskesmas=None, kelurahan=None,
+                 period="bulan", dropna=True, db_path=data_access.RCS_DB_PATH):
+    """Jumlah `columns` per `by` dari rollup terkecil yang cukup; None bila tidak tersedia.
+
+    `dropna=False` mempertahankan grup tanpa nama wilayah (sama dengan groupby data mentah).
+    """
+    grain = "kelurahan" if (kelurahan not in data_access.ALL_VALUES or "Kelurahan" in by) else "puskesmas"
+    try:
+        filters = rollup_filters(tahun, bulan, puskesmas, kelurahan, period)
+    except (TypeError, ValueError):
+        return None
+    df = load_rollup(table_name, grain, period, filters=filters, db_path=db_path)
+    if df is None or not set(columns).issubset(df.columns):
+        return None
+    if not by:
+        return df[columns].sum().to_frame().T
+    return df.groupby(by, dropna=dropna)[columns].sum().reset_index()
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+import eppgbm_derived
+
+# ----------------------------- #
+# 📐 Registry Skema per Tabel
+# ----------------------------- #
+# Tipe yang didukung: "string" (Arrow), "category", "float32", "Int16", "Int32",
+# "datetime", "bool" (kolom 0/1) dan pd.CategoricalDtype (kategori berurutan).
+# Kolom yang tidak terdaftar dibiarkan apa adanya.
+#
+# Tabel agregat (balita/ibu hamil/remaja/bultim) sengaja belum didaftarkan:
+# dashboard memilih kolom numerik dengan `dtype in ['int64', 'float64']` dan
+# banyak groupby wilayah tanpa observed=True, sehingga downcast/kategori di
+# sana akan mengubah hasil.
+TABLE_SCHEMAS = {
+    "data_eppgbm": {
+        "periode": "string",
+        "puskesmas": "string",
+        "kelurahan": "string",
+        "nik": "string",
+        # jk tetap string: value_counts/replace pada kategori mengubah output pie & pivot
+        "jk": "string",
+        "cara_ukur": "category",
+        "BBU": "category",
+        "TBU": "category",
+        "BBTB": "category",
+        "bb": "float32",
+        "tinggi": "float32",
+        "ZS_BBU": "float32",
+        "ZS_TBU": "float32",
+        "ZS_BBTB": "float32",
+        "Tgl_ukur": "datetime",
+        "Tgl_Lahir": "datetime",
+        # Kolom turunan (eppgbm_derived); urutan kelompok usia sama dengan pd.cut
+        "age_group": pd.CategoricalDtype(eppgbm_derived.AGE_LABELS, ordered=True),
+        "BBU_flag": "bool",
+        "TBU_flag": "bool",
+        "BBTB_flag": "bool",
+        "is_stunting": "bool",
+        "is_wasting": "bool",
+        "is_underweight": "bool",
+    },
+}
+
+NUMERIC_TYPES = {"float32", "Int16", "Int32"}
+
+
+def table_schema(table_name):
+    return TABLE_SCHEMAS.get(table_name, {})
+
+
+def _parse_datetime(s):
+    """Parse ke datetime64 hanya jika semua nilai terisi valid; selain itu None."""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    parsed = pd.to_datetime(s, errors="coerce")
+    return parsed if parsed.notna().sum() == s.notna().sum() else None
+
+
+def _parse_numeric(s):
+    parsed = pd.to_numeric(s, errors="coerce")
+    return parsed if parsed.notna().sum() == s.notna().sum() else None
+
+
+def _cast(s, dtype):
+    if isinstance(dtype, pd.CategoricalDtype):
+        # Nilai di luar kategori akan hilang (NaN) → biarkan tipe asli
+        if not s.dropna().isin(dtype.categories).all():
+            return None
+        return s.astype(dtype)
+    if dtype == "bool":
+        if s.dtype == bool:
+            return s
+        return s.astype(bool) if s.notna().all() and s.isin([0, 1]).all() else None
+    if dtype == "datetime":
+        return _parse_datetime(s)
+    if dtype in NUMERIC_TYPES:
+        num = _parse_numeric(s)
+        if num is None:
+            return None
+        if dtype.startswith("Int"):
+            # Jangan downcast bila ada pecahan atau nilai di luar rentang tipe
+            info = np.iinfo(dtype.lower())
+            valid = num.dropna()
+            if len(valid) and not ((valid % 1 == 0).all() and valid.between(info.min, info.max).all()):
+                return None
+        return num.astype(dtype)
+    if dtype == "string":
+        return s if isinstance(s.dtype, pd.StringDtype) else s.astype(pd.StringDtype("pyarrow"))
+    if dtype == "category":
+        return s if isinstance(s.dtype, pd.CategoricalDtype) else s.astype("category")
+    return None
+
+
+# ----------------------------- #
+# 📥 Terapkan Saat Load
+# ----------------------------- #
+def apply_schema(df, table_name):
+    """Terapkan dtype dari registry ke DataFrame hasil load (in place, dikembalikan).
+
+    Kolom yang nilainya tidak lolos konversi (mis. tanggal tidak valid)
+    dibiarkan dengan tipe aslinya agar perilaku dashboard tidak berubah.
+    """
+    for col, dtype in table_schema(table_name).items():
+        if col not in df.columns:
+            continue
+        converted = _cast(df[col], dtype)
+        if converted is not None:
+            df[col] = converted
+    return df
+
+
+# ----------------------------- #
+# 📤 Terapkan Saat Ingest
+# ----------------------------- #
+def coerce_for_storage(df, table_name):
+    """Normalisasi kolom tanggal & numerik sebelum disimpan ke SQLite.
+
+    Tanggal disimpan dalam format yang sama (YYYY-MM-DD HH:MM:SS) dan angka
+    sebagai REAL/INTEGER sehingga konversi saat load murah dan konsisten.
+    """
+    for col, dtype in table_schema(table_name).items():
+        if col not in df.columns:
+            continue
+        if dtype == "datetime":
+            parsed = _parse_datetime(df[col])
+        elif dtype in NUMERIC_TYPES:
+            parsed = _parse_numeric(df[col])
+        else:
+            continue
+        if parsed is not None:
+            df[col] = parsed
+    return df
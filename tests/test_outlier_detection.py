@@ -0,0 +1,23 @@
+import pandas as pd
+
+import outlier_detection
+
+
+def _frame(values):
+    return pd.DataFrame({
+        "Puskesmas": ["A", "B", "C", "D", "E", "F"],
+        "Metrik": values,
+    })
+
+
+def test_cache_tidak_berbagi_hasil_antar_frame_berbentuk_sama():
+    key = ("test_cache", "rcs.db", (("10", "2025-01-01"),), ("'All'",))
+    tahun_2024 = _frame([10.0, 11.0, 10.5, 9.5, 10.2, 100.0])
+    tahun_2025 = _frame([100.0, 11.0, 10.5, 9.5, 10.2, 10.0])
+    assert tahun_2024.shape == tahun_2025.shape
+
+    hasil_2024 = outlier_detection.statistical_outliers(tahun_2024, ["Metrik"], "IQR", "All", cache_key=key)
+    hasil_2025 = outlier_detection.statistical_outliers(tahun_2025, ["Metrik"], "IQR", "All", cache_key=key)
+
+    assert hasil_2024["Puskesmas"].tolist() == ["F"]
+    assert hasil_2025["Puskesmas"].tolist() == ["A"]
@@ -1,6 +1,15 @@
+import itertools
 import streamlit as st
 import pandas as pd
-import sqlite3
+from openpyxl import load_workbook
+import data_access
+import eppgbm_cohort
+import eppgbm_store
+import outlier_detection
+import parquet_store
+import reporting_coverage
+import rollup
+import schema
 
 def _coerce_month(v):
     """Terima '9', '9.0', ' 09 ', '9,0', kembalikan int atau NA."""
@@ -11,19 +20,304 @@ def _coerce_month(v):
     return int(float(s))
 
 
+# Tabel individual (besar) yang diunggah secara streaming per batch
+STREAMING_TABLES = {"data_eppgbm"}
+STREAM_BATCH_SIZE = 5000
+
+
+# Kolom filter yang diindeks per tabel (urutan = urutan kolom di indeks komposit)
+AGGREGATE_INDEX_COLUMNS = ["Tahun", "Bulan", "Puskesmas", "Kelurahan"]
+INDEX_COLUMNS = {
+    "data_eppgbm": ["periode", "puskesmas", "kelurahan", "nik"],
+}
+
+
+def _table_columns(conn, table_name):
+    """Peta nama kolom lowercase → nama asli untuk tabel yang sudah ada."""
+    return {row[1].lower(): row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')}
+
+
+def _key_columns(table_name, available):
+    """Kolom kunci/filter tabel yang benar-benar tersedia, sesuai urutan indeks."""
+    wanted = INDEX_COLUMNS.get(table_name, AGGREGATE_INDEX_COLUMNS)
+    return [available[c.lower()] for c in wanted if c.lower() in available]
+
+
+def ensure_indexes(conn, table_name):
+    """Buat indeks komposit pada kolom filter yang ada di tabel, lalu ANALYZE."""
+    existing = _table_columns(conn, table_name)
+    columns = _key_columns(table_name, existing)
+    if not columns:
+        return
+    cols_sql = ", ".join(f'"{c}"' for c in columns)
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table_name}_filter" ON "{table_name}" ({cols_sql})')
+    # Indeks tambahan untuk lookup yang tidak memfilter Tahun/periode (mis. WHERE Kelurahan IN ...)
+    for name in ("puskesmas", "kelurahan"):
+        col = existing.get(name)
+        if col and columns[0] != col:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table_name}_{name}" ON "{table_name}" ("{col}")')
+    conn.execute(f'ANALYZE "{table_name}"')
+
+
+def drop_table(conn, table_name):
+    if table_name == eppgbm_store.WIDE_TABLE:
+        eppgbm_store.drop(conn)
+    else:
+        conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+
+
+def finalize_table(conn, table_name):
+    """Langkah akhir setiap upload: indeks + rollup + flag outlier robust + cube kelengkapan, atau normalisasi + indeks kohort untuk EPPGBM."""
+    if table_name == eppgbm_store.WIDE_TABLE:
+        eppgbm_store.normalize(conn)
+        eppgbm_cohort.build_cohort(conn)
+        return
+    ensure_indexes(conn, table_name)
+    rollup.build_rollups(conn, table_name)
+    outlier_detection.build_outlier_flags(conn, table_name)
+    reporting_coverage.build_coverage(conn, table_name)
+
+
+def _prepare_df(df, table_name=None):
+    for col in df.columns:
+        if col.lower() == "bulan":
+            df[col] = df[col].apply(_coerce_month).astype("Int64")
+            break
+    return schema.coerce_for_storage(df, table_name)
+
+
+def _to_db_values(df):
+    """Konversi DataFrame ke list tuple Python yang bisa di-bind sqlite3 (NA → NULL)."""
+    out = df.copy()
+    for col in out.columns:
+        if pd.api.types.is_datetime64_any_dtype(out[col]):
+            # Format sama dengan DataFrame.to_sql agar nilai lama & baru sebanding
+            out[col] = out[col].dt.strftime("%Y-%m-%d %H:%M:%S")
+    out = out.astype(object).where(out.notna(), None)
+    return list(out.itertuples(index=False, name=None))
+
+
+def _row_signature(df, key_cols, value_cols):
+    """Signature per kunci (jumlah & hash baris) untuk membandingkan data lama vs baru."""
+    norm = pd.DataFrame(index=df.index)
+    for col in value_cols:
+        s = df[col]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            s = s.dt.strftime("%Y-%m-%d %H:%M:%S")
+        num = pd.to_numeric(s, errors="coerce")
+        # Kolom numerik dibandingkan sebagai float agar 1 == 1.0; selain itu sebagai teks
+        norm[col] = num.astype("float64") if num.notna().sum() == s.notna().sum() else s.astype(str).where(s.notna(), "")
+    row_hash = pd.util.hash_pandas_object(norm, index=False).astype("uint64")
+    keys = _normalize_keys(df[key_cols])
+    sig = pd.DataFrame({"_hash": row_hash.values}, index=df.index).join(keys)
+    return sig.groupby(key_cols, dropna=False)["_hash"].agg(["count", "sum"])
+
+
+def _normalize_keys(keys):
+    out = keys.copy()
+    for col in out.columns:
+        num = pd.to_numeric(out[col], errors="coerce")
+        out[col] = num.astype("float64") if num.notna().sum() == out[col].notna().sum() else out[col].astype(str)
+    return out
+
+
+def upsert_to_db(df, table_name, db_path=data_access.RCS_DB_PATH):
+    """Upsert per kunci (Tahun, Bulan, Puskesmas, Kelurahan) dalam satu transaksi.
+
+    Hanya kunci yang ada di file unggahan yang disentuh; data periode lain
+    tetap utuh. Perubahan ditulis ke salinan database yang baru diaktifkan
+    setelah selesai. Mengembalikan jumlah baris inserted/updated/unchanged.
+    """
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0}
+    with data_access.staged_write(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if table_name == eppgbm_store.WIDE_TABLE:
+            # Upsert bekerja di tabel lebar (berindeks kunci); dinormalisasi ulang di akhir
+            if eppgbm_store.denormalize(conn):
+                ensure_indexes(conn, table_name)
+        existing = _table_columns(conn, table_name)
+        if not existing:
+            df.to_sql(table_name, conn, if_exists="replace", index=False)
+            finalize_table(conn, table_name)
+            stats["inserted"] = len(df)
+            return stats
+
+        key_cols = _key_columns(table_name, {c.lower(): c for c in df.columns})
+        if not key_cols:
+            raise ValueError(
+                f"Mode incremental membutuhkan kolom kunci {INDEX_COLUMNS.get(table_name, AGGREGATE_INDEX_COLUMNS)}"
+            )
+
+        # Kolom baru di file unggahan ditambahkan ke tabel
+        for col in df.columns:
+            if col.lower() not in existing:
+                conn.execute(f'ALTER TABLE "{table_name}" ADD COLUMN "{col}"')
+                existing[col.lower()] = col
+        db_cols = [existing[c.lower()] for c in df.columns]
+        value_cols = [c for c in df.columns if c not in key_cols]
+
+        # Data lama hanya untuk periode/kunci utama yang ada di file unggahan
+        lead = key_cols[0]
+        lead_values = df[lead].dropna().unique().tolist()
+        where_sql, params = data_access.build_where({existing[lead.lower()]: lead_values})
+        cols_sql = ", ".join(f'"{c}"' for c in db_cols)
+        old_df = pd.read_sql_query(f'SELECT {cols_sql} FROM "{table_name}"{where_sql}', conn, params=params)
+        old_df.columns = list(df.columns)
+
+        new_sig = _row_signature(df, key_cols, value_cols)
+        old_sig = _row_signature(old_df, key_cols, value_cols)
+        is_new = ~new_sig.index.isin(old_sig.index)
+        is_same = pd.Series(False, index=new_sig.index)
+        common = new_sig.index[~is_new]
+        if len(common):
+            old_common = old_sig.loc[common]
+            new_common = new_sig.loc[common]
+            is_same.loc[common] = (new_common["count"].values == old_common["count"].values) & \
+                (new_common["sum"].values == old_common["sum"].values)
+        is_same = is_same.values
+        stats["inserted"] = int(new_sig.loc[is_new, "count"].sum())
+        stats["unchanged"] = int(new_sig.loc[is_same, "count"].sum())
+        stats["updated"] = int(new_sig.loc[~is_new & ~is_same, "count"].sum())
+
+        changed_keys = new_sig.index[~is_same]
+        if len(changed_keys):
+            key_frame = _normalize_keys(df[key_cols])
+            mask = pd.MultiIndex.from_frame(key_frame).isin(changed_keys) if len(key_cols) > 1 \
+                else key_frame[key_cols[0]].isin(changed_keys)
+            to_write = df[mask]
+            db_key_cols = [existing[c.lower()] for c in key_cols]
+            delete_sql = f'DELETE FROM "{table_name}" WHERE ' + " AND ".join(f'"{c}" IS ?' for c in db_key_cols)
+            conn.executemany(delete_sql, _to_db_values(to_write[key_cols].drop_duplicates()))
+            insert_sql = f'INSERT INTO "{table_name}" ({cols_sql}) VALUES ({", ".join("?" * len(db_cols))})'
+            conn.executemany(insert_sql, _to_db_values(to_write))
+
+        finalize_table(conn, table_name)
+    return stats
+
+
+def _excel_header(raw_header):
+    """Nama kolom seperti pd.read_excel: header kosong → 'Unnamed: i', duplikat → 'x.1'."""
+    names, seen = [], {}
+    for i, h in enumerate(raw_header):
+        name = f"Unnamed: {i}" if h is None else str(h)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def stream_excel_to_db(uploaded_file, table_name, db_path=data_access.RCS_DB_PATH, batch_size=STREAM_BATCH_SIZE):
+    """Unggah Excel besar baris demi baris (openpyxl read-only) dengan insert per batch.
+
+    Memori puncak dibatasi oleh ukuran batch, bukan ukuran file. Tabel ditulis
+    ulang di salinan database; dashboard tetap membaca versi lama sampai
+    salinan diaktifkan. Mengembalikan (jumlah baris, preview DataFrame).
+    """
+    wb = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        rows = ws.iter_rows(values_only=True)
+        header_row = next(rows, None)
+        if header_row is None:
+            return 0, pd.DataFrame()
+        columns = _excel_header(header_row)
+        total_rows = max((ws.max_row or 1) - 1, 1)
+        # Jangan sentuh tabel lama bila file tidak berisi data sama sekali
+        rows = (row for row in rows if not all(v is None for v in row))
+        first_row = next(rows, None)
+        if first_row is None:
+            return 0, pd.DataFrame()
+        rows = itertools.chain([first_row], rows)
+
+        progress = st.progress(0.0, text="⏳ Menyimpan data...")
+        preview = pd.DataFrame()
+        written = 0
+        insert_sql = None
+        with data_access.staged_write(db_path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            drop_table(conn, table_name)
+            batch = []
+            for row in rows:
+                batch.append(row[:len(columns)] + (None,) * (len(columns) - len(row)))
+                if len(batch) < batch_size:
+                    continue
+                insert_sql = _write_batch(conn, table_name, columns, batch, insert_sql)
+                if preview.empty:
+                    preview = pd.DataFrame(batch[:5], columns=columns)
+                written += len(batch)
+                batch = []
+                progress.progress(min(written / total_rows, 1.0), text=f"⏳ {written:,} baris tersimpan...")
+            if batch:
+                insert_sql = _write_batch(conn, table_name, columns, batch, insert_sql)
+                if preview.empty:
+                    preview = pd.DataFrame(batch[:5], columns=columns)
+                written += len(batch)
+            if written:
+                finalize_table(conn, table_name)
+        progress.progress(1.0, text=f"✅ {written:,} baris tersimpan")
+        return written, preview
+    finally:
+        wb.close()
+
+
+def _write_batch(conn, table_name, columns, batch, insert_sql):
+    """Tulis satu batch baris Excel; batch pertama sekaligus membuat skema tabel."""
+    batch_df = _prepare_df(pd.DataFrame(batch, columns=columns), table_name)
+    if insert_sql is None:
+        conn.execute(pd.io.sql.get_schema(batch_df, table_name, con=conn))
+        cols_sql = ", ".join(f'"{c}"' for c in columns)
+        insert_sql = f'INSERT INTO "{table_name}" ({cols_sql}) VALUES ({", ".join("?" * len(columns))})'
+    conn.executemany(insert_sql, _to_db_values(batch_df))
+    return insert_sql
+
+
+def refresh_snapshot(table_name, db_path=data_access.RCS_DB_PATH):
+    """Tulis ulang snapshot Parquet tabel setelah upload berhasil."""
+    if not parquet_store.is_available():
+        return
+    try:
+        with data_access.read_connection(db_path) as conn:
+            parquet_store.write_snapshot(conn, table_name)
+    except Exception as e:
+        st.warning(f"⚠️ Snapshot Parquet untuk {table_name} gagal dibuat, dashboard membaca langsung dari database: {e}")
+
+
+def publish_upload(table_name, db_path=data_access.RCS_DB_PATH):
+    """Perbarui snapshot lalu naikkan versi data agar cache dashboard dimuat ulang.
+
+    Versi dicatat setelah snapshot selesai supaya cache versi baru tidak
+    terisi dari snapshot lama.
+    """
+    refresh_snapshot(table_name, db_path)
+    with data_access.write_connection(db_path) as conn:
+        data_access.record_data_version(conn, table_name)
+
+
 # Fungsi untuk menyimpan data ke database
-def save_to_db(df, table_name, db_path="rcs_data.db"):
+def save_to_db(df, table_name, db_path=data_access.RCS_DB_PATH, mode="replace"):
     try:
-        conn = sqlite3.connect(db_path)
-        for col in df.columns:
-            if col.lower() == "bulan":
-                df[col] = df[col].apply(_coerce_month).astype("Int64")
-                break
-        df.to_sql(table_name, conn, if_exists='replace', index=False)
-        conn.close()
+        df = _prepare_df(df, table_name)
+        if mode == "incremental":
+            stats = upsert_to_db(df, table_name, db_path)
+            publish_upload(table_name, db_path)
+            st.success(
+                f"✅ Data berhasil disimpan ke tabel: {table_name} "
+                f"(baru: {stats['inserted']}, diperbarui: {stats['updated']}, tidak berubah: {stats['unchanged']})"
+            )
+            return stats
+        with data_access.staged_write(db_path) as conn:
+            drop_table(conn, table_name)
+            df.to_sql(table_name, conn, if_exists='replace', index=False)
+            finalize_table(conn, table_name)
+        publish_upload(table_name, db_path)
         st.success(f"✅ Data berhasil disimpan ke tabel: {table_name}")
+        return {"inserted": len(df), "updated": 0, "unchanged": 0}
     except Exception as e:
         st.error(f"❌ Gagal menyimpan data: {e}")
+        return None
 
 # Fungsi untuk mengunggah file
 def upload_file(indicator_name, table_name):
@@ -67,6 +361,15 @@ def upload_file(indicator_name, table_name):
         else:
             st.info("🔔 Tidak ada template untuk indikator ini.")
 
+    upload_mode = st.radio(
+        "⚙️ Mode Unggah",
+        ["Ganti seluruh tabel", "Tambah/Perbarui periode (incremental)"],
+        horizontal=True,
+        key=f"mode_{table_name}",
+        help="Incremental hanya menimpa baris dengan Tahun, Bulan, Puskesmas, dan Kelurahan yang ada di file; periode lain tetap utuh.",
+    )
+    mode = "incremental" if upload_mode.startswith("Tambah") else "replace"
+
     uploaded_file = st.file_uploader(
         f"📂 Unggah file Excel untuk {indicator_name}", 
         type=["xlsx"], 
@@ -75,13 +378,26 @@ def upload_file(indicator_name, table_name):
 
     if uploaded_file:
         try:
+            db_path = data_access.EPPGBM_DB_PATH if table_name == "data_eppgbm" else data_access.RCS_DB_PATH
+            if table_name in STREAMING_TABLES and mode == "replace":
+                # File individual besar: baca & simpan per batch agar memori tetap kecil
+                written, preview = stream_excel_to_db(uploaded_file, table_name, db_path)
+                if written == 0:
+                    st.warning("⚠️ File kosong atau format tidak sesuai.")
+                    return
+                publish_upload(table_name, db_path)
+                st.success(f"✅ Data {indicator_name} berhasil diunggah! ({written:,} baris)")
+                st.dataframe(preview)
+                return
+
             df = pd.read_excel(uploaded_file)
             if df.empty:
                 st.warning("⚠️ File kosong atau format tidak sesuai.")
                 return
 
-            db_path = "data_eppgbm.db" if table_name == "data_eppgbm" else "rcs_data.db"
-            save_to_db(df, table_name, db_path)
+            stats = save_to_db(df, table_name, db_path, mode=mode)
+            if stats is None:
+                return
             st.success(f"✅ Data {indicator_name} berhasil diunggah!")
             st.dataframe(df.head())
         except Exception as e: